@@ -1,15 +1,19 @@
 from ftplib import FTP, error_perm
 import os
+import threading
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from typing import List, Optional, Tuple
 
 from constants import TEJapanDirectory, TEJapanFileType
+import cancellation
+import tracing
 
 
 # Load environment variables
 load_dotenv()
-FTP_HOST = "ftp.eorc.jaxa.jp"
+FTP_HOST = os.getenv("FTP_HOST", "ftp.eorc.jaxa.jp")
+FTP_PORT = int(os.getenv("FTP_PORT", "21"))
 FTP_USER = os.getenv("FTP_USER")
 FTP_PASS = os.getenv("FTP_PASS")
 PRED_INTERVAL_HOURS = 3    # interval between predictions
@@ -18,7 +22,8 @@ MAX_DAYS_BACK = 7          # how many days back to search for available data
 
 
 def connect_ftp() -> FTP:
-    ftp = FTP(FTP_HOST)
+    ftp = FTP()
+    ftp.connect(FTP_HOST, FTP_PORT)
     ftp.login(FTP_USER, FTP_PASS)
     print(f"✅ Connected to {FTP_HOST}")
     return ftp
@@ -65,23 +70,73 @@ def find_most_recent_valid_folder(
     return None
 
 
+def latest_run_for(target_time: datetime) -> Optional[datetime]:
+    """Most recent forecast run at or before target_time (folder listing only, no download)."""
+    with tracing.span("ftp.list", purpose="latest run"):
+        ftp = connect_ftp()
+        try:
+            return find_most_recent_valid_folder(ftp, target_time)
+        finally:
+            try: ftp.quit()
+            except Exception: ftp.close()
+
+
+_path_locks: dict = {}   # local path -> lock, so concurrent submissions fetch a file once
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(local_path: str) -> threading.Lock:
+    with _path_locks_guard:
+        return _path_locks.setdefault(local_path, threading.Lock())
+
+
 def _download_one(ftp: FTP, folder: str, filename: str, dest_dir: str) -> str:
     os.makedirs(dest_dir, exist_ok=True)
     local_path = os.path.join(dest_dir, filename)
-    if os.path.exists(local_path):
-        print(f"ℹ️  Skipping download; file already exists: {local_path}")
-        return local_path
-    print(f"⬇ Downloading: {filename}")
-    ftp.cwd(folder)
-    with open(local_path, "wb") as f:
-        ftp.retrbinary(f"RETR {filename}", f.write)
+    with _path_lock(local_path):
+        if os.path.exists(local_path):
+            print(f"ℹ️  Skipping download; file already exists: {local_path}")
+            return local_path
+        print(f"⬇ Downloading: {filename}")
+        with tracing.span("ftp.download", file=filename):
+            _retrieve(ftp, folder, filename, local_path)
     print(f"✅ Saved: {local_path}")
     return local_path
 
+
+def _retrieve(ftp: FTP, folder: str, filename: str, local_path: str):
+    ftp.cwd(folder)
+    part_path = local_path + ".part"
+
+    def _write(chunk):
+        cancellation.check()   # aborts the transfer if the submission was superseded
+        f.write(chunk)
+
+    try:
+        with open(part_path, "wb") as f:
+            ftp.retrbinary(f"RETR {filename}", _write)
+    except BaseException:
+        # never leave a truncated file behind
+        try: os.remove(part_path)
+        except Exception: pass
+        raise
+    # readers only ever see a complete file under the final name
+    os.replace(part_path, local_path)
+
 def find_and_download_flood_data(target_time: datetime) -> Tuple[Optional[datetime], Optional[str]]:
-    ftp = connect_ftp()
+    with tracing.span("ftp.connect"):
+        ftp = connect_ftp()
+    try:
+        return _find_and_download(ftp, target_time)
+    except cancellation.Cancelled:
+        print(f"⏹ Forecast download cancelled for {target_time}")
+        ftp.close()   # control channel is mid-transfer; don't wait for QUIT
+        raise
+
 
-    run_dt = find_most_recent_valid_folder(ftp, target_time)
+def _find_and_download(ftp: FTP, target_time: datetime) -> Tuple[Optional[datetime], Optional[str]]:
+    with tracing.span("ftp.list"):
+        run_dt = find_most_recent_valid_folder(ftp, target_time)
     if run_dt is None:
         print(f"❌ No available forecast folder within {MAX_DAYS_BACK} days of {target_time}")
         ftp.quit()
@@ -97,8 +152,9 @@ def find_and_download_flood_data(target_time: datetime) -> Tuple[Optional[dateti
     prefix = target_time.strftime("H%Y%m%d%H")
 
     try:
-        ftp.cwd(folder)
-        all_files = ftp.nlst()
+        with tracing.span("ftp.list", folder=folder):
+            ftp.cwd(folder)
+            all_files = ftp.nlst()
     except error_perm:
         print(f"❌ Unable to access folder: {folder}")
         ftp.quit()
@@ -113,6 +169,7 @@ def find_and_download_flood_data(target_time: datetime) -> Tuple[Optional[dateti
     downloaded_locals = []  # keep local paths for cleanup if partial
 
     for var in types:
+        cancellation.check()
         fn15 = f"TE-JPN15S_MSM_{prefix}_{var.value}.nc"
         fn01 = f"TE-JPN01M_MSM_{prefix}_{var.value}.nc"
 
@@ -136,6 +193,47 @@ def find_and_download_flood_data(target_time: datetime) -> Tuple[Optional[dateti
     return run_dt, used_resolution
 
 
+def find_and_download_run(target_time: datetime,
+                          file_type: TEJapanFileType = TEJapanFileType.DEPTH,
+                          step_hours: int = 1) -> Tuple[Optional[datetime], List[Tuple[datetime, str]]]:
+    """
+    Every lead time of the run that covers target_time, over one FTP connection.
+    Returns (run_dt, [(valid_time, local_path), ...]) in time order; 15S files
+    are preferred per hour, 01M is used where 15S is missing.
+    """
+    with tracing.span("ftp.connect"):
+        ftp = connect_ftp()
+    try:
+        with tracing.span("ftp.list"):
+            run_dt = find_most_recent_valid_folder(ftp, target_time)
+        if run_dt is None:
+            print(f"❌ No available forecast folder within {MAX_DAYS_BACK} days of {target_time}")
+            return None, []
+
+        folder = f"/{run_dt.year}/{run_dt.month:02d}/{run_dt.day:02d}/{run_dt.hour:02d}"
+        with tracing.span("ftp.list", folder=folder):
+            ftp.cwd(folder)
+            all_files = set(ftp.nlst())
+
+        dest = TEJapanDirectory.DIRECTORY.value
+        out = []
+        for lead in range(0, MAX_LEAD_HOURS + 1, max(1, step_hours)):
+            cancellation.check()
+            valid = run_dt + timedelta(hours=lead)
+            prefix = valid.strftime("H%Y%m%d%H")
+            for res in ("15S", "01M"):
+                fn = f"TE-JPN{res}_MSM_{prefix}_{file_type.value}.nc"
+                if fn in all_files:
+                    out.append((valid, _download_one(ftp, folder, fn, dest)))
+                    break
+        print(f"✅ Run {run_dt:%Y-%m-%d %H:00}: {len(out)} {file_type.value} lead times")
+        ftp.quit()
+        return run_dt, out
+    except BaseException:
+        ftp.close()
+        raise
+
+
 if __name__ == "__main__":
     now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
     find_and_download_flood_data(now)
@@ -1,7 +1,7 @@
 # apicheck.py
 import os
 from dotenv import load_dotenv, find_dotenv
-import requests
+import http_client
 
 # load .env from the current working dir or parents
 load_dotenv(find_dotenv(usecwd=True))
@@ -12,7 +12,7 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_STREET_VIEW_API_KEY")
 
 def get_pano_source(pano_id: str):
     url = "https://maps.googleapis.com/maps/api/streetview/metadata"
-    resp = requests.get(url, params={"pano": pano_id, "key": GOOGLE_API_KEY}, timeout=10)
+    resp = http_client.get(url, endpoint="sv_metadata", params={"pano": pano_id, "key": GOOGLE_API_KEY})
     data = resp.json()
     return data.get("source"), data
 
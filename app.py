@@ -4,30 +4,33 @@ import sys
 import threading
 from datetime import datetime, timezone, timedelta
 
-from PyQt5.QtCore import QTimer, QObject, pyqtSignal, QThread, pyqtSlot, Qt
+from PyQt5.QtCore import QTimer, QObject, pyqtSignal, pyqtSlot, Qt
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from functools import partial
 
 from interface import AddressForm
-from googleAPI import addressToCoordinates, getStreetView
-from TEJapanAPI import find_and_download_flood_data
-from preprocessNCFile import (
-    openClosestFile,
-    getNearestValueByCoordinates,
-    buildDepthPatch,
-)
-from constants import TEJapanFileType, WebDirectory
+import pipeline
+import tracing
+from cancellation import Cancelled
+from constants import WebDirectory
 from zoneinfo import ZoneInfo
 
 from pythonToJS import start_node, sendToNode, wait_health, _wait_and_send
-from imageUtility import save_images
-from sse_masks import start_mask_watcher, on_mask_ready
+from sse_masks import on_mask_ready, interrupt_stale, expect_mask, GEN_QUEUE
+from mask_events import start_mask_watcher
+from sessions import SessionRegistry, RUNNING, DONE, FAILED
+from prefetch import SpeculativePrefetcher
+from result_cache import RESULT_CACHE
+from imageGen import check_profiles
 
 
 from utility import _get_raw_info,_split_prompts, _ensure_aware, _fmt_dt, _is_no_pano_error,dateConverter,_human_hours
 # --------------------------- global state ---------------------------
 
-ACTIVE_UUIDS = set()
+SESSIONS = SessionRegistry()   # one per submitted address; also answers "uuid in SESSIONS"
+SHOWN_SESSION = None           # id of the session on screen (its AI jobs run first)
+ACTIVE_JOBS = {}   # CancelToken -> FormWorker (strong refs until finished)
+PREFETCHER = SpeculativePrefetcher()
 JST = ZoneInfo("Asia/Tokyo")
 UTC = timezone.utc
 
@@ -37,73 +40,83 @@ API_URL  = BASE_URL + WebDirectory.CAMERA_METADATA_ROUTE.value
 
 
 class UiBus(QObject):
-    ai_ready   = pyqtSignal(bytes)   # bytes for the right panel
-    tiles_ready = pyqtSignal()
-    progress   = pyqtSignal(str)     # log text lines
+    ai_ready   = pyqtSignal(str, bytes, str)   # uuid, AI image, raw infotext ("" if none)
+    tiles_ready = pyqtSignal(str)              # uuid whose mask arrived
+    progress   = pyqtSignal(str)               # log text lines (selected session)
+    job_status = pyqtSignal(str, str)          # uuid, AI queue status line (owning session)
+    trace_line = pyqtSignal(str, str)          # trace_id, formatted span
 
 
 
 class FormWorker(QObject):
     progress = pyqtSignal(str)
     tiles = pyqtSignal(list, list)  # images, metas
+    cached = pyqtSignal(dict)       # stored result of an identical earlier submission
     depth = pyqtSignal(float, object, object, str, tuple)  # value, dt_fetched, depth_time, resolution, (coords, lat, lng, size)
     error = pyqtSignal(str)
     finished = pyqtSignal()
 
-    def __init__(self, data):
+    def __init__(self, session):
         super().__init__()
-        self.data = data
+        self.session = session
+        self.data = session.data
+        self.token = session.token
+        self.trace_root = None   # root span of this submission, for slots running later
 
-    @pyqtSlot()
     def run(self):
+        """Runs on the pipeline job pool with self.token bound."""
+        with tracing.trace("submit", address=self.data.get("address2", ""),
+                           date=self.data.get("date"), mode=self.data.get("mode")) as root:
+            self.trace_root = root
+            self.session.trace_id = root.trace_id   # routes this trace's lines to the session log
+            self._run()
+
+    def _run(self):
         try:
-            # 1) Build the address and geocode
-            address = " ".join([self.data["prefecture"], self.data["city"], self.data["town"], self.data["address2"]])
-            coords = addressToCoordinates(address)
+            # 0) Repeat submission: replay the stored result
+            with tracing.span("result_cache") as sp:
+                hit = RESULT_CACHE.lookup(self.data)
+                if sp:
+                    sp.set(hit=hit is not None)
+            if hit:
+                self.token.raise_if_cancelled()
+                self.cached.emit(hit)
+                return
 
-            # 2) Time conversion
+            # 1) Geocode (the only dependency of both branches)
+            coords = pipeline.geocode(self.data, PREFETCHER)
             target_dt_utc, target_dt_jst = dateConverter(self.data)
+            self.token.raise_if_cancelled()
+
+            # 2) Street-View and forecast branches run concurrently
+            sv_job = pipeline.submit(pipeline.fetch_street_view, self.data, coords, PREFETCHER)
+            depth_job = pipeline.submit(pipeline.resolve_depth, self.data, coords, target_dt_utc, PREFETCHER)
 
-            # 3) Fetch Street-View (exit early if none found)
+            # 3) Street-View (exit early if none found)
             try:
-                tiles, metas = getStreetView(
-                    coords,
-                    target_date=self.data["date"],
-                    mode=self.data["mode"],
-                    tolerance_m=15,
-                    width=640,
-                    height=640,
-                )
+                tiles, metas = sv_job.result()
+            except Cancelled:
+                raise
             except Exception as e:
+                depth_job.cancel()
                 if _is_no_pano_error(e):
                     self.error.emit("__NO_PANO__")
                     return
                 self.error.emit(str(e))
                 return
 
-            saved = save_images(tiles)
-            for meta, s in zip(metas, saved):
-                meta["type"] = "camera"
-                meta["uuid"] = s["uuid"]
-
+            self.token.raise_if_cancelled()
             self.tiles.emit(tiles, metas)
 
-            # 4) Depth
-            if self.data.get("depth_override_enabled"):
-                depth_value = float(self.data.get("depth_override_value", 0.0))
-                dt_fetched = None
-                depth_time = None
-                resolution = "override"
-            else:
-                dt_fetched, resolution = find_and_download_flood_data(target_dt_utc)
-                if dt_fetched is None or resolution is None:
-                    self.error.emit("__NO_FORECAST__")
-                    return
-
-
-                ds_depth = openClosestFile(TEJapanFileType.DEPTH, target_dt_utc)
-                depth_value, depth_time = getNearestValueByCoordinates(ds_depth, coords, target_dt_utc)
+            # 4) Depth (camera metas are part of the depth payload, so it follows the tiles)
+            try:
+                depth_value, dt_fetched, depth_time, resolution = depth_job.result()
+            except pipeline.NoForecastError:
+                self.error.emit("__NO_FORECAST__")
+                return
 
+            self.token.raise_if_cancelled()
+            RESULT_CACHE.put(self.data, tiles, metas, coords, depth_value, dt_fetched, depth_time, resolution)
             self.depth.emit(
                 float(depth_value),
                 dt_fetched,
@@ -112,62 +125,121 @@ class FormWorker(QObject):
                 (coords, metas[0]["lat"], metas[0]["lng"], metas[0]["size"])
             )
 
+        except Cancelled:
+            print(f"[pipeline] superseded: {self.token.label}")
+            self.trace_root.end("cancelled")
         except Exception as e:
-            self.error.emit(str(e))
+            if not self.token.cancelled:
+                self.error.emit(str(e))
         finally:
             self.finished.emit()
 
 # --------------------------- GUI-thread orchestration ---------------------------
 
+def _is_shown(session) -> bool:
+    return w.current_session_id() == session.id
+
+
+def _log(session, text: str):
+    """Append to the session's log (and to the panel if its tab is selected)."""
+    if session is None:
+        w.log.append(text)
+        return
+    session.log.append(text)
+    if _is_shown(session):
+        w.log.append(text)
+
+
+def _set_state(session, state: str):
+    session.state = state
+    badge = {RUNNING: "⏳ ", DONE: "", FAILED: "⚠ "}[state]
+    w.set_session_badge(session.id, badge + session.label)
+
+
+def _for_session(worker, slot):
+    """Wrap a result slot: drop results of a closed session, trace under the job's root span."""
+    def _guarded(*args):
+        if not worker.token.cancelled:
+            with tracing.resume(worker.trace_root):
+                slot(worker.session, *args)
+    return _guarded
+
+
 def handle_form(data):
     """
-    Turn on waiting animation and start a worker thread.
-    Keep a strong reference to the QThread so it isn't destroyed early.
+    Open a session for the submission and run it on the pipeline job pool.
+    Sessions run side by side; each lands in its own tab.
     """
-    w.connector.reset(quiet=False)
+    session = SESSIONS.open(data)
+    w.add_session_tab(session.id, session.label)   # selects it (shows its empty log)
+    _set_state(session, RUNNING)
+    _log(session, "Input Form submitted.")
+    for old in SESSIONS.overflow():
+        _close_session(old.id)
 
-    thread = QThread()
-    thread.setObjectName(f"FormWorker-{len(w._threads)+1}")
-    worker = FormWorker(data)
-    worker.moveToThread(thread)
-
-    # start work
-    thread.started.connect(worker.run)
+    worker = FormWorker(session)
+    token = session.token
 
     # route results back to GUI
-    worker.tiles.connect(_on_tiles_from_worker, type=Qt.QueuedConnection)
-    worker.depth.connect(_on_depth_from_worker, type=Qt.QueuedConnection)
-    worker.error.connect(_on_worker_error, type=Qt.QueuedConnection)
+    worker.tiles.connect(_for_session(worker, _on_tiles_from_worker), type=Qt.QueuedConnection)
+    worker.depth.connect(_for_session(worker, _on_depth_from_worker), type=Qt.QueuedConnection)
+    worker.error.connect(_for_session(worker, _on_worker_error), type=Qt.QueuedConnection)
+    worker.cached.connect(_for_session(worker, _on_cached_from_worker), type=Qt.QueuedConnection)
 
-    # cleanup: when finished, quit thread and drop our strong reference
+    # cleanup: drop our strong reference once the job is done
     def _cleanup():
-        try:
-            thread.quit()
-            thread.wait(5000)
-        finally:
-            try:
-                w._threads.remove(thread)
-            except ValueError:
-                pass
-            worker.deleteLater()
-            thread.deleteLater()
+        ACTIVE_JOBS.pop(token, None)
+        if session.state == RUNNING and SESSIONS.get(session.id):
+            _set_state(session, DONE)
+        worker.deleteLater()
 
     worker.finished.connect(_cleanup, type=Qt.QueuedConnection)
-    w._threads.append(thread)
-    thread.start()
+    ACTIVE_JOBS[token] = worker
+    fut = pipeline.run_job(token, worker.run)
+    fut.add_done_callback(lambda f: f.cancelled() and worker.finished.emit())
 
-def _on_tiles_from_worker(tiles, metas):
-    # Update which UUIDs are "active" for SSE/mask routing
-    ACTIVE_UUIDS.clear()
-    for m in metas:
-        ACTIVE_UUIDS.add(m["uuid"])
+
+def _ai_priority(uuid) -> int:
+    """AI queue rank: the session on screen first (read from the SSE thread)."""
+    session = SESSIONS.for_uuid(uuid)
+    return 0 if session is not None and session.id == SHOWN_SESSION else 1
+
+
+def _show_session(sid):
+    global SHOWN_SESSION
+    session = SESSIONS.get(sid)
+    if session is None:
+        return
+    SHOWN_SESSION = sid
+    GEN_QUEUE.reprioritize(_ai_priority)
+    w.show_session(session.images, session.metas, session.ai_image, session.log)
+    w.connector.reset(quiet=session.state != RUNNING)
+    if session.images:
+        w.ensure_map_started()
+    if session.ai_image:
+        w.on_tiles_ready()
+        w.connector.set_ai_ready(True)
+
+
+def _close_session(sid):
+    """Close a tab: cancel its pipeline and stop AI work for its images."""
+    SESSIONS.close(sid)
+    interrupt_stale(SESSIONS)
+    w.remove_session_tab(sid)
+
+
+def _on_tiles_from_worker(session, tiles, metas):
+    # Masks / AI images for these UUIDs now belong to this session
+    SESSIONS.bind_uuids(session, [m["uuid"] for m in metas])
+    session.images, session.metas = tiles, metas
 
     # Show Street-View images and start the map
-    w.set_street_images(tiles, metas)
+    if _is_shown(session):
+        w.set_street_images(tiles, metas)
     w.ensure_map_started()
 
     # Log a concise metadata summary
-    w.log.append("\n[Street-View Metadata]")
+    _log(session, "\n[Street-View Metadata]")
     def _num(val, places=0):
         try: return f"{float(val):.{places}f}"
         except Exception: return "n/a"
@@ -175,7 +247,7 @@ def _on_tiles_from_worker(tiles, metas):
         try: return f"{float(val):.6f}"
         except Exception: return "n/a"
     for m in metas:
-        w.log.append(
+        _log(session,
             f"Camera lat&lng: {_num6(m.get('lat'))}, {_num6(m.get('lng'))}\n"
             f"Heading & Pitch: {_num(m.get('heading'),0)}° / {_num(m.get('pitch'),0)}°\n"
             f"FOV & Size: {_num(m.get('fov'),0)} / {m.get('size')}\n"
@@ -185,15 +257,15 @@ def _on_tiles_from_worker(tiles, metas):
         )
 
     # Send camera metas to the Node viewer (off the GUI thread)
-    threading.Thread(target=_wait_and_send, args=(API_URL,bus,metas, "Street-View metadata"), daemon=True).start()
+    threading.Thread(target=tracing.wrap(_wait_and_send), args=(API_URL,bus,metas, f"Street-View metadata ({session.label})"), daemon=True).start()
 
-def _on_depth_from_worker(depth_value, dt_fetched, depth_time, resolution, packed):
+def _on_depth_from_worker(session, depth_value, dt_fetched, depth_time, resolution, packed):
     coords, lat, lng, size = packed
 
     # TE-JAPAN log (in JST)
-    w.log.append("\n[TE-JAPAN DATA]")
+    _log(session, "\n[TE-JAPAN DATA]")
     if resolution:
-        w.log.append(f"Resolution: {resolution}")
+        _log(session, f"Resolution: {resolution}")
     if dt_fetched:
         try:
             if depth_time is not None:
@@ -201,60 +273,109 @@ def _on_depth_from_worker(depth_value, dt_fetched, depth_time, resolution, packe
             else:
                 # if you ever emit without depth_time (override), skip or handle separately
                 lead_td = None
-            w.log.append(f"Lead time: {_human_hours(lead_td)}")
+            _log(session, f"Lead time: {_human_hours(lead_td)}")
         except Exception:
             pass
-        w.log.append(f"Model run: {_fmt_dt(dt_fetched, 'JST')} (JST)")
+        _log(session, f"Model run: {_fmt_dt(dt_fetched, 'JST')} (JST)")
     if depth_value is not None and depth_time is not None:
-        w.log.append(f"Flood depth: {float(depth_value):.2f} m @ {_fmt_dt(depth_time, 'JST')} (JST)\n")
-
-    # Send depth to the browser (off the GUI thread)
-    depth_payload = {
-        "type": "depth",
-        "value": float(depth_value),
-        "location": coords,
-        "lat": lat,
-        "lng": lng,
-        "size": size,
-    }
-    threading.Thread(target=_wait_and_send, args=(API_URL,bus,depth_payload, "flood depth"), daemon=True).start()
-
-def _on_worker_error(msg):
+        _log(session, f"Flood depth: {float(depth_value):.2f} m @ {_fmt_dt(depth_time, 'JST')} (JST)\n")
+
+    # Send depth to the browser (off the GUI thread). The payload carries its own
+    # camera and uuid, so other sessions' cameras sent meanwhile don't matter.
+    cam = session.metas[0]
+    depth_payload = pipeline.depth_payload(depth_value, coords, lat, lng, size,
+                                           uuid=cam["uuid"], camera=cam)
+    expect_mask(list(session.uuids), tracing.current())
+    threading.Thread(target=tracing.wrap(_wait_and_send), args=(API_URL,bus,depth_payload, f"flood depth ({session.label})"), daemon=True).start()
+
+def _on_cached_from_worker(session, entry):
+    _log(session, "\n[Result cache] Same inputs as an earlier run; replaying the stored result.")
+
+    # Same display path as a live run (also points the viewer at the stored camera/depth) ...
+    metas = entry["metas"]
+    _on_tiles_from_worker(session, entry["images"], metas)
+    # ... but the AI image is already known, so masks the viewer saves are not regenerated
+    SESSIONS.release_uuids(session)
+    _on_depth_from_worker(
+        session,
+        entry["depth_value"], entry["forecast_run"], entry["depth_time"], entry["resolution"],
+        (entry["coords"], metas[0]["lat"], metas[0]["lng"], metas[0]["size"]),
+    )
+    _show_ai(session, entry["ai_image"], entry.get("infotext") or "")
+
+def _on_mask_ready(uuid):
+    session = SESSIONS.for_uuid(uuid)
+    if session is not None and _is_shown(session):
+        w.on_tiles_ready()
+
+def _on_queue_status(uuid, line):
+    session = SESSIONS.for_uuid(uuid)
+    if session is not None:
+        _log(session, line)
+
+def _on_ai_ready(uuid, img_bytes, infotext):
+    session = SESSIONS.for_uuid(uuid)
+    if session is None:
+        return
+    _show_ai(session, img_bytes, infotext)
+
+def _show_ai(session, img_bytes, infotext):
+    session.ai_image = img_bytes
+    if _is_shown(session):
+        w.on_tiles_ready()
+        w.display_ai_image(img_bytes)   # logs to the panel; mirror that in the session log
+        session.log.append("✔ AI-generated image displayed.\n")
+    else:
+        session.log.append("✔ AI-generated image ready.\n")
+    if infotext:
+        pos, neg = _split_prompts(infotext)
+        _log(session, "[Prompt]")
+        if pos:
+            _log(session, f"Positive: {pos}\n")
+        if neg:
+            _log(session, f"Negative: {neg}")
+
+def _on_trace_line(trace_id, line):
+    session = SESSIONS.for_trace(trace_id)
+    if session is not None:
+        _log(session, line)
+
+def _on_worker_error(session, msg):
+    _set_state(session, FAILED)
+    shown = _is_shown(session)
     if msg == "__NO_PANO__":
-        w.log.append("⚠ No Street-View panorama found on/before the selected date near this address.")
-        QMessageBox.information(w, "No panorama found",
-                                "No Street-View panorama was found on/before the selected date near this address.")
+        _log(session, "⚠ No Street-View panorama found on/before the selected date near this address.")
+        if shown:
+            QMessageBox.information(w, "No panorama found",
+                                    "No Street-View panorama was found on/before the selected date near this address.")
     elif msg == "__NO_FORECAST__":
-        w.log.append("⚠ No forecast data is available for the selected hour.\n")
-        QMessageBox.information(w, "No forecast",
-                                "No forecast data is available for the selected hour.\n"
-                                "Try a different time (3-hour steps) or wait for a later run.")
+        _log(session, "⚠ No forecast data is available for the selected hour.\n")
+        if shown:
+            QMessageBox.information(w, "No forecast",
+                                    "No forecast data is available for the selected hour.\n"
+                                    "Try a different time (3-hour steps) or wait for a later run.")
     else:
-        w.log.append(f"⚠ Error: {msg}")
-        QMessageBox.warning(w, "Error", msg)
+        _log(session, f"⚠ Error: {msg}")
+        if shown:
+            QMessageBox.warning(w, "Error", msg)
 
-    w.connector.reset(quiet=True)
-    w.submit_btn.setEnabled(True)
+    if shown:
+        w.connector.reset(quiet=True)
 
 # --------------------------- shutdown hygiene ---------------------------
 
 def _graceful_shutdown():
     """
-    Ensure all QThreads finish before process exits to avoid:
-    'QThread: Destroyed while thread is still running'
+    Cancel running submissions and stop the worker pools before the process exits.
     """
-    # stop worker QThreads
-    for t in list(getattr(w, "_threads", [])):
-        try:
-            t.requestInterruption()
-        except Exception:
-            pass
-        t.quit()
-        t.wait(5000)
-        try:
-            w._threads.remove(t)
-        except ValueError:
-            pass
+    PREFETCHER.shutdown()
+
+    # cancel pipeline jobs (HTTP/FTP calls stop at their next check)
+    for session in SESSIONS.all():
+        SESSIONS.close(session.id)
+    interrupt_stale(SESSIONS)
+    GEN_QUEUE.shutdown()
+    pipeline.shutdown()
 
     # stop/join SSE watcher thread if present
     try:
@@ -275,19 +396,33 @@ if __name__ == "__main__":
 
     bus = UiBus()  # create after QApp
     w = AddressForm()
-    w._threads = []  # strong refs to active QThreads
 
-    bus.ai_ready.connect(w.display_ai_image, type=Qt.QueuedConnection)
-    bus.tiles_ready.connect(w.on_tiles_ready, type=Qt.QueuedConnection)
+    bus.ai_ready.connect(_on_ai_ready, type=Qt.QueuedConnection)
+    bus.tiles_ready.connect(_on_mask_ready, type=Qt.QueuedConnection)
     bus.progress.connect(w.log.append, type=Qt.QueuedConnection)
+    bus.job_status.connect(_on_queue_status, type=Qt.QueuedConnection)
+    bus.trace_line.connect(_on_trace_line, type=Qt.QueuedConnection)
+    tracing.add_sink(lambda span: bus.trace_line.emit(span.trace_id, tracing.format_span(span)))
     w.data_submitted.connect(handle_form, type=Qt.QueuedConnection)
+    w.session_selected.connect(_show_session)
+    w.session_closed.connect(_close_session)
+    w.speculate.connect(PREFETCHER.speculate, type=Qt.QueuedConnection)
 
     def _start_sse():
         global mask_thread
-        mask_cb = partial(on_mask_ready, ACTIVE_UUIDS=ACTIVE_UUIDS, bus=bus)
+        mask_cb = partial(on_mask_ready, active=SESSIONS, bus=bus, priority=_ai_priority)
         mask_thread = start_mask_watcher(BASE_URL, mask_cb)
 
+    def _check_webui():
+        # validate the img2img profiles against the backend before the first generation
+        try:
+            for problem in check_profiles():
+                bus.progress.emit(f"⚠ WebUI: {problem}")
+        except Exception as e:
+            print("[WebUI caps] profile check skipped:", e)
+
     QTimer.singleShot(0, _start_sse)   # schedule once UI is up
+    threading.Thread(target=_check_webui, daemon=True).start()
     app.aboutToQuit.connect(_graceful_shutdown)
 
     w.show()
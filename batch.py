@@ -0,0 +1,262 @@
+# batch.py
+"""
+Headless batch runner: the FormWorker pipeline for a CSV of addresses, without Qt.
+
+    python batch.py points.csv --manifest out/manifest.jsonl --jobs 4
+
+CSV columns (header row required):
+    address                      full address line (or prefecture, city, town, address2)
+    date, time                   YYYY-MM-DD, HH:MM
+    timezone                     JST (default) or UTC
+    mode                         building (default) or 360°
+    depth                        optional depth override in metres
+
+Per row: geocode -> (Street View + save_images || TE-Japan depth) -> mask -> img2img.
+The mask stage needs the Node server running with a Cesium viewer connected
+(open the server URL in a browser); masks are rendered one camera at a time.
+Use --no-mask to stop after the depth lookup.
+
+Each finished row is appended to the manifest as one JSON line with its
+outputs and per-stage timings (seconds).
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pipeline
+import tracing
+from constants import WebDirectory, PerspectiveMode
+from pythonToJS import sendToNode, wait_for_ready
+from mask_events import start_mask_watcher
+from imageGen import generate_from_uuid, _normalize_uuid
+from utility import buildAddress, dateConverter, _is_no_pano_error
+
+BASE_URL = f"http://{WebDirectory.HOST.value}:{WebDirectory.PORT.value}"
+API_URL  = BASE_URL + WebDirectory.CAMERA_METADATA_ROUTE.value
+IMAGES_DIR = "images"     # where save_images / main.js put streetview and mask files
+MASK_MIN_DEPTH_M = 0.25   # main.js WATER_EPS_M: no masks at or below this depth
+
+STAGES = ("geocode", "streetview", "forecast", "mask", "ai")
+
+
+class StageLimits:
+    """One semaphore per stage; run() also records the stage's wall time."""
+
+    def __init__(self, limits: dict):
+        self._sems = {name: threading.BoundedSemaphore(max(1, int(n))) for name, n in limits.items()}
+
+    def run(self, name: str, timings: dict, fn, *args, **kwargs):
+        with self._sems[name]:
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[name] = round(time.perf_counter() - t0, 3)
+
+
+class MaskWaiter:
+    """Collects mask-saved events from the Node SSE stream for uuids we expect."""
+
+    def __init__(self, base_url: str = BASE_URL):
+        self._lock = threading.Lock()
+        self._pending: dict[str, tuple[threading.Event, list]] = {}
+        start_mask_watcher(base_url, self._on_mask)
+
+    def expect(self, uuid: str):
+        with self._lock:
+            self._pending.setdefault(uuid, (threading.Event(), []))
+
+    def _on_mask(self, uuid, profile):
+        if "_naive" in (uuid or "").lower():
+            return
+        uuid = _normalize_uuid(uuid or "")
+        with self._lock:
+            entry = self._pending.get(uuid)
+        if entry:
+            entry[1].append(profile)
+            entry[0].set()
+
+    def wait(self, uuid: str, timeout: float) -> str | None:
+        """Profile of the first mask saved for uuid, or None on timeout."""
+        with self._lock:
+            event, profiles = self._pending.setdefault(uuid, (threading.Event(), []))
+        ok = event.wait(timeout)
+        with self._lock:
+            self._pending.pop(uuid, None)
+        return profiles[0] if ok and profiles else None
+
+
+# ------------------- input -------------------
+def read_rows(path: str) -> list[dict]:
+    """CSV rows as form payloads (the same dict shape AddressForm emits)."""
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for i, r in enumerate(csv.DictReader(f), start=1):
+            r = {k.strip().lower(): (v or "").strip() for k, v in r.items() if k}
+            depth = r.get("depth", "")
+            rows.append({
+                "row": i,
+                "date": r["date"],
+                "time": r.get("time") or "00:00",
+                "prefecture": r.get("prefecture", ""),
+                "city": r.get("city", ""),
+                "town": r.get("town", ""),
+                "address2": r.get("address2") or r.get("address", ""),
+                "mode": r.get("mode") or PerspectiveMode.BUILDING.value,
+                "timezone": r.get("timezone") or "JST",
+                "depth_override_enabled": depth != "",
+                "depth_override_value": float(depth) if depth else 0.0,
+            })
+    return rows
+
+
+# ------------------- one row -------------------
+def run_row(data: dict, limits: StageLimits, masks: MaskWaiter | None, args) -> dict:
+    with tracing.trace("batch.row", row=data["row"], address=buildAddress(data)) as root:
+        rec = _run_row(data, limits, masks, args)
+        rec["trace_id"] = root.trace_id
+        if rec["status"] != "ok":
+            root.set(error=rec.get("error"))
+            root.end(rec["status"])
+        return rec
+
+
+def _run_row(data: dict, limits: StageLimits, masks: MaskWaiter | None, args) -> dict:
+    timings = {}
+    rec = {"row": data["row"], "address": buildAddress(data),
+           "date": data["date"], "time": data["time"], "status": "ok", "timings": timings}
+    t0 = time.perf_counter()
+    try:
+        coords = limits.run("geocode", timings, pipeline.geocode, data)
+        rec["coords"] = coords
+        target_dt_utc, _ = dateConverter(data)
+
+        sv_job = pipeline.submit(limits.run, "streetview", timings,
+                                 pipeline.fetch_street_view, data, coords)
+        depth_job = pipeline.submit(limits.run, "forecast", timings,
+                                    pipeline.resolve_depth, data, coords, target_dt_utc)
+        try:
+            _, metas = sv_job.result()
+        except Exception as e:
+            depth_job.cancel()
+            rec["status"] = "no_pano" if _is_no_pano_error(e) else "error"
+            rec["error"] = str(e)
+            return rec
+        rec["uuids"] = [m["uuid"] for m in metas]
+        rec["images"] = [os.path.join(IMAGES_DIR, f"{u}_streetview.jpg") for u in rec["uuids"]]
+
+        try:
+            depth_value, dt_fetched, depth_time, resolution = depth_job.result()
+        except pipeline.NoForecastError as e:
+            rec["status"], rec["error"] = "no_forecast", str(e)
+            return rec
+        rec.update(depth_m=depth_value, resolution=resolution,
+                   forecast_run=dt_fetched.isoformat() if dt_fetched else None,
+                   depth_time=str(depth_time) if depth_time is not None else None)
+
+        if masks is None:
+            return rec
+        if abs(depth_value) <= MASK_MIN_DEPTH_M:
+            rec["mask"] = "skipped (depth below threshold)"
+            return rec
+
+        uuid = metas[0]["uuid"]
+        profile = limits.run("mask", timings, _render_mask, masks, uuid, metas,
+                             pipeline.depth_payload(depth_value, coords, metas[0]["lat"],
+                                                    metas[0]["lng"], metas[0]["size"]),
+                             args.mask_timeout)
+        rec["mask_profile"] = profile
+
+        if args.no_ai:
+            return rec
+        out_path = limits.run("ai", timings, _img2img, uuid, args.profile or profile)
+        rec["ai_image"] = str(out_path)
+        return rec
+    except Exception as e:
+        rec["status"], rec["error"] = "error", str(e)
+        return rec
+    finally:
+        rec["total_s"] = round(time.perf_counter() - t0, 3)
+
+
+def _render_mask(masks: MaskWaiter, uuid: str, metas: list, depth_payload: dict, timeout: float) -> str:
+    # the viewer renders masks for the last camera it received, so this stage is serialized
+    if not wait_for_ready(min_clients=1, min_ready=1, timeout_sec=30):
+        raise RuntimeError("no Cesium viewer connected to the Node server")
+    masks.expect(uuid)
+    with tracing.span("node.roundtrip", label="camera + depth"):
+        sendToNode(metas, API_URL)
+        sendToNode(depth_payload, API_URL)
+    with tracing.span("mask.wait", uuid=uuid):
+        profile = masks.wait(uuid, timeout)
+        if profile is None:
+            raise TimeoutError(f"no mask for {uuid} within {timeout:.0f}s")
+    return profile
+
+
+def _img2img(uuid: str, profile: str) -> str:
+    with tracing.span("img2img", uuid=uuid, profile=profile):
+        return generate_from_uuid(uuid, images_dir=IMAGES_DIR, profile=profile)
+
+
+# ------------------- main -------------------
+def _summary(records: list[dict]):
+    by_status = {}
+    for r in records:
+        by_status[r["status"]] = by_status.get(r["status"], 0) + 1
+    print("\n[batch] " + ", ".join(f"{k}: {v}" for k, v in sorted(by_status.items())))
+    for stage in STAGES:
+        ts = [r["timings"][stage] for r in records if stage in r["timings"]]
+        if ts:
+            print(f"[batch] {stage:<10} n={len(ts):<4} mean={sum(ts)/len(ts):.2f}s max={max(ts):.2f}s")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Run the Street2Sea pipeline for a CSV of addresses.")
+    p.add_argument("csv", help="input CSV (address,date,time[,timezone,mode,depth])")
+    p.add_argument("--manifest", default="batch_manifest.jsonl", help="output JSON-lines manifest")
+    p.add_argument("--jobs", type=int, default=4, help="rows in flight at once")
+    p.add_argument("--geocode", type=int, default=4, help="concurrent geocodes")
+    p.add_argument("--streetview", type=int, default=4, help="concurrent Street View fetches")
+    p.add_argument("--forecast", type=int, default=2, help="concurrent FTP/NetCDF lookups")
+    p.add_argument("--ai", type=int, default=1, help="concurrent img2img generations")
+    p.add_argument("--no-mask", action="store_true", help="skip the viewer mask and AI stages")
+    p.add_argument("--no-ai", action="store_true", help="skip img2img generation")
+    p.add_argument("--profile", choices=("underwater", "overwater"), default=None,
+                   help="img2img profile (default: follow the mask type)")
+    p.add_argument("--mask-timeout", type=float, default=120.0)
+    args = p.parse_args(argv)
+
+    rows = read_rows(args.csv)
+    if not rows:
+        print("[batch] no rows in", args.csv)
+        return 1
+
+    limits = StageLimits({"geocode": args.geocode, "streetview": args.streetview,
+                          "forecast": args.forecast, "mask": 1, "ai": args.ai})
+    masks = None if args.no_mask else MaskWaiter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.manifest)), exist_ok=True)
+    records = []
+    with open(args.manifest, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="batch") as pool:
+        futures = [pool.submit(run_row, data, limits, masks, args) for data in rows]
+        for n, fut in enumerate(as_completed(futures), start=1):
+            rec = fut.result()
+            records.append(rec)
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[batch] {n}/{len(rows)} row {rec['row']} {rec['status']} "
+                  f"({rec['total_s']:.1f}s) {rec['address']}")
+
+    _summary(records)
+    return 0 if all(r["status"] == "ok" for r in records) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# cancellation.py
+"""
+Cooperative cancellation for pipeline jobs.
+
+A CancelToken belongs to one submission. The token bound to the running job
+(see bind()) is picked up by http_client and the TE-Japan FTP download, and
+pipeline code checks it between stages, so a superseded submission stops at
+the next request, chunk or stage boundary.
+"""
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+class Cancelled(Exception):
+    """The submission this work belongs to was superseded or shut down."""
+
+
+class CancelToken:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                print(f"[cancel] callback failed for {self.label or 'job'}: {e}")
+
+    def on_cancel(self, cb):
+        """Run cb() once when cancelled (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled(self.label or "cancelled")
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to timeout seconds; True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current() -> CancelToken | None:
+    return _current.get()
+
+
+@contextmanager
+def bind(token: CancelToken | None):
+    """Make token the current one for this thread/context."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check():
+    """Raise Cancelled if the current token was cancelled."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
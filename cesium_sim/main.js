@@ -149,10 +149,37 @@ viewer.screenSpaceEventHandler.removeInputAction(Cesium.ScreenSpaceEventType.LEF
 }
 
 
-  initNodeStream(viewer, async (payload) => {
+  async function setCamera({ lat, lng, heading, fov }) {
+    const [pos2] = await Cesium.sampleTerrainMostDetailed(
+      viewer.terrainProvider,
+      [Cesium.Cartographic.fromDegrees(lng, lat)]
+    );
+    viewer.camera.setView({
+      destination: Cesium.Cartesian3.fromDegrees(lng, lat, pos2.height + 2.05),
+      orientation: { heading: Cesium.Math.toRadians(heading || 0), pitch: 0, roll: 0 }
+    });
+    viewer.camera.frustum.fov  = Cesium.Math.toRadians(fov || 120);
+    viewer.camera.frustum.near = 0.001;
+    viewer.camera.frustum.far  = viewer.scene.globe.ellipsoid.maximumRadius * 3.0;
+
+    viewer.scene.requestRender();
+  }
+
+  // Payloads are handled one at a time: several GUI sessions share this viewer,
+  // and a camera arriving mid-render would end up in another session's masks.
+  let queue = Promise.resolve();
+  initNodeStream(viewer, (payload) => {
+    queue = queue
+      .then(() => handlePayload(payload))
+      .catch((e) => console.error('[viewer] payload failed', e));
+  });
+
+  async function handlePayload(payload) {
     // DEPTH PAYLOAD
     if (payload && payload.type === 'depth') {
       const { location, lng, lat,size,value} = payload;
+      const uuid = payload.uuid || UUID;   // sessions / animation levels name their own masks
+      if (payload.camera) await setCamera(payload.camera);   // self-contained: camera + depth
 
       const depth = Number(value || 0);
 
@@ -198,7 +225,7 @@ const rect = rectFromCenterMeters_ENU(buildingLon, buildingLat, HALF_SIZE_METERS
                waterLevelUp: floodHeight,
               includeBuildings: true,
               includeTerrain: true,
-            }, `${UUID}_underwater_mask.png`, {
+            }, `${uuid}_underwater_mask.png`, {
               solidsStrength: 0.42,
               blurPx: 0
             });
@@ -208,14 +235,14 @@ const rect = rectFromCenterMeters_ENU(buildingLon, buildingLat, HALF_SIZE_METERS
               waterLevelUp: floodHeight,
               includeBuildings: true,
               includeTerrain: true,
-            }, `${UUID}_overwater_mask.png`);
+            }, `${uuid}_overwater_mask.png`);
 
             await captureAndSendIntersectedWaterMask(viewer, {
               rect,
               waterLevelUp: floodHeight,
               includeBuildings: false,
               includeTerrain: true,
-            }, `${UUID}_naive_overwater_mask.png`);
+            }, `${uuid}_naive_overwater_mask.png`);
           }
 // 
           });
@@ -236,7 +263,7 @@ const rect = rectFromCenterMeters_ENU(buildingLon, buildingLat, HALF_SIZE_METERS
       
       await nextFrame(viewer)
       await captureAndSendScene(viewer, {
-        filename: `${UUID}_scene.png`,
+        filename: `${uuid}_scene.png`,
         resolutionScale: 2,
         transparent: false,
         hideUI: true
@@ -263,22 +290,9 @@ const rect = rectFromCenterMeters_ENU(buildingLon, buildingLat, HALF_SIZE_METERS
 
     // CAMERA (array from metas)
     else if (Array.isArray(payload)) {
-      const { lat, lng, heading, fov, uuid } = payload[0];
+      const { uuid } = payload[0];
       if (uuid) UUID = uuid; // remember for filenames
-
-      const [pos2] = await Cesium.sampleTerrainMostDetailed(
-        viewer.terrainProvider,
-        [Cesium.Cartographic.fromDegrees(lng, lat)]
-      );
-      viewer.camera.setView({
-        destination: Cesium.Cartesian3.fromDegrees(lng, lat, pos2.height + 2.05),
-        orientation: { heading: Cesium.Math.toRadians(heading || 0), pitch: 0, roll: 0 }
-      });
-      viewer.camera.frustum.fov  = Cesium.Math.toRadians(fov || 120);
-      viewer.camera.frustum.near = 0.001;
-      viewer.camera.frustum.far  = viewer.scene.globe.ellipsoid.maximumRadius * 3.0;
-
-      viewer.scene.requestRender();
+      await setCamera(payload[0]);
     }
-  });
+  }
 })();
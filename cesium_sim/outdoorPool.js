@@ -0,0 +1,179 @@
+// outdoorPool.js (CommonJS)
+// Small pool of warm Puppeteer pages with the Maps JS API already loaded,
+// used by /find-outdoor-js instead of launching a browser per request.
+const puppeteer = require('puppeteer');
+
+const POOL_SIZE = Math.max(1, parseInt(process.env.OUTDOOR_POOL_SIZE, 10) || 2);
+const WARM_TIMEOUT_MS = 20000;
+
+// The search itself lives in the page as window.findOutdoor(params).
+function baseHtml(apiKey) {
+  return `
+<!doctype html><html><body>
+<div id="app"></div>
+<script>
+  window.__READY__ = false;
+  window.__mapsLoaded = () => { window.__READY__ = true; };
+</script>
+<script src="https://maps.googleapis.com/maps/api/js?key=${apiKey}&callback=__mapsLoaded" async></script>
+<script>
+  window.findOutdoor = async ({ lat, lng, target_date, radius, tolerance_m, max_hops }) => {
+    const toDate = (s) => { const m = /^([0-9]{4})(?:-([0-9]{2}))?/.exec(s); return m ? new Date(+m[1], (m[2]?+m[2]:1)-1, 1) : null; };
+    const targetDate = toDate(target_date);
+    const sv = new google.maps.StreetViewService();
+    const origin = new google.maps.LatLng(lat, lng);
+    function getPanorama(req){ return new Promise(r=>sv.getPanorama(req,(d,s)=>r(s==='OK'?d:null))); }
+    const seed = await getPanorama({ location: origin, radius, preference: 'nearest', source: google.maps.StreetViewSource.OUTDOOR });
+    if (!seed) return null;
+
+    const q = [{data: seed, depth: 0}], seen = new Set([seed.location.pano]);
+    let best = null, nearest = 1/0;
+    function dateOK(d){ const dt = toDate(d); return dt && dt <= targetDate ? dt : null; }
+    const dist = (a,b)=>{ const R=6371000, rd=x=>x*Math.PI/180;
+      const dφ=rd(b.lat()-a.lat()), dλ=rd(b.lng()-a.lng()), φ1=rd(a.lat()), φ2=rd(b.lat());
+      const x=Math.sin(dφ/2)**2 + Math.cos(φ1)*Math.cos(φ2)*Math.sin(dλ/2)**2;
+      return 2*R*Math.atan2(Math.sqrt(x), Math.sqrt(1-x)); };
+
+    while(q.length){
+      const {data, depth} = q.shift();
+      const ll = data.location.latLng;
+      const d = dist(origin, ll);
+      const dt = dateOK(data.imageDate);
+      if (dt){
+        if (d < nearest) nearest = d;
+        if (d <= nearest + tolerance_m){
+          if (!best || dt > best.dt || (dt.getTime()===best.dt.getTime() && d < best.d)){
+            best = { pid: data.location.pano, dt, d, ll };
+          }
+        }
+      }
+      if (depth >= max_hops) continue;
+      for (const link of (data.links||[])){
+        const pid = link.pano; if (!pid || seen.has(pid)) continue; seen.add(pid);
+        const next = await getPanorama({ pano: pid }); if (next) q.push({data: next, depth: depth+1});
+      }
+    }
+    return best ? { pano_id: best.pid, date: best.dt.toISOString().slice(0,7), lat: best.ll.lat(), lng: best.ll.lng() } : null;
+  };
+</script>
+</body></html>`.trim();
+}
+
+class OutdoorPagePool {
+  constructor({ size = POOL_SIZE, apiKey = process.env.GOOGLE_STREET_VIEW_API_KEY } = {}) {
+    this.size = size;
+    this.apiKey = apiKey;
+    this.browser = null;
+    this.launching = null;
+    this.idle = [];          // warm pages ready for use
+    this.waiters = [];       // resolve callbacks waiting for a page
+    this.live = 0;           // pages created or being created
+    this.closed = false;
+  }
+
+  async _browser() {
+    if (this.browser && this.browser.isConnected()) return this.browser;
+    if (!this.launching) {
+      this.launching = puppeteer.launch({ headless: 'new', args: ['--no-sandbox'] })
+        .then((b) => {
+          b.on('disconnected', () => {
+            // browser died: forget every page; the next acquire relaunches
+            if (this.browser === b) this.browser = null;
+            this.idle = [];
+            this.live = 0;
+          });
+          this.browser = b;
+          return b;
+        })
+        .finally(() => { this.launching = null; });
+    }
+    return this.launching;
+  }
+
+  async _newPage() {
+    const browser = await this._browser();
+    const page = await browser.newPage();
+    page.__broken = false;
+    page.on('error', () => { page.__broken = true; });      // renderer crash
+    page.on('pageerror', () => {});                          // script errors are per-request
+    await page.setContent(baseHtml(this.apiKey), { waitUntil: 'load' });
+    await page.waitForFunction('window.__READY__ === true', { timeout: WARM_TIMEOUT_MS });
+    return page;
+  }
+
+  async acquire() {
+    if (this.closed) throw new Error('pool closed');
+    const page = this.idle.pop();
+    if (page) return page;
+    if (this.live < this.size) {
+      this.live++;
+      try {
+        return await this._newPage();
+      } catch (e) {
+        this.live--;
+        this._wakeOne();
+        throw e;
+      }
+    }
+    return new Promise((resolve, reject) => this.waiters.push({ resolve, reject }));
+  }
+
+  release(page, broken = false) {
+    if (broken || page.__broken || page.isClosed() || this.closed) {
+      this.live = Math.max(0, this.live - 1);
+      page.close().catch(() => {});
+      this._wakeOne();
+      return;
+    }
+    const w = this.waiters.shift();
+    if (w) w.resolve(page);
+    else this.idle.push(page);
+  }
+
+  _wakeOne() {
+    // a slot opened up: hand a fresh page to the next waiter
+    const w = this.waiters.shift();
+    if (!w) return;
+    this.acquire().then(w.resolve, w.reject);
+  }
+
+  async find(params, timeoutMs = 15000) {
+    const page = await this.acquire();
+    let broken = false;
+    let timer;
+    try {
+      const timeout = new Promise((_, reject) => {
+        timer = setTimeout(() => reject(new Error(`find-outdoor timed out after ${timeoutMs} ms`)), timeoutMs);
+      });
+      return await Promise.race([
+        page.evaluate((p) => window.findOutdoor(p), params),
+        timeout,
+      ]);
+    } catch (e) {
+      broken = true;   // recycle: the page may still be busy or crashed
+      throw e;
+    } finally {
+      clearTimeout(timer);
+      this.release(page, broken);
+    }
+  }
+
+  async warm() {
+    const pages = [];
+    try {
+      for (let i = 0; i < this.size; i++) pages.push(await this.acquire());
+    } finally {
+      for (const p of pages) this.release(p);
+    }
+  }
+
+  async close() {
+    this.closed = true;
+    for (const w of this.waiters.splice(0)) w.reject(new Error('pool closed'));
+    this.idle = [];
+    if (this.browser) { try { await this.browser.close(); } catch (_) {} }
+    this.browser = null;
+  }
+}
+
+module.exports = { OutdoorPagePool };
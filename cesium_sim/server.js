@@ -5,7 +5,7 @@ const express = require('express');
 const fs = require('fs');
 const path = require('path');
 const { createProxyMiddleware } = require('http-proxy-middleware');
-const puppeteer = require('puppeteer');
+const { OutdoorPagePool } = require('./outdoorPool');
 
 const app = express();
 const PORT = process.env.PORT || 8000;
@@ -224,72 +224,22 @@ app.post('/save-mask', (req, res) => {
 });
 
 // ------------------------------------------------------------------
-// Puppeteer helper (unchanged behavior)
+// Puppeteer helper: warm page pool (Maps JS preloaded, pages reused)
 // ------------------------------------------------------------------
+const outdoorPool = new OutdoorPagePool();
+
 app.post('/find-outdoor-js', async (req, res) => {
   const { lat, lng, target_date, radius = 60, tolerance_m = 12, max_hops = 3 } = req.body || {};
   if (typeof lat !== 'number' || typeof lng !== 'number' || !target_date) {
     return res.status(400).json({ error: 'lat, lng, target_date required' });
   }
 
-  const html = `
-<!doctype html><html><body>
-<div id="app"></div>
-<script src="https://maps.googleapis.com/maps/api/js?key=${process.env.GOOGLE_STREET_VIEW_API_KEY}"></script>
-<script>
-  (async () => {
-    const toDate = (s) => { const m = /^([0-9]{4})(?:-([0-9]{2}))?/.exec(s); return m ? new Date(+m[1], (m[2]?+m[2]:1)-1, 1) : null; };
-    const targetDate = toDate(${JSON.stringify(target_date)});
-    const sv = new google.maps.StreetViewService();
-    const origin = new google.maps.LatLng(${lat}, ${lng});
-    function getPanorama(req){ return new Promise(r=>sv.getPanorama(req,(d,s)=>r(s==='OK'?d:null))); }
-    const seed = await getPanorama({ location: origin, radius: ${radius}, preference: 'nearest', source: google.maps.StreetViewSource.OUTDOOR });
-    if (!seed) return window.__OUT__ = null;
-
-    const q = [{data: seed, depth: 0}], seen = new Set([seed.location.pano]);
-    let best = null, nearest = 1/0;
-    function dateOK(d){ const dt = toDate(d); return dt && dt <= targetDate ? dt : null; }
-    const dist = (a,b)=>{ const R=6371000, rd=x=>x*Math.PI/180;
-      const dφ=rd(b.lat()-a.lat()), dλ=rd(b.lng()-a.lng()), φ1=rd(a.lat()), φ2=rd(b.lat());
-      const x=Math.sin(dφ/2)**2 + Math.cos(φ1)*Math.cos(φ2)*Math.sin(dλ/2)**2;
-      return 2*R*Math.atan2(Math.sqrt(x), Math.sqrt(1-x)); };
-
-    while(q.length){
-      const {data, depth} = q.shift();
-      const ll = data.location.latLng;
-      const d = dist(origin, ll);
-      const dt = dateOK(data.imageDate);
-      if (dt){
-        if (d < nearest) nearest = d;
-        if (d <= nearest + ${tolerance_m}){
-          if (!best || dt > best.dt || (dt.getTime()===best.dt.getTime() && d < best.d)){
-            best = { pid: data.location.pano, dt, d, ll };
-          }
-        }
-      }
-      if (depth >= ${max_hops}) continue;
-      for (const link of (data.links||[])){
-        const pid = link.pano; if (!pid || seen.has(pid)) continue; seen.add(pid);
-        const next = await getPanorama({ pano: pid }); if (next) q.push({data: next, depth: depth+1});
-      }
-    }
-    window.__OUT__ = best ? { pano_id: best.pid, date: best.dt.toISOString().slice(0,7), lat: best.ll.lat(), lng: best.ll.lng() } : null;
-  })();
-</script>
-</body></html>`.trim();
-
-  const browser = await puppeteer.launch({ headless: 'new', args: ['--no-sandbox'] });
   try {
-    const page = await browser.newPage();
-    await page.setContent(html, { waitUntil: 'load' });
-    await page.waitForFunction('window.__OUT__!==undefined', { timeout: 15000 });
-    const pano = await page.evaluate('window.__OUT__');
+    const pano = await outdoorPool.find({ lat, lng, target_date, radius, tolerance_m, max_hops });
     if (!pano) return res.status(404).json({ error: 'No outdoor pano on/before target_date' });
     res.json({ ok: true, pano });
   } catch (e) {
     res.status(500).json({ error: String(e) });
-  } finally {
-    await browser.close();
   }
 });
 
@@ -298,24 +248,30 @@ app.post('/find-outdoor-js', async (req, res) => {
 // ------------------------------------------------------------------
 app.post('/shutdown', (req, res) => {
   res.json({ ok: true });
-  setTimeout(() => {
+  setTimeout(async () => {
     for (const r of clients.values()) { try { r.end(); } catch (_) {} }
+    await outdoorPool.close();
     server.close(() => process.exit(0));
   }, 10);
 });
 
-process.on('SIGTERM', () => {
+process.on('SIGTERM', async () => {
   for (const r of clients.values()) { try { r.end(); } catch (_) {} }
+  await outdoorPool.close();
   server.close(() => process.exit(0));
 });
-process.on('SIGINT', () => {
+process.on('SIGINT', async () => {
   for (const r of clients.values()) { try { r.end(); } catch (_) {} }
+  await outdoorPool.close();
   server.close(() => process.exit(0));
 });
 
 // ------------------------------------------------------------------
 // Start
 // ------------------------------------------------------------------
-const server = app.listen(PORT, () =>
-  console.log(`→ http://${HOST}:${PORT}`)
-);
+const server = app.listen(PORT, () => {
+  console.log(`→ http://${HOST}:${PORT}`);
+  if (process.env.OUTDOOR_POOL_WARM === '1') {
+    outdoorPool.warm().catch((e) => console.error('[outdoor pool] warm-up failed:', e));
+  }
+});
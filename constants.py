@@ -12,6 +12,12 @@ class TEJapanFileType(Enum):
     DEPTH = "FLDDPH"
     FRACTION = "FLDFRC"
 
+class CacheDirectory(Enum):
+    STREETVIEW_IMAGES = "cache/streetview"
+    TILES_METADATA    = "cache/tiles_metadata.sqlite3"
+    RESULTS           = "cache/results"
+    STANDINS          = "cache/standins"
+
 class WebDirectory(Enum):
     PORT = "8000"
     HOST="localhost"
@@ -0,0 +1,233 @@
+# flood_animation.py
+"""
+Flood animation for one address across every lead time of a forecast run.
+
+    python flood_animation.py "東京都千代田区丸の内1-1" --date 2025-07-01 --time 09:00 --out flood.gif
+
+The expensive parts of a submission are shared by all frames:
+  - geocode, pano pick and Street View fetch happen once, and every depth
+    level is rendered from that one camera;
+  - the run's depth files come down over one FTP connection and the point
+    value for all hours is read in one NetCDF query;
+  - depths within --tolerance of an existing level share its mask, and a
+    level whose mask barely differs from the previous one reuses its AI image.
+
+So a 13-frame sweep costs one Street View fetch, a handful of mask renders
+and even fewer img2img calls, instead of 13 full submissions.
+
+Needs the Node server with a Cesium viewer connected (see batch.py).
+"""
+import os
+import sys
+import time
+import uuid as uuidlib
+import argparse
+
+from PIL import Image, ImageChops, ImageDraw
+
+import pipeline
+import tracing
+from batch import API_URL, IMAGES_DIR, MASK_MIN_DEPTH_M, MaskWaiter
+from constants import PerspectiveMode, TEJapanFileType
+from imageGen import generate_from_files
+from preprocessNCFile import getSeriesByCoordinates
+from pythonToJS import sendToNode, wait_for_ready
+from TEJapanAPI import find_and_download_run
+from utility import buildAddress, dateConverter
+
+DEPTH_TOLERANCE_M = float(os.getenv("ANIM_DEPTH_TOLERANCE_M", "0.05"))   # depths closer than this share a mask
+MASK_CHANGE_FRAC  = float(os.getenv("ANIM_MASK_CHANGE_FRAC", "0.002"))   # changed-pixel share that needs a new AI frame
+FRAME_MS = 600
+
+
+# ------------------- depth sweep -------------------
+def sweep_depths(coords: str, target_dt_utc, step_hours: int = 1):
+    """(run_dt, [(valid_time, depth_m), ...]) for every lead time of the run covering target_dt_utc."""
+    with tracing.span("forecast.sweep", target=str(target_dt_utc)) as sp:
+        run_dt, files = find_and_download_run(target_dt_utc, TEJapanFileType.DEPTH, step_hours)
+        if run_dt is None or not files:
+            raise pipeline.NoForecastError("no forecast run covers the selected hour")
+        with tracing.span("netcdf.query", files=len(files)):
+            series = getSeriesByCoordinates([p for _, p in files], coords)
+        if sp:
+            sp.set(run=str(run_dt), hours=len(series))
+        return run_dt, series
+
+
+def dedupe_levels(series: list, tolerance_m: float = DEPTH_TOLERANCE_M):
+    """
+    Distinct depth levels and, per frame, the index of its level (None: too
+    shallow for a mask). A depth joins the first level within tolerance_m.
+    """
+    levels, frame_levels = [], []
+    for _, depth in series:
+        if abs(depth) <= MASK_MIN_DEPTH_M:
+            frame_levels.append(None)
+            continue
+        for i, lvl in enumerate(levels):
+            if abs(lvl["depth"] - depth) <= tolerance_m:
+                frame_levels.append(i)
+                break
+        else:
+            levels.append({"depth": depth, "uuid": str(uuidlib.uuid4())})
+            frame_levels.append(len(levels) - 1)
+    return levels, frame_levels
+
+
+# ------------------- masks -------------------
+def render_masks(levels: list, metas: list, coords: str, masks: MaskWaiter, timeout: float):
+    """Render one mask per level from the shared camera; fills lvl['mask'] and lvl['profile']."""
+    if not wait_for_ready(min_clients=1, min_ready=1, timeout_sec=30):
+        raise RuntimeError("no Cesium viewer connected to the Node server")
+    cam = metas[0]
+    for lvl in levels:
+        masks.expect(lvl["uuid"])
+        payload = pipeline.depth_payload(lvl["depth"], coords, cam["lat"], cam["lng"], cam["size"],
+                                         uuid=lvl["uuid"], camera=cam)
+        with tracing.span("mask.wait", uuid=lvl["uuid"], depth=round(lvl["depth"], 3)):
+            sendToNode(payload, API_URL)
+            profile = masks.wait(lvl["uuid"], timeout)
+            if profile is None:
+                raise TimeoutError(f"no mask for depth {lvl['depth']:.2f} m within {timeout:.0f}s")
+        lvl["profile"] = profile
+        lvl["mask"] = os.path.join(IMAGES_DIR, f"{lvl['uuid']}_{profile}_mask.png")
+
+
+def mask_changed(a: str, b: str, min_frac: float = MASK_CHANGE_FRAC) -> bool:
+    """True when more than min_frac of the pixels differ between two masks."""
+    with Image.open(a) as ia, Image.open(b) as ib:
+        ma, mb = ia.convert("L"), ib.convert("L")
+        if ma.size != mb.size:
+            return True
+        diff = ImageChops.difference(ma, mb).point(lambda v: 255 if v > 32 else 0)
+        changed = diff.histogram()[255]
+    return changed > min_frac * ma.size[0] * ma.size[1]
+
+
+# ------------------- AI frames -------------------
+def generate_frames(levels: list, street_path: str, profile: str | None = None) -> int:
+    """
+    img2img per level in depth order, reusing the previous level's image when
+    the mask did not change. Fills lvl['ai']; returns the number of generations.
+    """
+    generated, prev = 0, None
+    for lvl in sorted(levels, key=lambda l: l["depth"]):
+        prof = profile or lvl["profile"]
+        if prev and prev["profile"] == prof and not mask_changed(prev["mask"], lvl["mask"]):
+            lvl["ai"] = prev["ai"]
+            continue
+        out = os.path.join(IMAGES_DIR, f"{lvl['uuid']}_ai.png")
+        with tracing.span("img2img", uuid=lvl["uuid"], profile=prof):
+            generate_from_files(street_path, lvl["mask"], out,
+                                canny_control_image=lvl["mask"], profile=prof)
+        lvl["ai"] = out
+        generated += 1
+        prev = lvl
+    return generated
+
+
+def assemble(frames: list, out_path: str, frame_ms: int = FRAME_MS):
+    """frames: [(image_path, caption)]; writes a looping GIF."""
+    images = []
+    size = None
+    for path, caption in frames:
+        with Image.open(path) as im:
+            im = im.convert("RGB")
+        size = size or im.size
+        if im.size != size:
+            im = im.resize(size)
+        draw = ImageDraw.Draw(im)
+        draw.rectangle((0, size[1] - 24, size[0], size[1]), fill=(0, 0, 0))
+        draw.text((8, size[1] - 19), caption, fill=(255, 255, 255))
+        images.append(im)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    images[0].save(out_path, save_all=True, append_images=images[1:],
+                   duration=frame_ms, loop=0, optimize=True)
+
+
+# ------------------- one address -------------------
+def run(data: dict, args) -> dict:
+    """Sweep, render and assemble; returns a summary dict with stage timings (seconds)."""
+    timings = {}
+
+    def timed(name, fn, *a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **kw)
+        finally:
+            timings[name] = round(time.perf_counter() - t0, 3)
+
+    masks = MaskWaiter()   # subscribe before anything can be rendered
+    with tracing.trace("animation", address=buildAddress(data)):
+        coords = timed("geocode", pipeline.geocode, data)
+        target_dt_utc, _ = dateConverter(data)
+
+        sv_job = pipeline.submit(timed, "streetview", pipeline.fetch_street_view, data, coords)
+        sweep_job = pipeline.submit(timed, "forecast", sweep_depths, coords, target_dt_utc, args.step)
+        _, metas = sv_job.result()
+        run_dt, series = sweep_job.result()
+        street_path = os.path.join(IMAGES_DIR, f"{metas[0]['uuid']}_streetview.jpg")
+
+        levels, frame_levels = dedupe_levels(series, args.tolerance)
+        print(f"[anim] run {run_dt:%Y-%m-%d %H:00} UTC: {len(series)} frames, {len(levels)} depth levels")
+
+        generated = 0
+        if levels:
+            timed("mask", render_masks, levels, metas, coords, masks, args.mask_timeout)
+            if not args.no_ai:
+                generated = timed("ai", generate_frames, levels, street_path, args.profile)
+
+        frames = []
+        for (t, depth), li in zip(series, frame_levels):
+            lvl = levels[li] if li is not None else None
+            if lvl is None:
+                path = street_path
+            elif args.no_ai:
+                path = lvl["mask"]
+            else:
+                path = lvl["ai"]
+            frames.append((path, f"{t:%m-%d %H:00} UTC  +{(t - run_dt).total_seconds() / 3600:.0f}h  {depth:.2f} m"))
+        timed("assemble", assemble, frames, args.out, args.frame_ms)
+
+    return {"out": args.out, "run": run_dt.isoformat(), "frames": len(frames),
+            "levels": len(levels), "generated": generated, "timings": timings}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Animate the flood forecast for one address across lead times.")
+    p.add_argument("address", help="full address line")
+    p.add_argument("--date", required=True, help="YYYY-MM-DD; picks the run covering this hour")
+    p.add_argument("--time", default="00:00", help="HH:MM")
+    p.add_argument("--timezone", default="JST", help="JST or UTC")
+    p.add_argument("--out", default="flood_animation.gif")
+    p.add_argument("--step", type=int, default=3, help="hours between frames")
+    p.add_argument("--tolerance", type=float, default=DEPTH_TOLERANCE_M,
+                   help="metres within which depths share a mask")
+    p.add_argument("--profile", choices=("underwater", "overwater"), default=None,
+                   help="img2img profile (default: follow the mask type)")
+    p.add_argument("--no-ai", action="store_true", help="animate the masks instead of AI frames")
+    p.add_argument("--frame-ms", type=int, default=FRAME_MS)
+    p.add_argument("--mask-timeout", type=float, default=120.0)
+    args = p.parse_args(argv)
+
+    data = {"date": args.date, "time": args.time, "timezone": args.timezone,
+            "prefecture": "", "city": "", "town": "", "address2": args.address,
+            "mode": PerspectiveMode.BUILDING.value,
+            "depth_override_enabled": False, "depth_override_value": 0.0}
+    try:
+        summary = run(data, args)
+    except pipeline.NoForecastError as e:
+        print("[anim]", e)
+        return 2
+    finally:
+        pipeline.shutdown()
+
+    t = summary["timings"]
+    print(f"[anim] wrote {summary['out']}: {summary['frames']} frames from "
+          f"{summary['levels']} masks and {summary['generated']} img2img calls")
+    print("[anim] " + ", ".join(f"{k} {v:.1f}s" for k, v in t.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# generation_queue.py
+"""
+AI generation queue, decoupled from the SSE reader.
+
+Mask events only enqueue a job; dedicated worker threads run the img2img
+calls, so a long generation no longer stalls event consumption.
+
+- Priority: lower runs first (the GUI uses 0 for the session on screen, 1
+  for the rest); reprioritize() re-ranks queued jobs, e.g. on a tab switch.
+  Equal priorities run in submission order.
+- Dedup: a (uuid, profile) already queued or running is not queued again.
+- Cancellation: cancel_stale(active) drops queued jobs whose uuid is no
+  longer wanted. A stale running job is interrupted only with a single
+  worker: the interrupt hook aborts whatever the backend is generating, which
+  with several workers may be another session's job. Otherwise it finishes
+  and is reported cancelled.
+
+Every state change is reported through on_status(job, state, detail).
+"""
+import os
+import time
+import heapq
+import itertools
+import threading
+
+AI_QUEUE_WORKERS = int(os.getenv("AI_QUEUE_WORKERS", "1"))   # one per GPU backend
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class GenJob:
+    __slots__ = ("uuid", "profile", "priority", "seq", "state", "ctx", "enqueued_at", "started_at")
+
+    def __init__(self, uuid: str, profile: str, priority: int, seq: int, ctx: dict):
+        self.uuid = uuid
+        self.profile = profile
+        self.priority = priority
+        self.seq = seq
+        self.state = QUEUED
+        self.ctx = ctx
+        self.enqueued_at = time.time()
+        self.started_at = None
+
+    @property
+    def key(self):
+        return (self.uuid, self.profile)
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class GenerationQueue:
+    def __init__(self, run, workers: int = AI_QUEUE_WORKERS, on_status=None, interrupt=None):
+        """
+        run(job) does the work on a worker thread; interrupt() aborts the
+        backend's in-flight generation when a running job goes stale (used
+        only with one worker, see cancel_stale()).
+        """
+        self._run = run
+        self._workers = max(1, workers)
+        self._on_status = on_status
+        self._interrupt = interrupt
+        self._cv = threading.Condition()
+        self._heap: list[GenJob] = []
+        self._jobs: dict[tuple, GenJob] = {}   # key -> queued or running job
+        self._seq = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+
+    # ---------- producer side ----------
+    def submit(self, uuid: str, profile: str, priority: int = 1, **ctx) -> GenJob | None:
+        """Queue a generation; None if the same (uuid, profile) is already queued or running."""
+        with self._cv:
+            if self._closed or (uuid, profile) in self._jobs:
+                return None
+            job = GenJob(uuid, profile, priority, next(self._seq), ctx)
+            self._jobs[job.key] = job
+            heapq.heappush(self._heap, job)
+            ahead = sum(1 for j in self._jobs.values() if j is not job and (j.state == RUNNING or j < job))
+            self._ensure_workers()
+            self._cv.notify()
+        self._status(job, QUEUED, f"{ahead} ahead" if ahead else "")
+        return job
+
+    def reprioritize(self, priority_for):
+        """Re-rank queued jobs with priority_for(uuid) -> int."""
+        with self._cv:
+            for job in self._heap:
+                job.priority = priority_for(job.uuid)
+            heapq.heapify(self._heap)
+
+    def cancel_stale(self, active) -> list[GenJob]:
+        """Drop queued jobs whose uuid is not in active; mark stale running ones cancelled."""
+        dropped, interrupt = [], False
+        with self._cv:
+            keep = []
+            for job in self._heap:
+                if job.uuid in active:
+                    keep.append(job)
+                else:
+                    job.state = CANCELLED
+                    self._jobs.pop(job.key, None)
+                    dropped.append(job)
+            if dropped:
+                self._heap = keep
+                heapq.heapify(self._heap)
+            for job in self._jobs.values():
+                if job.state == RUNNING and job.uuid not in active:
+                    job.state = CANCELLED   # the worker reports it when run() returns
+                    interrupt = self._workers == 1   # otherwise the interrupt could hit a live job
+        for job in dropped:
+            self._status(job, CANCELLED, "no longer needed")
+        if interrupt and self._interrupt:
+            self._interrupt()
+        return dropped
+
+    def pending(self) -> int:
+        with self._cv:
+            return len(self._jobs)
+
+    def shutdown(self):
+        with self._cv:
+            self._closed = True
+            self._heap.clear()
+            self._cv.notify_all()
+
+    # ---------- worker side ----------
+    def _ensure_workers(self):
+        while len(self._threads) < self._workers:
+            t = threading.Thread(target=self._loop, name=f"ai-queue-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _loop(self):
+        while True:
+            with self._cv:
+                while not self._heap and not self._closed:
+                    self._cv.wait()
+                if self._closed:
+                    return
+                job = heapq.heappop(self._heap)
+                job.state = RUNNING
+                job.started_at = time.time()
+            self._status(job, RUNNING, f"waited {job.started_at - job.enqueued_at:.1f}s")
+            try:
+                self._run(job)
+                state, detail = DONE, ""
+            except Exception as e:
+                state, detail = FAILED, str(e)
+            with self._cv:
+                self._jobs.pop(job.key, None)
+                if job.state == CANCELLED:
+                    state, detail = CANCELLED, "superseded while running"
+                job.state = state
+            if state == DONE:
+                detail = f"{time.time() - job.started_at:.1f}s"
+            self._status(job, state, detail)
+
+    def _status(self, job: GenJob, state: str, detail: str = ""):
+        if self._on_status:
+            try:
+                self._on_status(job, state, detail)
+            except Exception as e:
+                print(f"[AI queue] status callback failed: {e}")
@@ -1,29 +1,50 @@
 # googleAPI.py
 
 import os
-import requests
 import datetime
 import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 from dotenv import load_dotenv
 from pydantic import ValidationError
-from streetview import search_panoramas, get_panorama_meta, get_streetview
-from io import BytesIO
+from streetview import search_panoramas, get_panorama_meta
 from constants import PerspectiveMode
+import http_client
+import cancellation
+import quota
+from pano_cache import PANO_CACHE
+from image_cache import IMAGE_CACHE, SV_IMAGE_CACHE_ENABLED
+from singleflight import SingleFlight
+import tiles_api
+import pano_render
+import tracing
 
 # ------------------- env & globals -------------------
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_STREET_VIEW_API_KEY")
+# point at a local stand-in (see standins.py) for offline runs
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
 SV_USE_JS_OUTDOOR = os.getenv("SV_USE_JS_OUTDOOR", "0") == "1"
 SV_OUTDOOR_ENDPOINT = os.getenv("SV_OUTDOOR_ENDPOINT", "http://localhost:8000/find-outdoor-js")
 SV_JS_FALLBACK_TO_CORE = os.getenv("SV_JS_FALLBACK_TO_CORE", "1") == "1"
+# pano picker: "core" (streetview search), "tiles" (outdoor-only, Tiles API), "js" (node/Puppeteer)
+SV_PICKER = os.getenv("SV_PICKER", "js" if SV_USE_JS_OUTDOOR else "core").lower().strip()
+SV_OUTDOOR_MAX_HOPS = int(os.getenv("SV_OUTDOOR_MAX_HOPS", "3"))
+# render views locally from one equirect download instead of one Static API call per view
+SV_LOCAL_REPROJECT = os.getenv("SV_LOCAL_REPROJECT", "0") == "1"
+SV_BATCH_WORKERS = int(os.getenv("SV_BATCH_WORKERS", "8"))
 
 _meta_cache: dict[str, object] = {}
+_inflight = SingleFlight()   # shared by concurrent identical geocode/meta/search/image calls
 
 # ------------------- geocode -------------------
 def addressToCoordinates(address: str) -> str:
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    resp = requests.get(url, params={"address": address, "key": GOOGLE_API_KEY}, timeout=10)
+    return _inflight.do(("geocode", address), _geocode, address)
+
+def _geocode(address: str) -> str:
+    url = f"{GOOGLE_MAPS_BASE_URL}/maps/api/geocode/json"
+    resp = http_client.get(url, endpoint="geocode", params={"address": address, "key": GOOGLE_API_KEY})
     data = resp.json()
     if data.get("status") != "OK":
         err = data.get("error_message", "no details")
@@ -50,16 +71,38 @@ def haversine_and_bearing(lat1: float, lon1: float, lat2: float, lon2: float):
     bearing = (math.degrees(math.atan2(y, x)) + 360) % 360
     return dist, bearing
 
+def haversine_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine (metres); arguments broadcast like NumPy arrays."""
+    R = 6371000
+    φ1, φ2 = np.radians(lat1), np.radians(lat2)
+    dφ = φ2 - φ1
+    dλ = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dφ/2)**2 + np.cos(φ1)*np.cos(φ2)*np.sin(dλ/2)**2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def bearing_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized initial bearing (degrees, 0..360) from point 1 to point 2."""
+    φ1, φ2 = np.radians(lat1), np.radians(lat2)
+    Δλ = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    y = np.sin(Δλ) * np.cos(φ2)
+    x = np.cos(φ1)*np.sin(φ2) - np.sin(φ1)*np.cos(φ2)*np.cos(Δλ)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
 # ------------------- metadata -------------------
 def fetch_meta(pano_id: str):
+    if pano_id in _meta_cache:
+        return _meta_cache[pano_id]
+    return _inflight.do(("meta", pano_id), _fetch_meta_uncached, pano_id)
+
+def _fetch_meta_uncached(pano_id: str):
     if pano_id in _meta_cache:
         return _meta_cache[pano_id]
 
     def _fallback_from_google(pid: str):
-        raw = requests.get(
-            "https://maps.googleapis.com/maps/api/streetview/metadata",
+        raw = http_client.get(
+            f"{GOOGLE_MAPS_BASE_URL}/maps/api/streetview/metadata",
+            endpoint="sv_metadata",
             params={"pano": pid, "key": GOOGLE_API_KEY},
-            timeout=10,
         ).json()
         loc = raw.get("location") or {}
         return SimpleNamespace(
@@ -68,6 +111,7 @@ def fetch_meta(pano_id: str):
         )
 
     try:
+        quota.acquire("streetview_metadata")
         meta = get_panorama_meta(pano_id=pano_id, api_key=GOOGLE_API_KEY)
         if getattr(meta, "date", None) in (None, ""):
             fb = _fallback_from_google(pano_id)
@@ -82,6 +126,20 @@ def fetch_meta(pano_id: str):
     _meta_cache[pano_id] = meta
     return meta
 
+# ------------------- pano search (spatially cached) -------------------
+def _search_panoramas(lat: float, lon: float):
+    """Everything one search returns for (lat, lon); a cache hit returns that stored result."""
+    cached = PANO_CACHE.query(lat, lon)
+    if cached is not None:
+        return cached
+    return _inflight.do(("search", round(lat, 6), round(lon, 6)), _search_and_cache, lat, lon)
+
+def _search_and_cache(lat: float, lon: float):
+    quota.acquire("streetview_search")
+    panos = search_panoramas(lat=lat, lon=lon)
+    PANO_CACHE.put(lat, lon, panos)
+    return panos
+
 def _parse_pano_date(ds) -> datetime.date | None:
     if isinstance(ds, datetime.date):
         return ds.replace(day=1)
@@ -102,8 +160,9 @@ def _find_best_panorama_via_js(coordinates: str, target_date: str, tolerance_m:
 
     lat, lon = map(float, coordinates.split(","))
     try:
-        resp = requests.post(
+        resp = http_client.post(
             SV_OUTDOOR_ENDPOINT,
+            endpoint="sv_outdoor_js",
             json={
                 "lat": lat,
                 "lng": lon,
@@ -112,7 +171,6 @@ def _find_best_panorama_via_js(coordinates: str, target_date: str, tolerance_m:
                 "tolerance_m": int(tolerance_m),
                 "max_hops": 3
             },
-            timeout=30
         )
         resp.raise_for_status()
         body = resp.json()
@@ -138,7 +196,7 @@ def _find_best_panorama_via_js(coordinates: str, target_date: str, tolerance_m:
 def _find_best_panorama_core(coordinates: str, target_date: str, tolerance_m: float = 5.0):
     user_dt = datetime.date.fromisoformat(target_date)
     lat, lon = map(float, coordinates.split(","))
-    panos = search_panoramas(lat=lat, lon=lon)
+    panos = _search_panoramas(lat, lon)
 
     candidates = []
     for p in panos:
@@ -158,7 +216,10 @@ def _find_best_panorama_core(coordinates: str, target_date: str, tolerance_m: fl
 
     if not candidates:
         raise RuntimeError(f"No panoramas on or before {target_date}")
+    return _rank_candidates(candidates, tolerance_m)
 
+def _rank_candidates(candidates, tolerance_m: float):
+    """candidates: (date, dist, pano, meta). Nearest first, then the latest date within tolerance."""
     candidates.sort(key=lambda x: (x[1], -x[0].toordinal()))
     nearest_dist = candidates[0][1]
     close_enough = [c for c in candidates if (c[1] - nearest_dist) <= tolerance_m]
@@ -166,37 +227,110 @@ def _find_best_panorama_core(coordinates: str, target_date: str, tolerance_m: fl
     _best_dt, _best_dist, best_pano, best_meta = best
     return best_pano, best_meta
 
+# ------------------- pano selection (Tiles API outdoor path) -------------------
+def _find_best_panorama_tiles(coordinates: str, target_date: str, tolerance_m: float = 5.0,
+                              max_hops: int = SV_OUTDOOR_MAX_HOPS):
+    """
+    Outdoor-only picker in pure Python: seed from the Tiles panoIds lookup, BFS
+    over metadata links (cached), keep outdoor panos on/before target_date and
+    rank them like the core picker. Same search shape as /find-outdoor-js.
+    """
+    user_dt = datetime.date.fromisoformat(target_date)
+    lat, lon = map(float, coordinates.split(","))
+    seed = tiles_api.get_pano_id_near(lat, lon, radius_m=max(50, int(tolerance_m) + 50))
+    if not seed:
+        raise RuntimeError(f"No panoramas on or before {target_date} (outdoor)")
+
+    candidates = []
+    for m in tiles_api.collect_linked_metadata(seed, max_hops=max_hops):
+        if m.get("imageryType") != "outdoor":
+            continue
+        dt = _parse_pano_date(m.get("date"))
+        mlat, mlng = m.get("lat"), m.get("lng")
+        if not dt or dt > user_dt or mlat is None or mlng is None:
+            continue
+        pano = SimpleNamespace(pano_id=m.get("panoId"))
+        meta = SimpleNamespace(date=m.get("date"), location=SimpleNamespace(lat=mlat, lng=mlng))
+        candidates.append((dt, haversine(lat, lon, mlat, mlng), pano, meta))
+
+    if not candidates:
+        raise RuntimeError(f"No panoramas on or before {target_date} (outdoor)")
+    return _rank_candidates(candidates, tolerance_m)
+
 # ------------------- pano selection (wrapper) -------------------
+_PICKERS = {
+    "js": ("JS OUTDOOR route", _find_best_panorama_via_js),
+    "tiles": ("Tiles OUTDOOR picker", _find_best_panorama_tiles),
+}
+
 def _find_best_panorama(coordinates: str, target_date: str, tolerance_m: float = 5.0):
-    if SV_USE_JS_OUTDOOR:
-        try:
-            print("[SV] using JS OUTDOOR route…")
-            return _find_best_panorama_via_js(coordinates, target_date, tolerance_m)
-        except Exception as e:
-            print("[SV] JS OUTDOOR failed:", e)
-            if not SV_JS_FALLBACK_TO_CORE:
-                raise
-            print("[SV] falling back to core Python picker")
-    else:
-        print("[SV] using core Python picker")
-    return _find_best_panorama_core(coordinates, target_date, tolerance_m)
+    with tracing.span("pano_search", picker=SV_PICKER):
+        if SV_PICKER in _PICKERS:
+            label, picker = _PICKERS[SV_PICKER]
+            try:
+                print(f"[SV] using {label}…")
+                return picker(coordinates, target_date, tolerance_m)
+            except Exception as e:
+                print(f"[SV] {label} failed:", e)
+                if not SV_JS_FALLBACK_TO_CORE:
+                    raise
+                print("[SV] falling back to core Python picker")
+        else:
+            print("[SV] using core Python picker")
+        return _find_best_panorama_core(coordinates, target_date, tolerance_m)
 
 # ------------------- image fetch -------------------
+STATIC_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/streetview"
+
 def _fetch_image_bytes(pano_id: str, width: int, height: int, heading: int, pitch: int, fov: int) -> bytes:
-    pil_img = get_streetview(
-        pano_id=pano_id,
-        api_key=GOOGLE_API_KEY,
-        width=width,
-        height=height,
-        heading=heading,
-        pitch=pitch,
-        fov=fov,
+    """
+    Original JPEG bytes from the Street View Static API, untouched (no PIL decode/re-encode).
+    Served from the on-disk image cache when the same view was fetched before.
+    With SV_LOCAL_REPROJECT the view is rendered from the pano's cached equirect instead.
+    """
+    with tracing.span("image_fetch", pano_id=pano_id, heading=heading) as sp:
+        if SV_LOCAL_REPROJECT:
+            try:
+                img = pano_render.render_view_jpeg(pano_id, width, height, heading, pitch, fov)
+                if sp:
+                    sp.set(source="render")
+                return img
+            except Exception as e:
+                print(f"[SV] local reprojection failed for {pano_id}, using Static API:", e)
+        key = IMAGE_CACHE.key(pano_id, heading, pitch, fov, width, height)
+        if SV_IMAGE_CACHE_ENABLED:
+            cached = IMAGE_CACHE.get(key)
+            if cached is not None:
+                if sp:
+                    sp.set(source="cache")
+                return cached
+        if sp:
+            sp.set(source="static")
+        return _inflight.do(("image", key), _download_image, key, pano_id, width, height, heading, pitch, fov)
+
+def _download_image(key: str, pano_id: str, width: int, height: int, heading: int, pitch: int, fov: int) -> bytes:
+    resp = http_client.get(
+        STATIC_URL,
+        endpoint="sv_static",
+        params={
+            "pano": pano_id,
+            "size": f"{width}x{height}",
+            "heading": heading,
+            "pitch": pitch,
+            "fov": fov,
+            "key": GOOGLE_API_KEY,
+        },
     )
-    buf = BytesIO()
-    pil_img.save(buf, format="JPEG")
-    data = buf.getvalue()
-    buf.close()
-    return data
+    ctype = resp.headers.get("Content-Type", "")
+    if resp.status_code != 200 or not ctype.startswith("image/"):
+        raise RuntimeError(f"Street View image error {resp.status_code} for {pano_id}: {resp.text[:200]}")
+    if SV_IMAGE_CACHE_ENABLED:
+        IMAGE_CACHE.put(key, resp.content)
+    return resp.content
+
+def _fetch_image_view(pano_id: str, width: int, height: int, heading: int, pitch: int, fov: int) -> memoryview:
+    """Zero-copy view over the fetched JPEG (for save_images / QPixmap.loadFromData)."""
+    return memoryview(_fetch_image_bytes(pano_id, width, height, heading, pitch, fov))
 
 # ------------------- public API -------------------
 def getStreetViewByDate(
@@ -208,9 +342,10 @@ def getStreetViewByDate(
     fov: int = 120,
     heading: int = 0,
     pitch: int = 0,
+    resolved=None,
 ):
-    pano, meta = _find_best_panorama(coordinates, target_date, tolerance_m=tolerance_m)
-    img = _fetch_image_bytes(pano.pano_id, width, height, heading, pitch, fov)
+    pano, meta = resolved or _find_best_panorama(coordinates, target_date, tolerance_m=tolerance_m)
+    img = _fetch_image_view(pano.pano_id, width, height, heading, pitch, fov)
 
     mlat = getattr(getattr(meta, "location", SimpleNamespace()), "lat", None)
     mlng = getattr(getattr(meta, "location", SimpleNamespace()), "lng", None)
@@ -247,7 +382,15 @@ def getPanoramaByDateTiles(
     fov: int = 120,
     headings: list[int] = (0, 120, 240),
     pitch: int = 0,
+    resolved=None,
 ):
+    # resolve the pano once; every heading is a view of the same pano
+    if resolved is None:
+        try:
+            resolved = _find_best_panorama(coordinates, target_date, tolerance_m=tolerance_m)
+        except RuntimeError:
+            raise RuntimeError(f"No panoramas on or before {target_date} at any heading")
+
     images, metas = [], []
     for h in headings:
         try:
@@ -260,6 +403,7 @@ def getPanoramaByDateTiles(
                 heading=h,
                 pitch=pitch,
                 tolerance_m=tolerance_m,
+                resolved=resolved,
             )
             images.append(imgs[0])
             metas.append(mds[0])
@@ -278,9 +422,10 @@ def getStreetViewOfBuilding(
     height: int = 250,
     pitch: int = 0,
     fov: int = 120,
+    resolved=None,
 ):
     building_coords = coordinates
-    pano, meta = _find_best_panorama(coordinates, target_date, tolerance_m=tolerance_m)
+    pano, meta = resolved or _find_best_panorama(coordinates, target_date, tolerance_m=tolerance_m)
     mlat = getattr(getattr(meta, "location", SimpleNamespace()), "lat", None)
     mlng = getattr(getattr(meta, "location", SimpleNamespace()), "lng", None)
     if mlat is None or mlng is None:
@@ -289,7 +434,7 @@ def getStreetViewOfBuilding(
     addr_lat, addr_lng = map(float, building_coords.split(","))
     distance_m, bearing = haversine_and_bearing(mlat, mlng, addr_lat, addr_lng)
 
-    img = _fetch_image_bytes(pano.pano_id, width, height, int(bearing), pitch, fov)
+    img = _fetch_image_view(pano.pano_id, width, height, int(bearing), pitch, fov)
     metadata = {
         "pano_id": pano.pano_id,
         "date": getattr(meta, "date", None),
@@ -318,3 +463,124 @@ def getStreetView(
     if mode == PerspectiveMode.SURROUNDING.value:
         return getPanoramaByDateTiles(coordinates, target_date, tolerance_m, width, height, **kwargs)
     return getStreetViewOfBuilding(coordinates, target_date, tolerance_m, width, height, **kwargs)
+
+def getBestPanoramasBatch(
+    coordinates: list[str],
+    target_dates: list[str],
+    tolerance_m: float = 5.0,
+    max_workers: int = SV_BATCH_WORKERS,
+) -> list[dict | Exception | None]:
+    """
+    Choose the pano for many addresses at once (same rule as the core picker).
+    Searches are deduplicated per coordinate and metadata per pano_id; ranking is
+    a NumPy pass over the address x candidate matrix. Returns, per address, a
+    metadata dict with the building-facing heading, None when nothing is
+    on/before that address's target date, or the exception its search raised.
+    A failed pano metadata lookup only drops that pano from the candidates.
+    """
+    if len(coordinates) != len(target_dates):
+        raise ValueError("coordinates and target_dates must have the same length")
+    if not coordinates:
+        return []
+
+    addr = np.array([[float(v) for v in c.split(",")] for c in coordinates], dtype=float)
+    addr_lat, addr_lng = addr[:, 0], addr[:, 1]
+    target_ord = np.array([datetime.date.fromisoformat(d).toordinal() for d in target_dates])
+
+    # 1) one search per distinct location
+    keys = [f"{la:.6f},{lo:.6f}" for la, lo in addr]
+    unique_keys = list(dict.fromkeys(keys))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(_batch_search, unique_keys))
+    errors = {k: r for k, r in zip(unique_keys, results) if isinstance(r, Exception)}
+    panos_by_key = {k: ([] if k in errors else r) for k, r in zip(unique_keys, results)}
+
+    # 2) one metadata lookup per distinct pano that could be eligible
+    latest = datetime.date.fromordinal(int(target_ord.max()))
+    pano_ids, search_dates = [], {}
+    for panos in panos_by_key.values():
+        for p in panos:
+            if p.pano_id in search_dates:
+                continue
+            dt = _parse_pano_date(getattr(p, "date", None))
+            if dt is not None and dt > latest:
+                continue
+            search_dates[p.pano_id] = dt
+            pano_ids.append(p.pano_id)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        metas = dict(zip(pano_ids, pool.map(_batch_meta, pano_ids)))
+
+    # 3) candidate arrays
+    K = len(pano_ids)
+    cand_lat = np.full(K, np.nan)
+    cand_lng = np.full(K, np.nan)
+    cand_ord = np.full(K, np.iinfo(np.int64).max, dtype=np.int64)
+    for j, pid in enumerate(pano_ids):
+        meta = metas[pid]
+        loc = getattr(meta, "location", SimpleNamespace())
+        mlat, mlng = getattr(loc, "lat", None), getattr(loc, "lng", None)
+        if mlat is not None and mlng is not None:
+            cand_lat[j], cand_lng[j] = float(mlat), float(mlng)
+        dt = search_dates[pid] or _parse_pano_date(getattr(meta, "date", None))
+        if dt is not None:
+            cand_ord[j] = dt.toordinal()
+
+    col = {pid: j for j, pid in enumerate(pano_ids)}
+    member = np.zeros((len(coordinates), K), dtype=bool)
+    for i, k in enumerate(keys):
+        for p in panos_by_key[k]:
+            j = col.get(p.pano_id)
+            if j is not None:
+                member[i, j] = True
+
+    # 4) vectorized ranking: nearest, then latest date within tolerance
+    dist = haversine_np(addr_lat[:, None], addr_lng[:, None], cand_lat[None, :], cand_lng[None, :])
+    valid = member & np.isfinite(dist) & (cand_ord[None, :] <= target_ord[:, None])
+    dist_v = np.where(valid, dist, np.inf)
+    nearest = dist_v.min(axis=1, initial=np.inf)
+    with np.errstate(invalid="ignore"):   # inf - inf on rows with no candidate
+        close = valid & ((dist_v - nearest[:, None]) <= tolerance_m)
+    best_ord = np.where(close, cand_ord[None, :], -1).max(axis=1, initial=-1)
+    pick = close & (cand_ord[None, :] == best_ord[:, None])
+    best_j = np.argmin(np.where(pick, dist, np.inf), axis=1) if K else np.zeros(len(coordinates), dtype=int)
+    heading = bearing_np(cand_lat[None, :], cand_lng[None, :], addr_lat[:, None], addr_lng[:, None])
+
+    out = []
+    for i in range(len(coordinates)):
+        if keys[i] in errors:
+            out.append(errors[keys[i]])
+            continue
+        if not np.isfinite(nearest[i]):
+            out.append(None)
+            continue
+        j = int(best_j[i])
+        pid = pano_ids[j]
+        out.append({
+            "pano_id": pid,
+            "date": getattr(metas[pid], "date", None),
+            "lat": float(cand_lat[j]),
+            "lng": float(cand_lng[j]),
+            "heading": int(heading[i, j]),
+            "location": coordinates[i],
+            "distance_m": float(dist[i, j]),
+        })
+    return out
+
+def _batch_search(key: str):
+    """One batch search; returns the exception instead of raising so one row cannot sink the batch."""
+    try:
+        return _search_panoramas(*map(float, key.split(",")))
+    except cancellation.Cancelled:
+        raise
+    except Exception as e:
+        print(f"[SV batch] search failed for {key}: {e}")
+        return e
+
+def _batch_meta(pano_id: str):
+    try:
+        return fetch_meta(pano_id)
+    except cancellation.Cancelled:
+        raise
+    except Exception as e:
+        print(f"[SV batch] metadata failed for {pano_id}: {e}")
+        return None
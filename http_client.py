@@ -0,0 +1,193 @@
+# http_client.py
+"""
+Shared HTTP layer: one keep-alive requests.Session per host, bounded retries
+with jittered exponential backoff, per-endpoint timeouts and latency histograms.
+
+Call sites name an endpoint (e.g. "geocode", "webui") so that timeouts and
+retry policy live here instead of being scattered across modules.
+"""
+import os
+import time
+import random
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import quota
+import cancellation
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "8"))
+POOL_MAXSIZE     = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+BACKOFF_BASE_S   = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))
+BACKOFF_MAX_S    = float(os.getenv("HTTP_BACKOFF_MAX", "8.0"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT     = {"GET", "HEAD", "OPTIONS"}
+
+# latency bucket upper bounds in milliseconds (last bucket is +inf)
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    timeout: tuple          # (connect, read) seconds
+    retries: int = 2        # extra attempts after the first
+    retry_post: bool = False
+    api: str | None = None  # quota bucket (see quota.py), paced before every attempt
+
+
+ENDPOINTS = {
+    "default":        EndpointPolicy((5, 30)),
+    "geocode":        EndpointPolicy((5, 10), api="geocoding"),
+    "sv_metadata":    EndpointPolicy((5, 10), api="streetview_metadata"),
+    "sv_static":      EndpointPolicy((5, 20), api="streetview_static"),
+    "sv_outdoor_js":  EndpointPolicy((5, 30), retries=0),
+    "tiles_session":  EndpointPolicy((5, 10), retry_post=True, api="tiles"),
+    "tiles_metadata": EndpointPolicy((5, 10), api="tiles"),
+    "tiles_image":    EndpointPolicy((5, 20), api="tiles"),
+    "webui":          EndpointPolicy((10, 600), retries=1),
+    "node":           EndpointPolicy((2, 5), retries=1),
+    "node_health":    EndpointPolicy((0.25, 0.25), retries=0),
+    "node_wait":      EndpointPolicy((2, 62), retries=0),
+    "sse":            EndpointPolicy((5, 60), retries=0),
+}
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+_hist: dict[str, list[int]] = {}
+_hist_sum_ms: dict[str, float] = {}
+_hist_lock = threading.Lock()
+
+
+# ------------------- sessions -------------------
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def session_for(url: str) -> requests.Session:
+    """Keep-alive session for the URL's scheme://host:port (created on first use)."""
+    key = _host_key(url)
+    with _sessions_lock:
+        s = _sessions.get(key)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                  pool_maxsize=POOL_MAXSIZE,
+                                  max_retries=0)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _sessions[key] = s
+        return s
+
+
+def close_all():
+    with _sessions_lock:
+        for s in _sessions.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _sessions.clear()
+
+
+# ------------------- latency histograms -------------------
+def _observe(endpoint: str, elapsed_ms: float):
+    idx = bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+    with _hist_lock:
+        counts = _hist.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        counts[idx] += 1
+        _hist_sum_ms[endpoint] = _hist_sum_ms.get(endpoint, 0.0) + elapsed_ms
+
+
+def latency_histograms() -> dict:
+    """
+    Snapshot per endpoint: {"count", "mean_ms", "buckets": {"<=25ms": n, ..., ">60000ms": n}}.
+    """
+    labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+    out = {}
+    with _hist_lock:
+        for ep, counts in _hist.items():
+            n = sum(counts)
+            out[ep] = {
+                "count": n,
+                "mean_ms": (_hist_sum_ms.get(ep, 0.0) / n) if n else 0.0,
+                "buckets": dict(zip(labels, counts)),
+            }
+    return out
+
+
+def reset_histograms():
+    with _hist_lock:
+        _hist.clear()
+        _hist_sum_ms.clear()
+
+
+# ------------------- requests -------------------
+def _backoff(attempt: int, resp: requests.Response | None) -> float:
+    if resp is not None:
+        ra = resp.headers.get("Retry-After")
+        if ra and ra.isdigit():
+            return min(float(ra), BACKOFF_MAX_S)
+    # full jitter: uniform(0, base * 2^attempt), capped
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def _sleep(delay: float, cancel):
+    if cancel is None:
+        time.sleep(delay)
+    elif cancel.wait(delay):
+        cancel.raise_if_cancelled()
+
+
+def request(method: str, url: str, *, endpoint: str = "default", **kwargs) -> requests.Response:
+    """
+    Send through the shared per-host session. `timeout` defaults to the endpoint
+    policy; transient failures (connection errors, timeouts, 429/5xx) are retried
+    for idempotent methods, or for POST when the policy allows it.
+    """
+    policy = ENDPOINTS.get(endpoint, ENDPOINTS["default"])
+    cancel = kwargs.pop("cancel", None) or cancellation.current()
+    kwargs.setdefault("timeout", policy.timeout)
+    method = method.upper()
+    may_retry = method in IDEMPOTENT or policy.retry_post
+    attempts = 1 + (policy.retries if may_retry else 0)
+    sess = session_for(url)
+
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        if policy.api:
+            quota.acquire(policy.api)
+        t0 = time.perf_counter()
+        try:
+            resp = sess.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _observe(endpoint, (time.perf_counter() - t0) * 1000.0)
+            if last:
+                raise
+            _sleep(_backoff(attempt, None), cancel)
+            continue
+        _observe(endpoint, (time.perf_counter() - t0) * 1000.0)
+
+        if resp.status_code == 429 and policy.api:
+            quota.penalize(policy.api)
+        if resp.status_code in RETRY_STATUSES and not last:
+            resp.close()
+            _sleep(_backoff(attempt, resp), cancel)
+            continue
+        return resp
+
+
+def get(url: str, *, endpoint: str = "default", **kwargs) -> requests.Response:
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+
+def post(url: str, *, endpoint: str = "default", **kwargs) -> requests.Response:
+    return request("POST", url, endpoint=endpoint, **kwargs)
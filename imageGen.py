@@ -1,6 +1,9 @@
 
 # imageGen.py  (profiles: underwater / overwater) — safe with optional scripts
-import base64, json, os, re, requests
+import base64, json, os, re
+import http_client
+from webui_options import OptionsManager
+from webui_caps import CapabilityRegistry
 from pathlib import Path
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -129,19 +132,23 @@ if DEFAULT_PROFILE not in PROFILES:
 def _b64(path: str) -> str:
     return base64.b64encode(Path(path).read_bytes()).decode("utf-8")
 
-def _get(endpoint: str):
-    if not BASE_URL:
+def _get(endpoint: str, base: str | None = None):
+    return _get_path(f"/sdapi/v1/{endpoint.lstrip('/')}", base)
+
+def _get_path(path: str, base: str | None = None):
+    base = base or BASE_URL
+    if not base:
         raise RuntimeError("RUNPOD_URL/WEBUI_URL env is missing")
-    url = f"{BASE_URL}/sdapi/v1/{endpoint.lstrip('/')}"
-    r = requests.get(url, auth=AUTH, timeout=600)
+    r = http_client.get(f"{base}{path}", endpoint="webui", auth=AUTH)
     r.raise_for_status()
     return r.json()
 
-def _post(endpoint: str, payload: dict):
-    if not BASE_URL:
+def _post(endpoint: str, payload: dict, base: str | None = None):
+    base = base or BASE_URL
+    if not base:
         raise RuntimeError("RUNPOD_URL/WEBUI_URL env is missing")
-    url = f"{BASE_URL}/sdapi/v1/{endpoint.lstrip('/')}"
-    r = requests.post(url, json=payload, auth=AUTH, timeout=600)
+    url = f"{base}/sdapi/v1/{endpoint.lstrip('/')}"
+    r = http_client.post(url, endpoint="webui", json=payload, auth=AUTH)
     try:
         r.raise_for_status()
     except Exception:
@@ -149,42 +156,45 @@ def _post(endpoint: str, payload: dict):
         raise
     return r.json()
 
+def interrupt():
+    """Ask the WebUI to stop the generation in flight (no-op when idle)."""
+    try:
+        _post("interrupt", {})
+    except Exception as e:
+        print("[AI] interrupt failed:", e)
+
+OPTIONS = OptionsManager(get=lambda base, ep: _get(ep, base),
+                         post=lambda base, ep, payload: _post(ep, payload, base))
+
 def _set_options(clip_skip: int):
-    _post("options", {
+    # only differences are posted; a matching backend costs no request at all
+    OPTIONS.ensure(BASE_URL, {
         "sd_model_checkpoint": SDXL_BASE,
         "sd_vae": SDXL_VAE,
         "CLIP_stop_at_last_layers": clip_skip,
     })
 
-# ----- script discovery / optional features -----
-def _list_scripts():
-    # Return dict from /scripts with keys txt2img/img2img (if endpoint exists).
-    try:
-        s = _get("scripts")
-    except Exception:
-        return {}
-    return s if isinstance(s, dict) else {}
+# ----- capability discovery (scripts, samplers, schedulers, ControlNet) -----
+CAPS = CapabilityRegistry(fetch=lambda base, path: _get_path(path, base))
+_profiles_checked: dict[str, float] = {}   # backend -> capabilities snapshot already validated
+
+def check_profiles(base: str | None = None) -> list[str]:
+    """Validate PROFILES against the backend's capabilities; prints and returns the problems."""
+    base = base or BASE_URL
+    problems = CAPS.validate(base, PROFILES)
+    _profiles_checked[base] = CAPS.get(base).fetched_at
+    for p in problems:
+        print("[WebUI caps] ⚠", p)
+    return problems
 
-def _norm(s: str) -> str:
-    return re.sub(r"[\s_\-]+", "", s.lower())
+def _check_profiles_once():
+    caps = CAPS.get(BASE_URL)
+    if _profiles_checked.get(BASE_URL) != caps.fetched_at:
+        check_profiles(BASE_URL)
 
 def _find_script_key(keywords: list) -> str | None:
-    # Find an installed script whose name/title contains all keywords (case/space insensitive).
-    scripts = _list_scripts()
-    pools = []
-    for k in ("txt2img", "img2img"):
-        v = scripts.get(k) or []
-        if isinstance(v, list):
-            pools.extend(v)
-    needed = [_norm(k) for k in keywords]
-    for item in pools:
-        if isinstance(item, dict):
-            cand = item.get("name") or item.get("title") or ""
-        else:
-            cand = str(item)
-        if cand and all(k in _norm(cand) for k in needed):
-            return cand
-    return None
+    # Installed script whose name/title contains all keywords (case/space insensitive).
+    return CAPS.get(BASE_URL).find_script(keywords)
 
 # ----------------- optional features -----------------
 def _cn_unit_template():
@@ -313,6 +323,7 @@ def generate_from_files(street_image: str, mask_image: str, out_path: str,
     prof_key = (profile or DEFAULT_PROFILE).lower()
     prof_key = _ALIASES.get(prof_key, prof_key)
     prof = PROFILES[prof_key]
+    _check_profiles_once()
     _set_options(prof["clip_skip"])
 
     street_image = str(street_image)
@@ -358,7 +369,13 @@ def generate_from_files(street_image: str, mask_image: str, out_path: str,
     if units:
         payload["controlnet_units"] = units
 
-    result = _post("img2img", payload)
+    try:
+        result = _post("img2img", payload)
+    except Exception:
+        # the backend may have restarted or lost an extension; re-read it next time
+        OPTIONS.invalidate(BASE_URL)
+        CAPS.invalidate(BASE_URL)
+        raise
     infotext = None
     info_raw = result.get("info")
     if isinstance(info_raw, str):
@@ -1,24 +1,55 @@
 # saveImages.py
 import os
 import uuid
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 import base64
 
-def save_images(images: List[bytes], folder: str = "images", ext: str = "jpg") -> List[Dict[str, str]]:
+ImageBuffer = Union[bytes, memoryview]
+
+
+def as_bytes(img: ImageBuffer) -> bytes:
+    """
+    Return the bytes behind an image buffer. A memoryview over a whole bytes
+    object hands back that object (no copy); anything else is copied once.
+    """
+    if isinstance(img, memoryview):
+        if isinstance(img.obj, bytes) and img.nbytes == len(img.obj):
+            return img.obj
+        return img.tobytes()
+    return img
+
+
+def _link_same(src: str, path: str, img: ImageBuffer) -> bool:
+    """Hard-link src to path if it holds the same number of bytes as img (else False)."""
+    try:
+        if os.path.getsize(src) != memoryview(img).nbytes:
+            return False                       # e.g. a locally rendered view, not the cached download
+        os.link(src, path)
+        return True
+    except OSError:                            # gone meanwhile, or another filesystem
+        return False
+
+
+def save_images(images: List[ImageBuffer], folder: str = "images", ext: str = "jpg",
+                sources: List[Optional[str]] = None) -> List[Dict[str, str]]:
     """
-    Save each image to `folder` as <uuid>_streetview.<ext>.
+    Save each image (bytes or memoryview, written as-is) to `folder` as <uuid>_streetview.<ext>.
+    sources[i], when given, is a file already holding image i (the Street View
+    image cache); it is hard-linked under the new name instead of written again.
     Returns a list of dicts: {"uuid": "<uuid>", "filename": "<file>", "path": "<abs/rel path>"}.
     """
     os.makedirs(folder, exist_ok=True)
     saved = []
+    sources = sources or [None] * len(images)
 
-    for img_bytes in images:
+    for img_bytes, src in zip(images, sources):
         uid = str(uuid.uuid4())                # string → JSON-safe
         filename = f"{uid}_streetview.{ext}"
         path = os.path.join(folder, filename)
 
-        with open(path, "wb") as f:
-            f.write(img_bytes)
+        if not (src and _link_same(src, path, img_bytes)):
+            with open(path, "wb") as f:
+                f.write(img_bytes)
 
         saved.append({"uuid": uid, "filename": filename, "path": path})
 
@@ -0,0 +1,123 @@
+# image_cache.py
+"""
+Content-addressed on-disk cache of Street View Static images.
+
+Key = sha256 of (pano_id, heading, pitch, fov, width, height). Files live at
+<root>/<k[:2]>/<k>.jpg; recency is tracked with the file mtime so the LRU
+order survives restarts. The total size is kept under a byte budget.
+Only the in-memory index is touched under the lock; file reads, writes and
+deletes happen outside it.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from constants import CacheDirectory
+
+SV_IMAGE_CACHE_ENABLED = os.getenv("SV_IMAGE_CACHE", "1") == "1"
+SV_IMAGE_CACHE_MB      = float(os.getenv("SV_IMAGE_CACHE_MB", "512"))
+
+
+class ImageCache:
+    def __init__(self, root: str = CacheDirectory.STREETVIEW_IMAGES.value,
+                 max_bytes: int = int(SV_IMAGE_CACHE_MB * 1024 * 1024)):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] = OrderedDict()   # key -> size, oldest first
+        self._total = 0
+        self._loaded = False
+
+    @staticmethod
+    def key(pano_id: str, heading, pitch, fov, width, height) -> str:
+        raw = f"{pano_id}|{int(heading)}|{int(pitch)}|{int(fov)}|{int(width)}x{int(height)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.jpg"
+
+    def _load(self):
+        # scan once, oldest mtime first; the disk walk runs outside the lock
+        if self._loaded:
+            return
+        entries = []
+        if self.root.exists():
+            for p in self.root.glob("*/*.jpg"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, p.stem, st.st_size))
+        with self._lock:
+            if self._loaded:
+                return
+            for _mt, k, size in sorted(entries):
+                if k not in self._index:
+                    self._index[k] = size
+                    self._total += size
+            self._loaded = True
+
+    def get(self, key: str) -> bytes | None:
+        self._load()
+        with self._lock:
+            if key not in self._index:
+                return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        return data
+
+    def cached_path(self, pano_id: str, heading, pitch, fov, width, height) -> str | None:
+        """Path of the cached file for this view, or None if it isn't cached."""
+        key = self.key(pano_id, heading, pitch, fov, width, height)
+        self._load()
+        with self._lock:
+            if key not in self._index:
+                return None
+        path = self._path(key)
+        return str(path) if path.exists() else None
+
+    def put(self, key: str, data: bytes):
+        self._load()
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total += len(data)
+            evicted = self._evict_locked()
+        for old in evicted:
+            try:
+                self._path(old).unlink()
+            except OSError:
+                pass
+
+    def _evict_locked(self) -> list[str]:
+        """Drop the oldest keys beyond the byte budget; the caller deletes their files."""
+        evicted = []
+        while self._total > self.max_bytes and len(self._index) > 1:
+            old, size = self._index.popitem(last=False)
+            self._total -= size
+            evicted.append(old)
+        return evicted
+
+    def stats(self) -> dict:
+        self._load()
+        with self._lock:
+            return {"entries": len(self._index), "bytes": self._total, "max_bytes": self.max_bytes}
+
+
+IMAGE_CACHE = ImageCache()
@@ -13,6 +13,7 @@ from constants import PerspectiveMode
 from cesiumViewer import CesiumViewer
 from imageViewer import ImageViewerDialog
 from connector_overlay import ConnectorOverlay
+from imageUtility import as_bytes
 
 from pathlib import Path
 
@@ -43,6 +44,9 @@ class ClickCatcher(QWidget):
 
 class AddressForm(AddressFormUI):
     data_submitted = pyqtSignal(dict)
+    speculate = pyqtSignal(dict)   # form looks complete: warm the pipeline before Submit
+    session_selected = pyqtSignal(int)
+    session_closed = pyqtSignal(int)
 
     def __init__(self):
         super().__init__()
@@ -58,7 +62,11 @@ class AddressForm(AddressFormUI):
         self.postal.editingFinished.connect(self.lookup_postal)
         self.postal.textChanged.connect(self.update_submit_state)
         self.address2.textChanged.connect(self.update_submit_state)
+        self.address2.editingFinished.connect(self._maybe_speculate)
         self.submit_btn.clicked.connect(self._on_submit)
+        self.session_tabs.currentChanged.connect(self._on_tab_changed)
+        self.session_tabs.tabCloseRequested.connect(
+            lambda i: self.session_closed.emit(self.session_tabs.tabData(i)))
         self.tz_combo.currentIndexChanged.connect(self.update_submit_state)
         self.date_edit.dateChanged.connect(self.update_submit_state)
         self.time_edit.timeChanged.connect(self.update_submit_state)
@@ -169,16 +177,19 @@ class AddressForm(AddressFormUI):
         self.town_en.setText(self.converter.do(r['address3']))
         self.log.append(f"Address found: {r['address1']} {r['address2']} {r['address3']}")
         self.update_submit_state()
+        self._maybe_speculate()
+
+    def _maybe_speculate(self):
+        if self.submit_btn.isEnabled():
+            self.speculate.emit(self._collect_payload())
 
     # ---------- submit ----------
-    def _on_submit(self):
-        self.log.clear()   
+    def _collect_payload(self) -> dict:
         mode = (
             PerspectiveMode.SURROUNDING if self.rb_surrounding.isChecked()
             else PerspectiveMode.BUILDING
         )
-        self.log.append("Input Form submitted.")
-        payload = {
+        return {
             'date': self.date_edit.date().toString('yyyy-MM-dd'),
             'time': self.time_edit.time().toString('HH:mm'),
             'postal_code': self.postal.text().strip(),
@@ -194,10 +205,70 @@ class AddressForm(AddressFormUI):
             'depth_override_enabled': self.depth_override_cb.isChecked(),
             'depth_override_value': float(self.depth_override_spin.value()),
         }
-        self.submit_btn.setEnabled(False)
-        self.connector.reset(quiet=True)  # <— quiet reset (static lines)
-        self.data_submitted.emit(payload)
-        
+
+    def _on_submit(self):
+        # stays enabled: every submission opens its own session tab
+        self.data_submitted.emit(self._collect_payload())
+
+    # ---------- session tabs ----------
+    def add_session_tab(self, sid: int, label: str):
+        tabs = self.session_tabs
+        tabs.blockSignals(True)   # the first addTab selects the tab before it has data
+        i = tabs.addTab(label)
+        tabs.setTabData(i, sid)
+        tabs.setTabToolTip(i, label)
+        tabs.blockSignals(False)
+        tabs.show()
+        if tabs.currentIndex() == i:
+            self._on_tab_changed(i)
+        else:
+            tabs.setCurrentIndex(i)
+
+    def _tab_index(self, sid: int) -> int:
+        for i in range(self.session_tabs.count()):
+            if self.session_tabs.tabData(i) == sid:
+                return i
+        return -1
+
+    def set_session_badge(self, sid: int, label: str):
+        i = self._tab_index(sid)
+        if i >= 0:
+            self.session_tabs.setTabText(i, label)
+
+    def remove_session_tab(self, sid: int):
+        i = self._tab_index(sid)
+        if i >= 0:
+            self.session_tabs.removeTab(i)
+        self.session_tabs.setVisible(self.session_tabs.count() > 0)
+
+    def current_session_id(self):
+        i = self.session_tabs.currentIndex()
+        return self.session_tabs.tabData(i) if i >= 0 else None
+
+    def _on_tab_changed(self, i: int):
+        sid = self.session_tabs.tabData(i) if i >= 0 else None
+        if sid is not None:
+            self.session_selected.emit(sid)
+
+    def show_session(self, images, metas, ai_image, log_lines):
+        """Put a session's images and log into the panels (nothing is appended to its log)."""
+        if images:
+            self.set_street_images(images, metas)
+        else:
+            self.street_images, self.street_meta = [], []
+            self.current_uuid = None
+            self._current_street_pix = QPixmap()
+            self.img1_label.clear()
+            self.img2_label.clear()
+            self.prev_btn.hide()
+            self.next_btn.hide()
+        self._current_ai_pix = QPixmap()
+        if ai_image:
+            self.display_ai_image(ai_image)
+        self.log.clear()
+        for line in log_lines:
+            self.log.append(line)
+
 
     # ---------- Cesium embedding ----------
     def ensure_map_started(self):
@@ -274,7 +345,7 @@ class AddressForm(AddressFormUI):
             self._update_cesium_frame_size()
 
     def _show_current_street(self):
-        img_bytes = self.street_images[self.current_street_index]
+        img_bytes = as_bytes(self.street_images[self.current_street_index])
         pix = QPixmap()
         if pix.loadFromData(img_bytes):
             self._current_street_pix = pix
@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (
     QDateEdit, QLineEdit, QPushButton, QTextEdit, QLabel,
     QSizePolicy, QRadioButton, QButtonGroup, QTimeEdit, QComboBox,
     QApplication, QDesktopWidget, QCheckBox, QDoubleSpinBox, QFrame,
-    QGraphicsDropShadowEffect, QAbstractSpinBox, QStyleFactory, QProxyStyle
+    QGraphicsDropShadowEffect, QAbstractSpinBox, QStyleFactory, QProxyStyle, QTabBar
 )
 from PyQt5.QtCore import QDate, QTime, Qt, QEvent, QRect, QRectF, QPoint, QLineF
 from PyQt5.QtGui import QColor, QPainter, QPalette, QPolygon, QPainterPath, QPen
@@ -336,6 +336,14 @@ class AddressFormUI(QWidget):
 
         root.addLayout(top)
 
+        # one tab per submitted address; the panels below show the selected one
+        self.session_tabs = QTabBar()
+        self.session_tabs.setTabsClosable(True)
+        self.session_tabs.setExpanding(False)
+        self.session_tabs.setDocumentMode(True)
+        self.session_tabs.hide()
+        root.addWidget(self.session_tabs)
+
         bottom = QHBoxLayout()
         bottom.addWidget(self._make_image_panel("Street-View", "img1_label",
                                                "Google Street View for the entered address."), 0)
@@ -0,0 +1,183 @@
+# pano_cache.py
+"""
+Geohash-keyed cache of panorama search results.
+
+A search_panoramas() call returns the nearest pano to its query point plus
+that pano's links, not everything within some radius, so a cached search
+only answers for its own query point. Each result is stored in the geohash
+cell of that point; a later query reuses the nearest cached search (looked
+up in the surrounding 3x3 cells) whose query point lies within
+PANO_REUSE_M, and gets that search's full pano list back unchanged. The
+default treats geocodes a few metres apart (same building, repeated batch
+rows) as the same point.
+"""
+import os
+import math
+import time
+import threading
+from types import SimpleNamespace
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+PANO_CACHE_PRECISION = int(os.getenv("SV_PANO_CACHE_PRECISION", "7"))      # ~150 m cells
+PANO_CACHE_TTL_S     = float(os.getenv("SV_PANO_CACHE_TTL_H", "168")) * 3600
+PANO_REUSE_M         = float(os.getenv("SV_PANO_REUSE_M", "5"))            # 0 = exact query point only
+
+
+# ------------------- geohash -------------------
+def geohash_encode(lat: float, lon: float, precision: int = PANO_CACHE_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+def geohash_bbox(gh: str):
+    """(lat_lo, lat_hi, lon_lo, lon_hi) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in gh:
+        v = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (v >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def geohash_neighbors(gh: str) -> list[str]:
+    """The cell itself plus its 8 neighbours."""
+    lat_lo, lat_hi, lon_lo, lon_hi = geohash_bbox(gh)
+    dlat, dlon = lat_hi - lat_lo, lon_hi - lon_lo
+    clat, clon = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+    cells = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            lat = max(-89.999999, min(89.999999, clat + i * dlat))
+            lon = ((clon + j * dlon + 180.0) % 360.0) - 180.0
+            cells.append(geohash_encode(lat, lon, len(gh)))
+    return list(dict.fromkeys(cells))
+
+
+def _dist_m(lat1, lon1, lat2, lon2) -> float:
+    R = 6371000
+    φ1, φ2 = math.radians(lat1), math.radians(lat2)
+    dφ = φ2 - φ1
+    dλ = math.radians(lon2 - lon1)
+    a = math.sin(dφ/2)**2 + math.cos(φ1)*math.cos(φ2)*math.sin(dλ/2)**2
+    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+# ------------------- cache -------------------
+class PanoSpatialCache:
+    def __init__(self, precision: int = PANO_CACHE_PRECISION, ttl_s: float = PANO_CACHE_TTL_S,
+                 reuse_m: float = PANO_REUSE_M):
+        self.precision = precision
+        self.ttl_s = ttl_s
+        self.reuse_m = reuse_m
+        self._cells: dict[str, list[dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, lat: float, lon: float, panos):
+        """Store one search result. `panos` are streetview Panorama objects or dicts."""
+        entry = {
+            "lat": lat, "lon": lon,
+            "ts": time.time(),
+            "panos": [self._to_record(p) for p in panos],
+        }
+        gh = geohash_encode(lat, lon, self.precision)
+        with self._lock:
+            self._cells.setdefault(gh, []).append(entry)
+
+    def query(self, lat: float, lon: float):
+        """
+        The full pano list of the nearest cached search made within reuse_m
+        of (lat, lon), else None (cache miss).
+        """
+        now = time.time()
+        gh = geohash_encode(lat, lon, self.precision)
+        with self._lock:
+            best, best_d = None, None
+            for cell in geohash_neighbors(gh):
+                live = [e for e in self._cells.get(cell, ()) if now - e["ts"] <= self.ttl_s]
+                if not live:
+                    self._cells.pop(cell, None)
+                    continue
+                self._cells[cell] = live
+                for e in live:
+                    d = _dist_m(lat, lon, e["lat"], e["lon"])
+                    if d <= self.reuse_m and (best_d is None or d < best_d):
+                        best, best_d = e, d
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [SimpleNamespace(**r) for r in best["panos"]]
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            for cell in list(self._cells):
+                live = [e for e in self._cells[cell] if now - e["ts"] <= self.ttl_s]
+                if live:
+                    self._cells[cell] = live
+                else:
+                    del self._cells[cell]
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = sum(len(v) for v in self._cells.values())
+            return {"cells": len(self._cells), "searches": n, "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _to_record(p) -> dict:
+        get = p.get if isinstance(p, dict) else (lambda k, d=None: getattr(p, k, d))
+        date = get("date")
+        return {
+            "pano_id": get("pano_id"),
+            "lat": get("lat"),
+            "lon": get("lon", get("lng")),
+            "heading": get("heading"),
+            "date": str(date) if date is not None else None,
+        }
+
+
+PANO_CACHE = PanoSpatialCache()
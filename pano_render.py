@@ -0,0 +1,160 @@
+# pano_render.py
+"""
+Local perspective rendering from a pano's full equirectangular image.
+
+The equirect is assembled once from Tiles API tiles; every view after that
+(any heading / pitch / fov / size) is a NumPy remap with bilinear sampling.
+Camera ray grids depend only on (fov, width, height) and are cached.
+"""
+import os
+import math
+import threading
+import contextvars
+from io import BytesIO
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import tiles_api
+from singleflight import SingleFlight
+
+SV_EQUIRECT_ZOOM      = os.getenv("SV_EQUIRECT_ZOOM", "")          # "" = pick from output size
+SV_EQUIRECT_CACHE     = int(os.getenv("SV_EQUIRECT_CACHE", "4"))   # panos kept in memory
+SV_EQUIRECT_WORKERS   = int(os.getenv("SV_EQUIRECT_WORKERS", "8"))
+SV_RENDER_JPEG_QUALITY = int(os.getenv("SV_RENDER_JPEG_QUALITY", "92"))
+
+_tile_pool = ThreadPoolExecutor(max_workers=SV_EQUIRECT_WORKERS, thread_name_prefix="pano-tiles")
+_equirects: OrderedDict = OrderedDict()   # (pano_id, zoom) -> (array, pano_heading)
+_equirects_lock = threading.Lock()
+_inflight = SingleFlight()
+
+
+# ------------------- equirect download -------------------
+def _max_zoom(meta: dict) -> int:
+    iw = int(meta.get("imageWidth") or 16384)
+    tw = int(meta.get("tileWidth") or 512)
+    return max(0, int(round(math.log2(max(1, iw // tw)))))
+
+
+def pick_zoom(meta: dict, width: int, fov: float) -> int:
+    """Lowest zoom whose angular resolution matches the requested view."""
+    if SV_EQUIRECT_ZOOM:
+        return min(int(SV_EQUIRECT_ZOOM), _max_zoom(meta))
+    tw = int(meta.get("tileWidth") or 512)
+    need_w = 360.0 * width / max(1.0, float(fov))
+    z = max(0, math.ceil(math.log2(max(1.0, need_w / tw))))
+    return min(z, _max_zoom(meta))
+
+
+def _assemble(pano_id: str, meta: dict, zoom: int) -> np.ndarray:
+    iw = int(meta.get("imageWidth") or 16384)
+    ih = int(meta.get("imageHeight") or iw // 2)
+    tw = int(meta.get("tileWidth") or 512)
+    th = int(meta.get("tileHeight") or 512)
+    scale = 2 ** (_max_zoom(meta) - zoom)
+    w, h = max(1, iw // scale), max(1, ih // scale)
+    cols, rows = math.ceil(w / tw), math.ceil(h / th)
+
+    # each tile inherits the caller's cancel token and trace span
+    jobs = {(x, y): _tile_pool.submit(contextvars.copy_context().run, tiles_api.get_pano_tile, pano_id, zoom, x, y)
+            for y in range(rows) for x in range(cols)}
+    canvas = Image.new("RGB", (cols * tw, rows * th))
+    try:
+        for (x, y), fut in jobs.items():
+            with Image.open(BytesIO(fut.result())) as tile:
+                canvas.paste(tile.convert("RGB"), (x * tw, y * th))
+    finally:
+        for fut in jobs.values():
+            fut.cancel()   # a failed or cancelled tile makes the rest pointless
+    return np.asarray(canvas.crop((0, 0, w, h)))
+
+
+def get_equirect(pano_id: str, zoom: int | None = None, *, width: int = 640, fov: float = 90):
+    """
+    (equirect HxWx3 uint8, pano_heading_deg) for a pano; downloaded once per (pano, zoom).
+    """
+    meta = tiles_api.get_tiles_metadata_by_panoid(pano_id)
+    if not meta:
+        raise RuntimeError(f"No Tiles metadata for {pano_id}")
+    z = pick_zoom(meta, width, fov) if zoom is None else zoom
+    key = (pano_id, z)
+    with _equirects_lock:
+        if key in _equirects:
+            _equirects.move_to_end(key)
+            return _equirects[key]
+
+    def _load():
+        arr = _assemble(pano_id, meta, z)
+        entry = (arr, float(meta.get("heading") or 0.0))
+        with _equirects_lock:
+            _equirects[key] = entry
+            while len(_equirects) > SV_EQUIRECT_CACHE:
+                _equirects.popitem(last=False)
+        return entry
+
+    return _inflight.do(key, _load)
+
+
+# ------------------- reprojection -------------------
+@lru_cache(maxsize=32)
+def _camera_rays(fov: float, width: int, height: int) -> np.ndarray:
+    """Unit ray per output pixel in camera space (x right, y up, z forward)."""
+    f = (width / 2.0) / math.tan(math.radians(fov) / 2.0)
+    xs = (np.arange(width, dtype=np.float32) - (width - 1) / 2.0)
+    ys = ((height - 1) / 2.0 - np.arange(height, dtype=np.float32))
+    x, y = np.meshgrid(xs, ys)
+    rays = np.stack([x, y, np.full_like(x, f)], axis=-1)
+    rays /= np.linalg.norm(rays, axis=-1, keepdims=True)
+    rays.setflags(write=False)
+    return rays
+
+
+def render_perspective(equirect: np.ndarray, pano_heading: float, heading: float,
+                       pitch: float, fov: float, width: int, height: int) -> np.ndarray:
+    """
+    Perspective view (HxWx3 uint8) looking at compass `heading`, `pitch` up,
+    horizontal `fov`, like the Static API. Column 0 of the equirect is
+    pano_heading - 180°.
+    """
+    rays = _camera_rays(float(fov), int(width), int(height))
+    p = math.radians(pitch)
+    cp, sp = math.cos(p), math.sin(p)
+    x = rays[..., 0]
+    y = rays[..., 1] * cp + rays[..., 2] * sp
+    z = -rays[..., 1] * sp + rays[..., 2] * cp
+
+    yaw = np.degrees(np.arctan2(x, z)) + heading          # compass degrees
+    lat = np.degrees(np.arcsin(np.clip(y, -1.0, 1.0)))
+
+    H, W = equirect.shape[:2]
+    u = (((yaw - (pano_heading - 180.0)) % 360.0) / 360.0) * W - 0.5
+    v = ((90.0 - lat) / 180.0) * H - 0.5
+    v = np.clip(v, 0, H - 1)
+
+    u0 = np.floor(u).astype(np.int64)
+    v0 = np.floor(v).astype(np.int64)
+    du = (u - u0)[..., None].astype(np.float32)
+    dv = (v - v0)[..., None].astype(np.float32)
+    u0 %= W
+    u1 = (u0 + 1) % W
+    v1 = np.minimum(v0 + 1, H - 1)
+
+    def px(vv, uu):
+        return equirect[vv, uu].astype(np.float32)   # gather first, cast only the samples
+
+    top = px(v0, u0) * (1 - du) + px(v0, u1) * du
+    bot = px(v1, u0) * (1 - du) + px(v1, u1) * du
+    out = top * (1 - dv) + bot * dv
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+
+def render_view_jpeg(pano_id: str, width: int, height: int, heading: float, pitch: float, fov: float) -> bytes:
+    """Static-API-compatible JPEG rendered locally from the cached equirect."""
+    equirect, pano_heading = get_equirect(pano_id, width=width, fov=fov)
+    arr = render_perspective(equirect, pano_heading, heading, pitch, fov, width, height)
+    buf = BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=SV_RENDER_JPEG_QUALITY)
+    return buf.getvalue()
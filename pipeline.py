@@ -0,0 +1,147 @@
+# pipeline.py
+"""
+Qt-free pipeline stages shared by the GUI worker and headless tools.
+
+Dependency graph of one submission:
+
+    geocode ──┬── street view (pick pano, fetch images, save_images)
+              └── forecast (TE-Japan FTP download, NetCDF depth lookup)
+
+Only geocode is a real dependency, so the two branches run concurrently on
+a shared pool and the submission takes as long as the slower branch.
+
+Whole submissions run on a fixed-size job pool under a CancelToken; branches
+inherit the token, so HTTP and FTP calls stop once the job is superseded.
+"""
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import cancellation
+import tracing
+
+from googleAPI import addressToCoordinates, getStreetView
+from TEJapanAPI import find_and_download_flood_data
+from preprocessNCFile import openClosestFile, getNearestValueByCoordinates
+from imageUtility import save_images
+from image_cache import IMAGE_CACHE, SV_IMAGE_CACHE_ENABLED
+from constants import TEJapanFileType
+from utility import buildAddress
+
+PIPELINE_JOB_WORKERS    = int(os.getenv("PIPELINE_JOB_WORKERS", "4"))   # submissions in flight at once
+PIPELINE_BRANCH_WORKERS = int(os.getenv("PIPELINE_BRANCH_WORKERS", "8"))
+SV_TOLERANCE_M = 15
+SV_SIZE = 640
+
+_job_pool = ThreadPoolExecutor(max_workers=PIPELINE_JOB_WORKERS, thread_name_prefix="pipeline-job")
+_branch_pool = ThreadPoolExecutor(max_workers=PIPELINE_BRANCH_WORKERS, thread_name_prefix="pipeline")
+
+
+class NoForecastError(RuntimeError):
+    """No TE-Japan forecast covers the requested hour."""
+
+
+def run_job(token: cancellation.CancelToken, fn, *args, **kwargs) -> Future:
+    """Run a whole submission on the job pool with token bound as the current one."""
+    def _run():
+        with cancellation.bind(token):
+            token.raise_if_cancelled()
+            return fn(*args, **kwargs)
+    fut = _job_pool.submit(_run)
+    token.on_cancel(fut.cancel)   # drop it if it is still queued
+    return fut
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run a branch of the current job; it inherits the caller's cancel token."""
+    ctx = contextvars.copy_context()
+    return _branch_pool.submit(ctx.run, fn, *args, **kwargs)
+
+
+def shutdown():
+    _job_pool.shutdown(wait=False, cancel_futures=True)
+    _branch_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- stages ----------
+def geocode(data: dict, prefetcher=None) -> str:
+    address = buildAddress(data)
+    with tracing.span("geocode", address=address) as sp:
+        coords = prefetcher.coords_for(address) if prefetcher else None
+        if sp:
+            sp.set(prefetched=bool(coords))
+        return coords or addressToCoordinates(address)
+
+
+def fetch_street_view(data: dict, coords: str, prefetcher=None):
+    """(images, metas) with each image saved and its uuid stamped into the meta."""
+    with tracing.span("streetview", mode=data["mode"]):
+        tiles, metas = getStreetView(
+            coords,
+            target_date=data["date"],
+            mode=data["mode"],
+            tolerance_m=SV_TOLERANCE_M,
+            width=SV_SIZE,
+            height=SV_SIZE,
+            resolved=prefetcher.pano_for(coords, data["date"]) if prefetcher else None,
+        )
+        cancellation.check()
+        with tracing.span("save_images", count=len(tiles)):
+            saved = save_images(tiles, sources=[_cached_image(m) for m in metas])
+        for meta, s in zip(metas, saved):
+            meta["type"] = "camera"
+            meta["uuid"] = s["uuid"]
+        return tiles, metas
+
+
+def _cached_image(meta: dict) -> str | None:
+    """The image cache's file for this view, so save_images can link it instead of rewriting it."""
+    if not SV_IMAGE_CACHE_ENABLED:
+        return None
+    try:
+        return IMAGE_CACHE.cached_path(meta["pano_id"], meta["heading"], meta["pitch"],
+                                       meta["fov"], meta["width"], meta["height"])
+    except KeyError:
+        return None
+
+
+def resolve_depth(data: dict, coords: str, target_dt_utc, prefetcher=None):
+    """(depth_value, dt_fetched, depth_time, resolution); raises NoForecastError."""
+    if data.get("depth_override_enabled"):
+        return float(data.get("depth_override_value", 0.0)), None, None, "override"
+
+    with tracing.span("forecast", target=str(target_dt_utc)) as sp:
+        got = prefetcher.forecast_for(target_dt_utc) if prefetcher else None
+        if sp:
+            sp.set(prefetched=bool(got))
+        dt_fetched, resolution = got or find_and_download_flood_data(target_dt_utc)
+        if dt_fetched is None or resolution is None:
+            raise NoForecastError("no forecast for the selected hour")
+
+        cancellation.check()
+        with tracing.span("netcdf.open"):
+            ds_depth = openClosestFile(TEJapanFileType.DEPTH, target_dt_utc)
+        with tracing.span("netcdf.query"):
+            depth_value, depth_time = getNearestValueByCoordinates(ds_depth, coords, target_dt_utc)
+        return float(depth_value), dt_fetched, depth_time, resolution
+
+
+def depth_payload(depth_value: float, coords: str, lat, lng, size, uuid=None, camera=None) -> dict:
+    """
+    Depth message for the Node viewer. Masks are named after uuid and rendered
+    from camera (a Street View meta); without them the viewer falls back to
+    the last camera it was sent.
+    """
+    payload = {
+        "type": "depth",
+        "value": float(depth_value),
+        "location": coords,
+        "lat": lat,
+        "lng": lng,
+        "size": size,
+    }
+    if uuid:
+        payload["uuid"] = uuid
+    if camera:
+        payload["camera"] = {k: camera.get(k) for k in ("lat", "lng", "heading", "fov", "uuid")}
+    return payload
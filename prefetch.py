@@ -0,0 +1,146 @@
+# prefetch.py
+"""
+Speculative pipeline warm-up while the user is still filling in the form.
+
+As soon as an address is complete, geocode it, resolve the pano for the
+selected date and make sure the forecast file for the selected hour is local.
+handle_form/FormWorker then take those results instead of redoing the work.
+Each speculation is keyed by its inputs; a newer one cancels the old
+(pending stages are dropped, running stages stop at the next stage boundary).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from googleAPI import addressToCoordinates, _find_best_panorama
+from TEJapanAPI import find_and_download_flood_data
+from utility import buildAddress, dateConverter
+
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "3"))
+PREFETCH_TOLERANCE_M = 15   # must match FormWorker's getStreetView tolerance
+
+
+class _Speculation:
+    def __init__(self, address: str, target_date: str, target_dt_utc, want_forecast: bool):
+        self.address = address
+        self.target_date = target_date
+        self.target_dt_utc = target_dt_utc
+        self.want_forecast = want_forecast
+        self.cancelled = threading.Event()
+        self.coords: Future | None = None
+        self.pano: Future | None = None
+        self.forecast: Future | None = None
+
+    def key(self):
+        return (self.address, self.target_date, self.target_dt_utc, self.want_forecast)
+
+    def cancel(self):
+        self.cancelled.set()
+        for fut in (self.coords, self.pano, self.forecast):
+            if fut is not None:
+                fut.cancel()
+
+
+class SpeculativePrefetcher:
+    def __init__(self, max_workers: int = PREFETCH_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._current: _Speculation | None = None
+
+    # ---------- start / cancel ----------
+    def speculate(self, data: dict):
+        """Start warming for this form payload (no-op if already warming the same inputs)."""
+        try:
+            address = buildAddress(data)
+            target_dt_utc, _ = dateConverter(data)
+        except Exception:
+            return
+        if not data.get("address2", "").strip():
+            return
+        spec = _Speculation(address, data["date"], target_dt_utc,
+                            want_forecast=not data.get("depth_override_enabled"))
+
+        with self._lock:
+            if self._current and self._current.key() == spec.key() and not self._current.cancelled.is_set():
+                return
+            if self._current:
+                self._current.cancel()
+            self._current = spec
+
+            print(f"[prefetch] warming {address} @ {spec.target_date}")
+            spec.coords = self._pool.submit(self._geocode, spec)
+            spec.pano = self._pool.submit(self._resolve_pano, spec)
+            if spec.want_forecast:
+                spec.forecast = self._pool.submit(self._forecast, spec)
+
+    def cancel(self):
+        with self._lock:
+            if self._current:
+                self._current.cancel()
+            self._current = None
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- stages ----------
+    @staticmethod
+    def _geocode(spec: _Speculation) -> str:
+        return addressToCoordinates(spec.address)
+
+    @staticmethod
+    def _resolve_pano(spec: _Speculation):
+        coords = spec.coords.result()
+        if spec.cancelled.is_set():
+            raise RuntimeError("speculation cancelled")
+        return coords, _find_best_panorama(coords, spec.target_date, tolerance_m=PREFETCH_TOLERANCE_M)
+
+    @staticmethod
+    def _forecast(spec: _Speculation):
+        if spec.cancelled.is_set():
+            raise RuntimeError("speculation cancelled")
+        return find_and_download_flood_data(spec.target_dt_utc)
+
+    # ---------- consume ----------
+    def _matching(self):
+        with self._lock:
+            spec = self._current
+        if spec is None or spec.cancelled.is_set():
+            return None
+        return spec
+
+    @staticmethod
+    def _result(fut: Future | None):
+        if fut is None or fut.cancelled():
+            return None
+        try:
+            return fut.result()
+        except Exception as e:
+            print("[prefetch] speculative stage failed; doing it live:", e)
+            return None
+
+    def coords_for(self, address: str) -> str | None:
+        spec = self._matching()
+        if spec is None or spec.address != address:
+            return None
+        return self._result(spec.coords)
+
+    def pano_for(self, coords: str, target_date: str):
+        """(pano, meta) if speculation resolved it for these coords/date, else None."""
+        spec = self._matching()
+        if spec is None or spec.target_date != target_date:
+            return None
+        got = self._result(spec.pano)
+        if not got or got[0] != coords:
+            return None
+        return got[1]
+
+    def forecast_for(self, target_dt_utc):
+        """(run_dt, resolution) from find_and_download_flood_data, or None."""
+        spec = self._matching()
+        if spec is None or spec.target_dt_utc != target_dt_utc:
+            return None
+        got = self._result(spec.forecast)
+        if not got or got[0] is None:
+            return None
+        return got
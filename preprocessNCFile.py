@@ -102,6 +102,38 @@ def getNearestValueByCoordinates(dataset, coordinates, target_time):
 
     return value, nearest_time
 
+def getSeriesByCoordinates(paths, coordinates):
+    """
+    Nearest-cell value at coordinates for every file in paths. The point is
+    selected in each file first (runs may mix 15S and 01M grids) and only the
+    per-file series are stacked along time.
+    Returns [(time, value), ...] in time order; fill values read as 0, and
+    times with no value (NaN) are left out rather than read as dry.
+    """
+    if isinstance(coordinates, str):
+        lat, lon = map(float, coordinates.split(","))
+    else:
+        lat = coordinates["latitude"]
+        lon = coordinates["longitude"]
+
+    points = []
+    for p in paths:
+        with xr.open_dataset(p, engine="netcdf4") as ds:
+            var = list(ds.data_vars)[0]
+            pt = ds[var].sel(lat=lat, lon=lon, method="nearest").load()
+        points.append(pt.drop_vars(["lat", "lon"]))
+    point = xr.concat(points, dim="time").sortby("time")
+
+    values = point.values.reshape(-1)
+    times = pd.to_datetime(point.coords["time"].values)
+    series = []
+    for t, v in zip(times, values):
+        if np.isnan(v):
+            print(f"⚠ no depth value at {t} for {lat},{lon}; skipping")
+            continue
+        series.append((t.to_pydatetime(), float(v) if v < 1e19 else 0.0))
+    return series
+
 def floodVolumeProxy(depth,fraction):
     effective_volume = depth * fraction
     return effective_volume
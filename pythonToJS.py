@@ -1,6 +1,8 @@
 # node_runner.py
 import os, sys, time, json, signal, atexit, pathlib, subprocess, platform
 import requests
+import http_client
+import tracing
 from constants import WebDirectory
 
 BASE_URL = f"http://{WebDirectory.HOST.value}:{WebDirectory.PORT.value}"
@@ -11,7 +13,7 @@ _PROC = None  # child node process handle
 
 def _server_alive(timeout=0.25) -> bool:
     try:
-        r = requests.get(HEALTH_URL, timeout=timeout)
+        r = http_client.get(HEALTH_URL, endpoint="node_health", timeout=timeout)
         return r.text.strip() == "OK"
     except Exception:
         return False
@@ -20,7 +22,7 @@ def _server_alive(timeout=0.25) -> bool:
 def _best_effort_shutdown():
     """Ask an existing server (if any) to exit via /shutdown. Ignore errors."""
     try:
-        requests.post(BASE_URL + "/shutdown", timeout=0.6)
+        http_client.post(BASE_URL + "/shutdown", endpoint="node", timeout=0.6)
         time.sleep(0.4)
     except Exception:
         pass
@@ -148,11 +150,11 @@ def _cleanup():
 
 def sendToNode(payload, api_url):
     try:
-        r = requests.post(
+        r = http_client.post(
             api_url,
+            endpoint="node",
             headers={"Content-Type": "application/json"},
             data=json.dumps(payload),
-            timeout=5,
         )
         r.raise_for_status()
         print("Server replied →", r.json())
@@ -163,7 +165,7 @@ def sendToNode(payload, api_url):
 def wait_health(url: str, tries: int = 60, delay: float = 0.15):
     for _ in range(tries):
         try:
-            if requests.get(url, timeout=0.25).text.strip() == "OK":
+            if http_client.get(url, endpoint="node_health").text.strip() == "OK":
                 return
         except requests.RequestException:
             pass
@@ -175,8 +177,9 @@ BASE_URL = f"http://{WebDirectory.HOST.value}:{WebDirectory.PORT.value}"
 
 def wait_for_ready(min_clients: int = 1, min_ready: int = 1, timeout_sec: float = 12.0) -> bool:
     try:
-        r = requests.post(
+        r = http_client.post(
             BASE_URL + "/wait",
+            endpoint="node_wait",
             params={"min": min_clients, "minReady": min_ready, "timeout": int(timeout_sec * 1000)},
             timeout=timeout_sec + 2,
         )
@@ -186,12 +189,15 @@ def wait_for_ready(min_clients: int = 1, min_ready: int = 1, timeout_sec: float
     
 
 def _wait_and_send(API_URL, bus, payload, label="payload"):
-    ok = wait_for_ready(min_clients=1, min_ready=1, timeout_sec=30)
-    if ok:
-        bus.progress.emit(f"✅ Viewer ready; sending {label}.")
-    else:
-        bus.progress.emit(f"⚠ Viewer not ready; sending {label} anyway (may be missed without replay).")
-    try:
-        sendToNode(payload, API_URL)
-    except Exception as e:
-        bus.progress.emit(f"POST failed for {label}: {e}")
\ No newline at end of file
+    with tracing.span("node.roundtrip", label=label) as sp:
+        ok = wait_for_ready(min_clients=1, min_ready=1, timeout_sec=30)
+        if sp:
+            sp.set(viewer_ready=ok)
+        if ok:
+            bus.progress.emit(f"✅ Viewer ready; sending {label}.")
+        else:
+            bus.progress.emit(f"⚠ Viewer not ready; sending {label} anyway (may be missed without replay).")
+        try:
+            sendToNode(payload, API_URL)
+        except Exception as e:
+            bus.progress.emit(f"POST failed for {label}: {e}")
\ No newline at end of file
@@ -0,0 +1,171 @@
+# quota.py
+"""
+Client-side quota governor for the Google Maps APIs.
+
+One token bucket per API with a sustained QPS, a burst size and an optional
+daily budget. acquire() never fails on rate: it reserves the next slot and
+sleeps until it is due, so bursts are smoothed into a steady stream instead
+of hitting 429s. Only an exhausted daily budget raises QuotaExceeded. The
+sleep wakes early when the calling job's cancel token fires; the slot is
+handed back and Cancelled raised.
+
+"streetview_search" paces the streetview package's search_panoramas, which
+calls an unofficial Maps endpoint with no published quota; it is paced
+anyway so a large batch can't get the client throttled.
+
+Configure per API via env, e.g. GMP_QPS_GEOCODING=20, GMP_BURST_GEOCODING=40,
+GMP_DAILY_GEOCODING=10000 (0 = no daily cap).
+"""
+import os
+import time
+import datetime
+import threading
+from collections import deque
+from zoneinfo import ZoneInfo
+
+import cancellation
+
+# Google resets daily quotas at midnight Pacific time
+_QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+
+APIS = ("geocoding", "streetview_static", "streetview_metadata", "streetview_search", "tiles")
+
+_DEFAULT_QPS = {
+    "geocoding": 10.0,
+    "streetview_static": 20.0,
+    "streetview_metadata": 20.0,
+    "streetview_search": 10.0,
+    "tiles": 20.0,
+}
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, name: str, qps: float, burst: float, daily_budget: int = 0):
+        self.name = name
+        self.qps = max(0.01, float(qps))
+        self.burst = max(1.0, float(burst))
+        self.daily_budget = int(daily_budget)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._day = self._today()
+        self._used_today = 0
+        self._waiting = 0
+        self._waited_s = 0.0
+        self._recent = deque()   # monotonic timestamps of grants in the last 60 s
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> datetime.date:
+        return datetime.datetime.now(_QUOTA_TZ).date()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.qps)
+        self._last = now
+        day = self._today()
+        if day != self._day:
+            self._day = day
+            self._used_today = 0
+        while self._recent and now - self._recent[0] > 60.0:
+            self._recent.popleft()
+
+    def acquire(self, n: int = 1) -> float:
+        """
+        Reserve n requests; blocks until they may be sent. Returns seconds waited.
+        Raises Cancelled (and returns the slot) if the current job is cancelled meanwhile.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.daily_budget and self._used_today + n > self.daily_budget:
+                raise QuotaExceeded(
+                    f"{self.name}: daily budget of {self.daily_budget} requests exhausted"
+                )
+            self._used_today += n
+            self._tokens -= n            # may go negative = queued reservations
+            wait = max(0.0, -self._tokens / self.qps)
+            self._recent.append(now + wait)
+            self._waiting += 1
+        token = cancellation.current()
+        cancelled = False
+        try:
+            if wait > 0:
+                if token is not None:
+                    cancelled = token.wait(wait)
+                else:
+                    time.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._waited_s += wait
+                if cancelled:
+                    self._tokens += n
+                    self._used_today = max(0, self._used_today - n)
+        if cancelled:
+            token.raise_if_cancelled()
+        return wait
+
+    def penalize(self):
+        """Server said 429: drop any banked burst so the next calls pace at qps."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+    def utilisation(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            recent = sum(1 for t in self._recent if t <= now)
+            return {
+                "qps_limit": self.qps,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 3),
+                "queued": self._waiting,
+                "observed_qps_60s": round(recent / 60.0, 3),
+                "rate_utilisation": round(min(1.0, recent / 60.0 / self.qps), 3),
+                "used_today": self._used_today,
+                "daily_budget": self.daily_budget or None,
+                "daily_utilisation": (round(self._used_today / self.daily_budget, 4)
+                                      if self.daily_budget else None),
+                "total_wait_s": round(self._waited_s, 3),
+            }
+
+
+def _from_env(api: str) -> TokenBucket:
+    key = api.upper()
+    qps = float(os.getenv(f"GMP_QPS_{key}", _DEFAULT_QPS[api]))
+    burst = float(os.getenv(f"GMP_BURST_{key}", 2 * qps))
+    daily = int(os.getenv(f"GMP_DAILY_{key}", "0"))
+    return TokenBucket(api, qps, burst, daily)
+
+
+_buckets = {api: _from_env(api) for api in APIS}
+
+
+def acquire(api: str, n: int = 1) -> float:
+    bucket = _buckets.get(api)
+    return bucket.acquire(n) if bucket else 0.0
+
+
+def penalize(api: str):
+    bucket = _buckets.get(api)
+    if bucket:
+        bucket.penalize()
+
+
+def configure(api: str, qps: float | None = None, burst: float | None = None,
+              daily_budget: int | None = None):
+    cur = _buckets[api]
+    _buckets[api] = TokenBucket(
+        api,
+        qps if qps is not None else cur.qps,
+        burst if burst is not None else cur.burst,
+        daily_budget if daily_budget is not None else cur.daily_budget,
+    )
+
+
+def utilisation() -> dict:
+    return {api: b.utilisation() for api, b in _buckets.items()}
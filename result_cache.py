@@ -0,0 +1,214 @@
+# result_cache.py
+"""
+End-to-end cache of finished submissions.
+
+A submission is determined by its inputs (address, date/time, timezone, mode,
+depth override) plus the forecast run it resolved to. Entries live in
+<root>/<key>/ with a manifest.json and copies of the street images, masks and
+AI image, so a repeat submission is replayed from disk without any network or
+GPU work. An entry is only served once its AI image exists, and is dropped as
+soon as a newer forecast run covers the requested hour.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from constants import CacheDirectory
+from imageUtility import as_bytes
+from utility import buildAddress, dateConverter
+from TEJapanAPI import latest_run_for
+
+RESULT_CACHE_ENABLED  = os.getenv("RESULT_CACHE", "1") == "1"
+RESULT_RUN_CHECK_TTL_S = float(os.getenv("RESULT_RUN_CHECK_TTL_S", "600"))   # reuse an FTP run check this long
+
+
+def _inputs(data: dict) -> dict:
+    override = float(data.get("depth_override_value", 0.0)) if data.get("depth_override_enabled") else None
+    return {
+        "address": buildAddress(data),
+        "date": data["date"],
+        "time": data["time"],
+        "timezone": str(data.get("timezone", "")).upper()[:3],
+        "mode": data["mode"],
+        "depth_override": override,
+    }
+
+
+def _parse_dt(s):
+    # depth_time may come from numpy/pandas (nanosecond precision); seconds are enough here
+    try:
+        return datetime.fromisoformat(str(s).replace(" ", "T")[:19]) if s else None
+    except ValueError:
+        return s
+
+
+class ResultCache:
+    def __init__(self, root: str = CacheDirectory.RESULTS.value):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._by_uuid: dict[str, str] = {}                   # street uuid -> entry key
+        self._run_checks: dict[datetime, tuple] = {}          # target hour -> (latest run, checked_at)
+
+    @staticmethod
+    def key_for(data: dict) -> str:
+        raw = json.dumps(_inputs(data), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _read(self, key: str) -> dict | None:
+        try:
+            return json.loads((self._dir(key) / "manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, manifest: dict):
+        path = self._dir(key) / "manifest.json"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+    # ---------- forecast freshness ----------
+    def _latest_run(self, target_dt_utc: datetime) -> datetime | None:
+        now = time.time()
+        with self._lock:
+            hit = self._run_checks.get(target_dt_utc)
+        if hit and now - hit[1] < RESULT_RUN_CHECK_TTL_S:
+            return hit[0]
+        try:
+            run = latest_run_for(target_dt_utc)
+        except Exception as e:
+            print("[Result cache] forecast run check failed:", e)
+            return None
+        with self._lock:
+            self._run_checks[target_dt_utc] = (run, now)
+        return run
+
+    # ---------- lookup / replay ----------
+    def lookup(self, data: dict) -> dict | None:
+        """
+        Stored result for these inputs, or None. The dict carries the street
+        images (bytes), metas, depth fields, AI image bytes and infotext.
+        """
+        if not RESULT_CACHE_ENABLED:
+            return None
+        key = self.key_for(data)
+        manifest = self._read(key)
+        if not manifest or not manifest.get("ai_image"):
+            return None
+
+        if manifest.get("forecast_run"):
+            target_dt_utc, _ = dateConverter(data)
+            latest = self._latest_run(target_dt_utc)
+            cached_run = datetime.fromisoformat(manifest["forecast_run"])
+            if latest is not None and latest > cached_run:
+                print(f"[Result cache] run {latest:%Y-%m-%d %H:00} supersedes {cached_run:%Y-%m-%d %H:00}; dropping entry")
+                self.invalidate(key)
+                return None
+
+        d = self._dir(key)
+        try:
+            images = [(d / name).read_bytes() for name in manifest["street_images"]]
+            ai = (d / manifest["ai_image"]).read_bytes()
+        except OSError as e:
+            print("[Result cache] entry incomplete, dropping:", e)
+            self.invalidate(key)
+            return None
+        self._restore_masks(d, manifest)
+
+        return {
+            "key": key,
+            "images": images,
+            "metas": manifest["metas"],
+            "coords": manifest["coords"],
+            "depth_value": manifest["depth_value"],
+            "forecast_run": datetime.fromisoformat(manifest["forecast_run"]) if manifest.get("forecast_run") else None,
+            "depth_time": _parse_dt(manifest.get("depth_time")),
+            "resolution": manifest["resolution"],
+            "ai_image": ai,
+            "infotext": manifest.get("infotext"),
+        }
+
+    @staticmethod
+    def _restore_masks(d: Path, manifest: dict, images_dir: str = "images"):
+        # the viewer's "open mask" action reads images/<uuid>_*mask.png
+        os.makedirs(images_dir, exist_ok=True)
+        for name in manifest.get("masks", []):
+            dest = Path(images_dir) / name
+            if not dest.exists():
+                try:
+                    shutil.copy2(d / name, dest)
+                except OSError:
+                    pass
+
+    # ---------- store ----------
+    def put(self, data: dict, images: list, metas: list, coords: str,
+            depth_value: float, forecast_run, depth_time, resolution: str):
+        """Record a finished pipeline run; the entry becomes servable once attach_ai() adds the AI image."""
+        if not RESULT_CACHE_ENABLED:
+            return
+        key = self.key_for(data)
+        d = self._dir(key)
+        shutil.rmtree(d, ignore_errors=True)
+        d.mkdir(parents=True, exist_ok=True)
+        names = []
+        for meta, img in zip(metas, images):
+            name = f"{meta['uuid']}_streetview.jpg"
+            (d / name).write_bytes(as_bytes(img))
+            names.append(name)
+        self._write(key, {
+            "inputs": _inputs(data),
+            "created_at": time.time(),
+            "coords": coords,
+            "metas": metas,
+            "street_images": names,
+            "depth_value": float(depth_value),
+            "forecast_run": forecast_run.isoformat() if forecast_run else None,
+            "depth_time": str(depth_time) if depth_time is not None else None,
+            "resolution": resolution,
+            "masks": [],
+            "ai_image": None,
+        })
+        with self._lock:
+            for meta in metas:
+                self._by_uuid[meta["uuid"]] = key
+
+    def attach_ai(self, uuid: str, ai_path: str, infotext=None, images_dir: str = "images"):
+        """Add the AI image (and the masks it was made from) to the entry that owns uuid."""
+        with self._lock:
+            key = self._by_uuid.get(uuid)
+        if key is None:
+            return
+        manifest = self._read(key)
+        if manifest is None:
+            return
+        d = self._dir(key)
+        try:
+            masks = []
+            for p in sorted(Path(images_dir).glob(f"{uuid}*mask*.png")):
+                shutil.copy2(p, d / p.name)
+                masks.append(p.name)
+            ai_name = f"{uuid}_ai{Path(ai_path).suffix or '.png'}"
+            shutil.copy2(ai_path, d / ai_name)
+        except OSError as e:
+            print("[Result cache] could not store AI result:", e)
+            return
+        manifest.update(masks=masks, ai_image=ai_name,
+                        infotext=infotext if isinstance(infotext, str) else None)
+        self._write(key, manifest)
+        print(f"[Result cache] stored result for {manifest['inputs']['address']} ({key[:8]})")
+
+    def invalidate(self, key: str):
+        shutil.rmtree(self._dir(key), ignore_errors=True)
+        with self._lock:
+            for u in [u for u, k in self._by_uuid.items() if k == key]:
+                del self._by_uuid[u]
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,112 @@
+# sessions.py
+"""
+Registry of GUI submissions ("sessions").
+
+Each submission gets a Session with its own cancel token, Street View uuids,
+results and log, so several addresses can be in flight at once and every
+mask / AI image is routed back to the session that owns its uuid.
+
+`uuid in SESSIONS` is true while some open session still wants that uuid,
+so the registry stands in for the old global ACTIVE_UUIDS set wherever only
+that question matters (SSE mask routing, stale-generation interrupts).
+"""
+import os
+import itertools
+import threading
+
+from cancellation import CancelToken
+from utility import buildAddress
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "8"))   # open sessions; the oldest finished ones are closed first
+
+RUNNING, DONE, FAILED = "running", "done", "failed"
+
+
+class Session:
+    def __init__(self, sid: int, data: dict, token: CancelToken):
+        self.id = sid
+        self.data = data
+        self.token = token
+        self.label = data.get("address2") or buildAddress(data)
+        self.state = RUNNING
+        self.uuids: set[str] = set()
+        self.trace_id = None
+        self.images = []
+        self.metas = []
+        self.ai_image = None      # bytes
+        self.log: list[str] = []  # replayed into the log panel when the tab is selected
+
+
+class SessionRegistry:
+    def __init__(self, max_open: int = SESSION_MAX):
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._sessions: dict[int, Session] = {}   # insertion order = submission order
+        self._by_uuid: dict[str, int] = {}
+        self._ids = itertools.count(1)
+
+    def open(self, data: dict) -> Session:
+        sid = next(self._ids)
+        token = CancelToken(label=f"session-{sid}-{data.get('address2', '')}@{data.get('date', '')}")
+        s = Session(sid, data, token)
+        with self._lock:
+            self._sessions[sid] = s
+        return s
+
+    def get(self, sid: int) -> Session | None:
+        with self._lock:
+            return self._sessions.get(sid)
+
+    def all(self) -> list[Session]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def for_uuid(self, uuid: str) -> Session | None:
+        with self._lock:
+            sid = self._by_uuid.get(uuid)
+            return self._sessions.get(sid) if sid is not None else None
+
+    def for_trace(self, trace_id: str) -> Session | None:
+        with self._lock:
+            return next((s for s in self._sessions.values() if s.trace_id == trace_id), None)
+
+    def bind_uuids(self, session: Session, uuids):
+        """Route masks/AI images for these uuids to session (replacing its previous ones)."""
+        with self._lock:
+            self._unbind_locked(session)
+            session.uuids = set(uuids)
+            for u in session.uuids:
+                self._by_uuid[u] = session.id
+
+    def release_uuids(self, session: Session):
+        """Stop routing anything for session's uuids (results are final or unwanted)."""
+        with self._lock:
+            self._unbind_locked(session)
+
+    def _unbind_locked(self, session: Session):
+        for u in session.uuids:
+            if self._by_uuid.get(u) == session.id:
+                del self._by_uuid[u]
+        session.uuids = set()
+
+    def close(self, sid: int) -> Session | None:
+        """Cancel the session's pipeline and forget it."""
+        with self._lock:
+            s = self._sessions.pop(sid, None)
+            if s is None:
+                return None
+            self._unbind_locked(s)
+        s.token.cancel()
+        return s
+
+    def overflow(self) -> list[Session]:
+        """Oldest finished sessions beyond max_open (running ones are never evicted)."""
+        with self._lock:
+            extra = len(self._sessions) - self.max_open
+            if extra <= 0:
+                return []
+            return [s for s in self._sessions.values() if s.state != RUNNING][:extra]
+
+    def __contains__(self, uuid) -> bool:
+        with self._lock:
+            return uuid in self._by_uuid
@@ -0,0 +1,100 @@
+# singleflight.py
+"""
+Coalesce concurrent identical calls: the first caller for a key runs the
+function, later callers for the same key block on the same Future and get
+the same result (or exception). Nothing is cached once the call finishes.
+
+The shared call runs under its own cancel token rather than the leader's,
+so one submission being superseded never aborts work another submission is
+waiting on; that token is cancelled only once every caller waiting on the
+call has been cancelled. Each caller honours its own token while it waits,
+and a follower that receives a Cancelled it did not cause runs the call
+again itself.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import cancellation
+from cancellation import CancelToken
+
+WAIT_POLL_S = 0.1   # how often a waiting follower checks its own token
+
+
+class _Call:
+    __slots__ = ("future", "token", "waiters")
+
+    def __init__(self, key):
+        self.future = Future()
+        self.token = CancelToken(label=f"shared {key!r}")
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[object, _Call] = {}
+        self.shared = 0   # number of callers that piggy-backed on an in-flight call
+
+    def do(self, key, fn, *args, **kwargs):
+        own = cancellation.current()
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call(key)
+                    self._calls[key] = call
+                else:
+                    self.shared += 1
+                call.waiters += 1
+
+            if leader:
+                if own is not None:
+                    own.on_cancel(lambda: self._leave(call))
+                return self._lead(key, call, fn, *args, **kwargs)
+
+            try:
+                return self._follow(call)
+            except cancellation.Cancelled:
+                if own is not None and own.cancelled:
+                    self._leave(call)
+                    raise
+                # someone else's cancellation: run it again
+
+    def _lead(self, key, call: _Call, fn, *args, **kwargs):
+        try:
+            with cancellation.bind(call.token):
+                result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.future.set_exception(e)
+            raise
+        else:
+            call.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    @staticmethod
+    def _follow(call: _Call):
+        while True:
+            cancellation.check()
+            try:
+                return call.future.result(timeout=WAIT_POLL_S)
+            except FutureTimeout:
+                continue
+
+    def _leave(self, call: _Call):
+        """A waiter was cancelled; cancel the shared call once nobody is left."""
+        with self._lock:
+            if call.future.done():
+                return
+            call.waiters -= 1
+            last = call.waiters == 0
+        if last:
+            call.token.cancel()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
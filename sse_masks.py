@@ -1,69 +1,58 @@
 # sse_masks.py
-import json
-import time
 import threading
-import requests
+import tracing
 from PyQt5.QtWidgets import QApplication
-from imageGen import generate_from_uuid, _normalize_uuid
+from imageGen import generate_from_uuid, _normalize_uuid, interrupt
 from collections import OrderedDict
-from utility import _get_raw_info,_split_prompts
-
-def _iter_sse_lines(resp):
-    """Yield complete SSE events as dicts {'id':..., 'data': '...'}."""
-    event = {'id': None, 'data': []}
-    for raw in resp.iter_lines(decode_unicode=True):
-        if raw is None:
-            continue
-        line = raw.strip()
-
-        # blank line -> dispatch current event
-        if line == "":
-            if event['data']:
-                yield {'id': event['id'], 'data': "\n".join(event['data'])}
-            event = {'id': None, 'data': []}
-            continue
-
-        if line.startswith("id:"):
-            event['id'] = line[3:].strip()
-        elif line.startswith("data:"):
-            event['data'].append(line[5:].strip())
-        # ignore other fields
-
-    # flush tail (in case stream ends without blank line)
-    if event['data']:
-        yield {'id': event['id'], 'data': "\n".join(event['data'])}
-
-def start_mask_watcher(base_url: str, on_mask_ready):
-    def _loop():
-        url = base_url.rstrip('/') + '/events?replay=0'   # ← no backlog
-        headers = {'Accept': 'text/event-stream'}
-        while True:
-            try:
-                with requests.get(url, stream=True, timeout=60, headers=headers) as r:
-                    r.raise_for_status()
-                    for evt in _iter_sse_lines(r):
-                        try:
-                            payload = json.loads(evt['data'])
-                        except Exception:
-                            # some paths might send JSON stringified twice; try once more
-                            try:
-                                payload = json.loads(json.loads(evt['data']))
-                            except Exception:
-                                continue
-                        if isinstance(payload, dict) and payload.get('type') == 'mask-saved':
-                            fname = (payload.get('filename') or "").lower()
-                            profile = 'underwater' if 'underwater' in fname else 'overwater'
-                            on_mask_ready(payload.get('uuid'), profile)
-            except Exception as e:
-                print('[SSE] disconnected, retry in 2s:', e)
-                time.sleep(2)
-
-    t = threading.Thread(target=_loop, daemon=True)
-    t.start()
-    return t
+from generation_queue import GenerationQueue, CANCELLED
+from utility import _get_raw_info
+from result_cache import RESULT_CACHE
 
 
 _recent = OrderedDict()
+_mask_waits = {}              # uuid -> (submission root span, open "mask.wait" span)
+_mask_waits_lock = threading.Lock()   # touched from the SSE, pipeline and GUI threads
+
+
+def _on_job_status(job, state, detail):
+    line = f"[AI queue] {job.uuid[:8]} ({job.profile}): {state}" + (f", {detail}" if detail else "")
+    print(line)
+    bus = job.ctx.get("bus")
+    if bus is not None:
+        bus.job_status.emit(job.uuid, line)   # logged to the session that owns the uuid
+
+
+def _generate(job):
+    """Queue worker: img2img for one mask, then hand the image to the GUI and the result cache."""
+    uuid, profile, ctx = job.uuid, job.profile, job.ctx
+    active, bus = ctx["active"], ctx["bus"]
+    if ctx.get("queue_span") is not None:
+        ctx["queue_span"].end()
+    with tracing.resume(ctx.get("parent")), tracing.span("img2img", uuid=uuid, profile=profile):
+        out_path, infotext = generate_from_uuid(
+            uuid, images_dir="images", profile=profile, want_info=True
+        )
+    if uuid not in active or job.state == CANCELLED:
+        print(f"[SSE] dropping AI image for superseded uuid={uuid}")
+        return
+    with open(out_path, "rb") as f:
+        img_bytes = f.read()
+    raw = _get_raw_info(infotext) if infotext else None
+    bus.ai_ready.emit(uuid, img_bytes, raw or "")
+    RESULT_CACHE.attach_ai(uuid, out_path, raw)
+    print(f"[AI] Generated {out_path} ({profile})")
+
+
+GEN_QUEUE = GenerationQueue(run=_generate, on_status=_on_job_status, interrupt=interrupt)
+
+
+def expect_mask(uuids, parent=None):
+    """Start timing the wait for these uuids' masks (parent: the submission's root span)."""
+    for u in uuids:
+        sp = tracing.start_span("mask.wait", parent, uuid=u)
+        if sp is not None:
+            with _mask_waits_lock:
+                _mask_waits[u] = (parent, sp)
 
 def _seen(key, maxlen=200):
     if key in _recent:
@@ -73,7 +62,11 @@ def _seen(key, maxlen=200):
         _recent.popitem(last=False)
     return False
 
-def on_mask_ready(uuid: str, profile: str = "underwater",ACTIVE_UUIDS=None,bus=None):
+def on_mask_ready(uuid: str, profile: str = "underwater", active=None, bus=None, priority=None):
+    """
+    SSE callback: queue the AI generation for a saved mask and return at once.
+    priority(uuid) -> int ranks the job (lower first; default 1).
+    """
     if "_naive" in (uuid or "").lower():
         return
     if QApplication.instance() is None or bus is None:
@@ -84,35 +77,36 @@ def on_mask_ready(uuid: str, profile: str = "underwater",ACTIVE_UUIDS=None,bus=N
     except Exception:
         pass
 
-    if uuid not in ACTIVE_UUIDS:
+    if uuid not in active:
         print(f"[SSE] ignoring stale mask for uuid={uuid}")
+        with _mask_waits_lock:
+            _mask_waits.pop(uuid, None)
         return
 
     if _seen((uuid, profile)):
         return
 
-    bus.tiles_ready.emit()
-
-    try:
-        bus.progress.emit("\nGenerating AI image…")
-        out_path, infotext = generate_from_uuid(
-            uuid, images_dir="images", profile=profile, want_info=True
-        )
-        with open(out_path, "rb") as f:
-            img_bytes = f.read()
-        bus.ai_ready.emit(img_bytes)
-
-        if infotext:
-            raw = _get_raw_info(infotext)
-            pos, neg = _split_prompts(raw)
-            bus.progress.emit("[Prompt]")
-            if pos:
-                bus.progress.emit(f"Positive: {pos}\n")
-            if neg:
-                bus.progress.emit(f"Negative: {neg}")
-
-        print(f"[AI] Generated {out_path} ({profile})")
-    except Exception as e:
-        bus.progress.emit(f"[AI] generation failed: {e}")
-        print("[AI] generation failed:", e)
-
+    with _mask_waits_lock:
+        parent, wait_span = _mask_waits.pop(uuid, (None, None))
+    if wait_span is not None:
+        wait_span.set(profile=profile)
+        wait_span.end()
+
+    bus.tiles_ready.emit(uuid)   # mask state only; the queue reports "queued" on bus.job_status
+
+    GEN_QUEUE.submit(uuid, profile, priority(uuid) if priority else 1,
+                     active=active, bus=bus, parent=parent,
+                     queue_span=tracing.start_span("ai.queue", parent, uuid=uuid))
+
+
+def interrupt_stale(active):
+    """Drop queued generations and mask waits for uuids no longer active (see GenerationQueue.cancel_stale)."""
+    with _mask_waits_lock:
+        stale = [_mask_waits.pop(u, None) for u in list(_mask_waits) if u not in active]
+    for wait in stale:
+        if wait is not None:
+            wait[1].end("cancelled")
+    for job in GEN_QUEUE.cancel_stale(active):
+        span = job.ctx.get("queue_span")
+        if span is not None:
+            span.end("cancelled")
@@ -0,0 +1,606 @@
+# standins.py
+"""
+Offline stand-ins for every external service the pipeline talks to, with
+configurable injected latency, so the whole pipeline runs (and can be
+benchmarked reproducibly) on a disconnected box:
+
+    google   geocode, Street View metadata/static and the Tiles API (one HTTP server)
+    ftp      TE-Japan FTP tree with synthetic NetCDF forecasts
+    webui    SD WebUI /sdapi/v1 (options, scripts, img2img, interrupt, ...)
+    masks    headless viewer: listens on the Node /events stream and posts masks to /save-mask
+
+    python standins.py --google-ms 80 --ftp-ms 40 --sd-ms 3000 --mask-ms 1500
+
+then start the app / batch.py with the environment printed at startup
+(SV_PICKER=tiles: the core picker scrapes Google directly and has no stand-in).
+Latencies are mean +/- jitter drawn from a seeded RNG.
+"""
+import io
+import os
+import json
+import time
+import base64
+import random
+import socket
+import hashlib
+import argparse
+import threading
+import socketserver
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import requests
+from PIL import Image, ImageDraw
+
+from constants import CacheDirectory
+
+PANO_STEP_DEG = 1e-4          # synthetic pano grid (~11 m)
+WATER_EPS_M   = 0.25          # main.js: no masks at or below this depth
+CAMERA_HEIGHT_M = 2.05        # main.js: camera height above terrain
+
+
+class Latency:
+    """Injected delay: mean_ms +/- uniform jitter_ms, reproducible per seed."""
+
+    def __init__(self, mean_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_s(self) -> float:
+        with self._lock:
+            j = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.mean_ms + j) / 1000.0
+
+    def sleep(self):
+        d = self.delay_s()
+        if d:
+            time.sleep(d)
+
+
+def _h(*parts) -> int:
+    return int(hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:12], 16)
+
+
+def _jpeg(img: Image.Image, quality: int = 85) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+# ------------------- Google (Maps + Tiles) -------------------
+def _pano_id(lat: float, lng: float) -> str:
+    return f"sp_{round(lat / PANO_STEP_DEG)}_{round(lng / PANO_STEP_DEG)}"
+
+
+def _pano_latlng(pano_id: str):
+    _, i, j = pano_id.split("_")
+    return int(i) * PANO_STEP_DEG, int(j) * PANO_STEP_DEG
+
+
+def _pano_meta(pano_id: str) -> dict:
+    lat, lng = _pano_latlng(pano_id)
+    i, j = round(lat / PANO_STEP_DEG), round(lng / PANO_STEP_DEG)
+    h = _h(pano_id)
+    links = [{"panoId": f"sp_{i + di}_{j + dj}", "heading": hd}
+             for di, dj, hd in ((1, 0, 0), (0, 1, 90), (-1, 0, 180), (0, -1, 270))]
+    return {
+        "panoId": pano_id,
+        "imageryType": "indoor" if h % 11 == 0 else "outdoor",
+        "date": f"{2015 + h % 9}-{1 + (h >> 4) % 12:02d}",
+        "lat": lat,
+        "lng": lng,
+        "heading": float(h % 360),
+        "links": links,
+        "imageWidth": 4096,
+        "imageHeight": 2048,
+        "tileWidth": 512,
+        "tileHeight": 512,
+    }
+
+
+@lru_cache(maxsize=256)
+def _tile_jpeg(pano_id: str, z: int, x: int, y: int) -> bytes:
+    h = _h(pano_id)
+    base = np.array([(h >> 8) % 200 + 30, (h >> 16) % 200 + 30, (h >> 24) % 200 + 30], dtype=np.float32)
+    ramp = np.linspace(0.6, 1.2, 512, dtype=np.float32)[:, None, None]
+    arr = np.clip(ramp * base[None, None, :] * (1.0 + 0.05 * ((x + y) % 2)), 0, 255).astype(np.uint8)
+    img = Image.fromarray(np.repeat(arr, 512, axis=1))
+    ImageDraw.Draw(img).text((8, 8), f"{pano_id} z{z} {x},{y}", fill=(255, 255, 255))
+    return _jpeg(img)
+
+
+@lru_cache(maxsize=256)
+def _static_jpeg(pano_id: str, width: int, height: int, heading: int) -> bytes:
+    h = _h(pano_id, heading)
+    sky = np.array([120, 160, 210], dtype=np.float32)
+    ground = np.array([(h >> 4) % 80 + 60, (h >> 12) % 80 + 60, (h >> 20) % 80 + 50], dtype=np.float32)
+    t = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    col = np.where(t < 0.5, sky, ground)[..., :] * (0.8 + 0.4 * t)
+    arr = np.clip(np.broadcast_to(col, (height, width, 3)), 0, 255).astype(np.uint8)
+    img = Image.fromarray(np.ascontiguousarray(arr))
+    ImageDraw.Draw(img).text((8, 8), f"{pano_id} @ {heading}°", fill=(255, 255, 255))
+    return _jpeg(img)
+
+
+def _geocode(address: str):
+    h = _h(address)
+    return 35.60 + (h % 2000) / 1e4 - 0.1, 139.60 + ((h >> 12) % 2000) / 1e4 - 0.1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency: Latency = Latency()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, ctype: str):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, obj, status: int = 200):
+        self._send(status, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def _body(self) -> dict:
+        try:
+            return json.loads(self._raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _route(self, method: str):
+        # always drain the body: leftovers would be read as the next keep-alive request
+        n = int(self.headers.get("Content-Length") or 0)
+        self._raw = self.rfile.read(n) if n else b""
+        parts = urlsplit(self.path)
+        q = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.latency.sleep()
+        try:
+            handled = self.handle_route(method, parts.path, q)
+        except Exception as e:
+            self._json({"error": str(e)}, 500)
+            return
+        if not handled:
+            self._json({"error": f"no stand-in for {method} {parts.path}"}, 404)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def handle_route(self, method: str, path: str, q: dict) -> bool:
+        """Serve one request; subclasses override. False means no stand-in (404)."""
+        return False
+
+
+class GoogleHandler(_Handler):
+    def handle_route(self, method, path, q):
+        if path == "/maps/api/geocode/json":
+            lat, lng = _geocode(q.get("address", ""))
+            self._json({"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]})
+        elif path == "/maps/api/streetview/metadata":
+            if "pano" in q:
+                pid = q["pano"]
+            else:
+                lat, lng = map(float, q.get("location", "0,0").split(","))
+                pid = _pano_id(lat, lng)
+            m = _pano_meta(pid)
+            self._json({"status": "OK", "pano_id": pid, "date": m["date"],
+                        "location": {"lat": m["lat"], "lng": m["lng"]}})
+        elif path == "/maps/api/streetview":
+            w, h = map(int, q.get("size", "640x640").split("x"))
+            self._send(200, _static_jpeg(q.get("pano", "sp_0_0"), w, h, int(float(q.get("heading", 0)))), "image/jpeg")
+        elif path == "/v1/createSession" and method == "POST":
+            self._json({"session": f"standin-{int(time.time())}", "expiry": str(int(time.time()) + 86400),
+                        "tileWidth": 512, "tileHeight": 512, "imageFormat": "jpeg"})
+        elif path == "/v1/streetview/panoIds" and method == "POST":
+            locs = self._body().get("locations") or []
+            self._json({"panoIds": [_pano_id(l["lat"], l["lng"]) for l in locs]})
+        elif path == "/v1/streetview/metadata":
+            self._json(_pano_meta(q["panoId"]))
+        elif path.startswith("/v1/streetview/tiles/"):
+            z, x, y = map(int, path.rsplit("/", 3)[1:])
+            self._send(200, _tile_jpeg(q["panoId"], z, x, y), "image/jpeg")
+        else:
+            return False
+        return True
+
+
+# ------------------- SD WebUI -------------------
+class WebUIHandler(_Handler):
+    img2img_latency: Latency = Latency()
+    options: dict = {}
+    gpu = threading.Lock()            # one generation at a time, like a single GPU
+    interrupted = threading.Event()
+
+    SAMPLERS = ["Euler a", "DPM++ 2M", "DPM++ 3M SDE", "DPM++ 2M SDE"]
+    SCHEDULERS = ["automatic", "karras", "exponential"]
+    CN_MODELS = [os.getenv("CNXL_DEPTH", "controlnetxlCNXL_bdsqlszDepth [c4d5ca3b]"),
+                 os.getenv("CNXL_CANNY", "controlnetxlCNXL_bdsqlszCanny [a74daa41]")]
+    CN_MODULES = ["none", "canny", "depth_leres++", "depth_midas"]
+
+    def handle_route(self, method, path, q):
+        if path == "/sdapi/v1/options":
+            if method == "POST":
+                self.options.update(self._body())
+                self._json(None)
+            else:
+                self._json(self.options)
+        elif path == "/sdapi/v1/scripts":
+            self._json({"txt2img": [], "img2img": ["controlnet", "soft inpainting"]})
+        elif path == "/sdapi/v1/samplers":
+            self._json([{"name": s, "aliases": [], "options": {}} for s in self.SAMPLERS])
+        elif path == "/sdapi/v1/schedulers":
+            self._json([{"name": s, "label": s.title()} for s in self.SCHEDULERS])
+        elif path == "/controlnet/model_list":
+            self._json({"model_list": self.CN_MODELS})
+        elif path == "/controlnet/module_list":
+            self._json({"module_list": self.CN_MODULES})
+        elif path == "/sdapi/v1/interrupt" and method == "POST":
+            self.interrupted.set()
+            self._json({})
+        elif path == "/sdapi/v1/img2img" and method == "POST":
+            self._json(self._img2img(self._body()))
+        else:
+            return False
+        return True
+
+    def _img2img(self, p: dict) -> dict:
+        with self.gpu:
+            self.interrupted.clear()
+            deadline = time.monotonic() + self.img2img_latency.delay_s()
+            while time.monotonic() < deadline and not self.interrupted.is_set():
+                time.sleep(0.05)
+            street = Image.open(io.BytesIO(base64.b64decode(p["init_images"][0]))).convert("RGB")
+            out = street
+            if p.get("mask"):
+                mask = Image.open(io.BytesIO(base64.b64decode(p["mask"]))).convert("L").resize(street.size)
+                water = Image.new("RGB", street.size, (40, 90, 140))
+                out = Image.composite(Image.blend(street, water, 0.6), street, mask)
+            buf = io.BytesIO()
+            out.save(buf, format="PNG")
+        infotext = (f"{p.get('prompt', '')}\nNegative prompt: {p.get('negative_prompt', '')}\n"
+                    f"Steps: {p.get('steps')}, Sampler: {p.get('sampler_name')}, Seed: 1, "
+                    f"Denoising strength: {p.get('denoising_strength')}")
+        return {
+            "images": [base64.b64encode(buf.getvalue()).decode("ascii")],
+            "parameters": {},
+            "info": json.dumps({"infotexts": [infotext], "seed": 1,
+                                "sampler_name": p.get("sampler_name"),
+                                "denoising_strength": p.get("denoising_strength"),
+                                "interrupted": self.interrupted.is_set()}),
+        }
+
+
+# ------------------- TE-Japan FTP -------------------
+class TEJapanTree:
+    """
+    Virtual /YYYY/MM/DD/HH tree: a run every `run_hours` of every day, each
+    holding FLDDPH/FLDFRC files for leads 0..max_lead. NetCDF files are
+    synthesised on first RETR and kept under <cache>/standins/ftp.
+    """
+
+    def __init__(self, run_hours=(0, 6, 12, 18), max_lead: int = 38,
+                 bbox=(33.0, 37.0, 133.0, 141.0), step_deg: float = 0.01):
+        self.run_hours = tuple(run_hours)
+        self.max_lead = max_lead
+        self.bbox = bbox
+        self.step_deg = step_deg
+        self.dir = os.path.join(CacheDirectory.STANDINS.value, "ftp")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parts(path: str):
+        return [p for p in path.strip("/").split("/") if p]
+
+    def is_dir(self, path: str) -> bool:
+        parts = self._parts(path)
+        if not all(p.isdigit() for p in parts) or len(parts) > 4:
+            return False
+        if len(parts) == 4:
+            return int(parts[3]) in self.run_hours
+        return True
+
+    def _run(self, parts):
+        return datetime(int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3]))
+
+    def list(self, path: str):
+        parts = self._parts(path)
+        if len(parts) == 3:
+            return [f"{h:02d}" for h in self.run_hours]
+        if len(parts) == 4:
+            run = self._run(parts)
+            names = []
+            for lead in range(self.max_lead + 1):
+                valid = run + timedelta(hours=lead)
+                for var in ("FLDDPH", "FLDFRC"):
+                    names.append(f"TE-JPN15S_MSM_H{valid:%Y%m%d%H}_{var}.nc")
+            return names
+        return []
+
+    def read(self, path: str, name: str) -> bytes | None:
+        if name not in self.list(path):
+            return None
+        local = os.path.join(self.dir, name)
+        with self._lock:
+            if not os.path.exists(local):
+                self._synthesise(local, name)
+        with open(local, "rb") as f:
+            return f.read()
+
+    def _synthesise(self, local: str, name: str):
+        import xarray as xr
+        valid = datetime.strptime(name.split("_H")[1][:10], "%Y%m%d%H")
+        var = name.rsplit("_", 1)[1][:-3]
+        lat0, lat1, lon0, lon1 = self.bbox
+        lat = np.arange(lat0, lat1, self.step_deg, dtype=np.float64)
+        lon = np.arange(lon0, lon1, self.step_deg, dtype=np.float64)
+        phase = (valid.timestamp() / 3600.0) * 0.15             # field drifts with valid time
+        wave = np.sin(lat[:, None] * 40.0 + phase) * np.cos(lon[None, :] * 35.0 - phase)
+        field = np.clip(wave * 2.5, 0, None) if var == "FLDDPH" else np.clip(wave + 0.2, 0, 1)
+        ds = xr.Dataset(
+            {var: (("time", "lat", "lon"), field[None].astype(np.float32))},
+            coords={"time": [np.datetime64(valid)], "lat": lat, "lon": lon},
+            attrs={"grid_interval": f"{self.step_deg:.7f}", "source": "standins.py synthetic"},
+        )
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = f"{local}.{os.getpid()}.tmp"
+        ds.to_netcdf(tmp, engine="netcdf4")
+        os.replace(tmp, local)
+
+
+class FTPHandler(socketserver.StreamRequestHandler):
+    """Just enough FTP for ftplib: USER/PASS/CWD/PWD/TYPE/PASV/EPSV/NLST/RETR/QUIT."""
+    tree: TEJapanTree = None
+    latency: Latency = Latency()
+    kbps: float = 0.0                 # 0 = unthrottled
+
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+
+    def _resolve(self, arg: str) -> str:
+        path = arg if arg.startswith("/") else f"{self.cwd.rstrip('/')}/{arg}"
+        return "/" + "/".join(self._parts_norm(path))
+
+    @staticmethod
+    def _parts_norm(path: str):
+        out = []
+        for p in path.split("/"):
+            if p in ("", "."):
+                continue
+            if p == "..":
+                out and out.pop()
+            else:
+                out.append(p)
+        return out
+
+    def _open_passive(self):
+        self._pasv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._pasv.bind((self.server.server_address[0], 0))
+        self._pasv.listen(1)
+        self._pasv.settimeout(10)
+        return self._pasv.getsockname()[1]
+
+    def _data_conn(self):
+        pasv, self._pasv = self._pasv, None
+        if pasv is None:
+            return None
+        try:
+            conn, _ = pasv.accept()
+            return conn
+        finally:
+            pasv.close()
+
+    def _send_data(self, payload: bytes):
+        conn = self._data_conn()
+        if conn is None:
+            self._reply("425 Use PASV first")
+            return
+        self._reply("150 Opening data connection")
+        try:
+            chunk = 64 * 1024
+            for i in range(0, len(payload), chunk):
+                conn.sendall(payload[i:i + chunk])
+                if self.kbps:
+                    time.sleep(len(payload[i:i + chunk]) / (self.kbps * 1024.0))
+            conn.close()
+            self._reply("226 Transfer complete")
+        except OSError:
+            self._reply("426 Connection closed; transfer aborted")
+
+    def handle(self):
+        self.cwd = "/"
+        self._pasv = None
+        self._reply("220 TE-Japan stand-in FTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            cmd, _, arg = raw.decode("utf-8", "replace").strip().partition(" ")
+            cmd = cmd.upper()
+            self.latency.sleep()
+            if cmd == "USER":
+                self._reply("331 Password required")
+            elif cmd == "PASS":
+                self._reply("230 Logged in")
+            elif cmd in ("TYPE", "MODE", "STRU", "NOOP"):
+                self._reply("200 OK")
+            elif cmd == "SYST":
+                self._reply("215 UNIX Type: L8")
+            elif cmd == "PWD":
+                self._reply(f'257 "{self.cwd}"')
+            elif cmd == "CWD":
+                path = self._resolve(arg)
+                if self.tree.is_dir(path):
+                    self.cwd = path
+                    self._reply("250 OK")
+                else:
+                    self._reply("550 No such directory")
+            elif cmd == "PASV":
+                port = self._open_passive()
+                h = self.server.server_address[0].replace(".", ",")
+                self._reply(f"227 Entering Passive Mode ({h},{port >> 8},{port & 255})")
+            elif cmd == "EPSV":
+                self._reply(f"229 Entering Extended Passive Mode (|||{self._open_passive()}|)")
+            elif cmd == "NLST":
+                path = self._resolve(arg) if arg and not arg.startswith("-") else self.cwd
+                self._send_data("".join(n + "\r\n" for n in self.tree.list(path)).encode("utf-8"))
+            elif cmd == "RETR":
+                data = self.tree.read(self.cwd, arg)
+                if data is None:
+                    self._reply("550 No such file")
+                else:
+                    self._send_data(data)
+            elif cmd == "ABOR":
+                self._reply("226 Abort OK")
+            elif cmd == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Not implemented")
+
+
+class _FTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# ------------------- headless mask producer -------------------
+class MaskProducer:
+    """
+    Stands in for the Cesium viewer: subscribes to the Node /events stream,
+    remembers the camera uuid, and for every depth message renders a synthetic
+    mask and posts it to /save-mask (file names as main.js writes them).
+    """
+
+    def __init__(self, node_url: str, latency: Latency, cid: str = "standin-masks"):
+        self.node_url = node_url.rstrip("/")
+        self.latency = latency
+        self.cid = cid
+        self.uuid = ""
+        self.size = (640, 640)
+
+    def start(self) -> threading.Thread:
+        t = threading.Thread(target=self._loop, name="standin-masks", daemon=True)
+        t.start()
+        return t
+
+    def _loop(self):
+        while True:
+            try:
+                with requests.get(f"{self.node_url}/events", params={"cid": self.cid, "replay": 0},
+                                  stream=True, timeout=(5, None)) as r:
+                    r.raise_for_status()
+                    requests.post(f"{self.node_url}/client-ready", params={"cid": self.cid}, timeout=5)
+                    print(f"[standin masks] connected to {self.node_url}")
+                    for line in r.iter_lines(decode_unicode=True):
+                        if line and line.startswith("data:"):
+                            try:
+                                self._on_payload(json.loads(line[5:].strip()))
+                            except Exception as e:
+                                print("[standin masks] payload failed:", e)
+            except Exception as e:
+                print("[standin masks] stream down, retry in 2s:", e)
+                time.sleep(2)
+
+    def _on_payload(self, payload):
+        if isinstance(payload, list) and payload:
+            cam = payload[0]
+            self.uuid = cam.get("uuid") or self.uuid
+            try:
+                self.size = tuple(map(int, str(cam.get("size", "640x640")).split("x")))
+            except ValueError:
+                pass
+        elif isinstance(payload, dict) and payload.get("type") == "depth":
+            uuid = payload.get("uuid") or self.uuid
+            depth = float(payload.get("value") or 0.0)
+            if abs(depth) <= WATER_EPS_M or not uuid:
+                return
+            self.latency.sleep()     # stands in for terrain sampling + mask render
+            if depth > CAMERA_HEIGHT_M:
+                self._post(self._mask(1.0), f"{uuid}_underwater_mask.png")
+            else:
+                self._post(self._mask(depth / CAMERA_HEIGHT_M), f"{uuid}_overwater_mask.png")
+                self._post(self._mask(depth / CAMERA_HEIGHT_M * 0.8), f"{uuid}_naive_overwater_mask.png")
+
+    def _mask(self, fill: float) -> bytes:
+        w, h = self.size
+        img = Image.new("L", (w, h), 0)
+        top = int(h * (1.0 - 0.5 * min(max(fill, 0.0), 1.0)))
+        ImageDraw.Draw(img).rectangle((0, top, w, h), fill=255)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _post(self, png: bytes, filename: str):
+        data_url = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+        requests.post(f"{self.node_url}/save-mask", json={"dataUrl": data_url, "filename": filename}, timeout=10)
+
+
+# ------------------- main -------------------
+def _serve_http(host: str, port: int, handler):
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Offline stand-ins for Google, TE-Japan FTP, SD WebUI and the viewer.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--google-port", type=int, default=8701)
+    p.add_argument("--webui-port", type=int, default=8702)
+    p.add_argument("--ftp-port", type=int, default=8721)
+    p.add_argument("--node-url", default="http://localhost:8000", help="Node server the mask producer listens on")
+    p.add_argument("--no-masks", action="store_true", help="don't run the headless mask producer")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--google-ms", type=float, default=60.0)
+    p.add_argument("--ftp-ms", type=float, default=40.0, help="per FTP command")
+    p.add_argument("--ftp-kbps", type=float, default=0.0, help="transfer throttle, 0 = unlimited")
+    p.add_argument("--webui-ms", type=float, default=20.0, help="per WebUI call other than img2img")
+    p.add_argument("--sd-ms", type=float, default=3000.0, help="per img2img generation")
+    p.add_argument("--mask-ms", type=float, default=1500.0, help="per rendered mask set")
+    p.add_argument("--jitter", type=float, default=0.2, help="jitter as a fraction of each mean")
+    p.add_argument("--nc-step", type=float, default=0.01, help="synthetic NetCDF grid step (degrees)")
+    args = p.parse_args(argv)
+
+    def lat(ms, k):
+        return Latency(ms, ms * args.jitter, seed=args.seed * 100 + k)
+
+    google = type("Google", (GoogleHandler,), {"latency": lat(args.google_ms, 1)})
+    webui = type("WebUI", (WebUIHandler,), {"latency": lat(args.webui_ms, 2),
+                                           "img2img_latency": lat(args.sd_ms, 3), "options": {}})
+    ftp = type("FTP", (FTPHandler,), {"latency": lat(args.ftp_ms, 4), "kbps": args.ftp_kbps,
+                                     "tree": TEJapanTree(step_deg=args.nc_step)})
+
+    _serve_http(args.host, args.google_port, google)
+    _serve_http(args.host, args.webui_port, webui)
+    ftp_srv = _FTPServer((args.host, args.ftp_port), ftp)
+    threading.Thread(target=ftp_srv.serve_forever, daemon=True).start()
+    if not args.no_masks:
+        MaskProducer(args.node_url, lat(args.mask_ms, 5)).start()
+
+    print("Stand-ins running. Point the pipeline at them with:\n")
+    print(f"  export GOOGLE_MAPS_BASE_URL=http://{args.host}:{args.google_port}")
+    print(f"  export TILES_BASE_URL=http://{args.host}:{args.google_port}")
+    print(f"  export SV_PICKER=tiles SV_JS_FALLBACK_TO_CORE=0 GOOGLE_STREET_VIEW_API_KEY=offline")
+    print(f"  export FTP_HOST={args.host} FTP_PORT={args.ftp_port}")
+    print(f"  export WEBUI_URL=http://{args.host}:{args.webui_port}")
+    print("  export GMP_QPS_GEOCODING=1000 GMP_QPS_STREETVIEW_STATIC=1000 GMP_QPS_STREETVIEW_METADATA=1000 GMP_QPS_TILES=1000\n")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TRACE_FILE"] = ""   # keep test spans out of logs/traces.jsonl
@@ -0,0 +1,59 @@
+# tests/test_batch_picker.py
+import math
+from types import SimpleNamespace
+
+import googleAPI
+from pano_cache import PanoSpatialCache
+
+GOOD = (35.681236, 139.767125)
+BAD = (35.690000, 139.700000)
+
+
+def _offset(lat, lon, d_m, bearing_deg):
+    b = math.radians(bearing_deg)
+    return (lat + d_m * math.cos(b) / 111320.0,
+            lon + d_m * math.sin(b) / (111320.0 * math.cos(math.radians(lat))))
+
+
+def _meta(lat, lon, date):
+    return SimpleNamespace(location=SimpleNamespace(lat=lat, lng=lon), date=date)
+
+
+def test_one_failing_address_does_not_sink_the_batch(monkeypatch):
+    plat, plon = _offset(*GOOD, 10, 90)
+    pano = SimpleNamespace(pano_id="p1", lat=plat, lon=plon, date="2020-05")
+
+    def fake_search(lat, lon):
+        if round(lat, 6) == BAD[0]:
+            raise RuntimeError("search quota exceeded")
+        return [pano]
+
+    monkeypatch.setattr(googleAPI, "PANO_CACHE", PanoSpatialCache())
+    monkeypatch.setattr(googleAPI, "search_panoramas", fake_search)
+    monkeypatch.setattr(googleAPI, "fetch_meta", lambda pid: _meta(plat, plon, "2020-05"))
+
+    coords = [f"{GOOD[0]},{GOOD[1]}", f"{BAD[0]},{BAD[1]}", f"{GOOD[0]},{GOOD[1]}"]
+    out = googleAPI.getBestPanoramasBatch(coords, ["2024-01-01", "2024-01-01", "2019-01-01"])
+
+    assert out[0]["pano_id"] == "p1"
+    assert round(out[0]["distance_m"]) == 10
+    assert isinstance(out[1], RuntimeError)
+    assert out[2] is None   # pano is newer than the target date
+
+
+def test_failed_metadata_only_drops_that_pano(monkeypatch):
+    near_loc, far_loc = _offset(*GOOD, 5, 0), _offset(*GOOD, 20, 0)
+    near = SimpleNamespace(pano_id="near", lat=near_loc[0], lon=near_loc[1], date=None)
+    far = SimpleNamespace(pano_id="far", lat=far_loc[0], lon=far_loc[1], date=None)
+
+    def fake_meta(pid):
+        if pid == "near":
+            raise RuntimeError("metadata 500")
+        return _meta(*far_loc, "2021-03")
+
+    monkeypatch.setattr(googleAPI, "PANO_CACHE", PanoSpatialCache())
+    monkeypatch.setattr(googleAPI, "search_panoramas", lambda lat, lon: [near, far])
+    monkeypatch.setattr(googleAPI, "fetch_meta", fake_meta)
+
+    out = googleAPI.getBestPanoramasBatch([f"{GOOD[0]},{GOOD[1]}"], ["2024-01-01"])
+    assert out[0]["pano_id"] == "far"
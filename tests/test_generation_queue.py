@@ -0,0 +1,55 @@
+# tests/test_generation_queue.py
+import threading
+
+from generation_queue import GenerationQueue, CANCELLED, DONE
+
+
+def _queue(workers):
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    interrupts = []
+    final = {}
+    done = threading.Event()
+
+    def run(job):
+        started.release()
+        release.wait(2)
+
+    def on_status(job, state, detail):
+        if state in (DONE, CANCELLED):
+            final[job.uuid] = state
+            if len(final) == 2:
+                done.set()
+
+    q = GenerationQueue(run, workers=workers, on_status=on_status, interrupt=lambda: interrupts.append(1))
+    return q, started, release, interrupts, final, done
+
+
+def test_stale_job_with_several_workers_is_not_interrupted():
+    q, started, release, interrupts, final, done = _queue(workers=2)
+    q.submit("stale", "underwater")
+    q.submit("live", "underwater")
+    assert started.acquire(timeout=2) and started.acquire(timeout=2)
+
+    q.cancel_stale({"live"})
+    assert interrupts == []
+
+    release.set()
+    assert done.wait(2)
+    assert final == {"stale": CANCELLED, "live": DONE}
+    q.shutdown()
+
+
+def test_stale_job_with_one_worker_is_interrupted():
+    q, started, release, interrupts, final, done = _queue(workers=1)
+    q.submit("stale", "underwater")
+    assert started.acquire(timeout=2)
+    q.submit("live", "underwater")
+
+    q.cancel_stale({"live"})
+    assert interrupts == [1]
+
+    release.set()
+    assert done.wait(2)
+    assert final == {"stale": CANCELLED, "live": DONE}
+    q.shutdown()
@@ -0,0 +1,76 @@
+# tests/test_http_client.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+from cancellation import CancelToken, Cancelled
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    script = []                     # status codes to answer with, in order
+    hits = []
+    ports = set()
+
+    def _answer(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            self.rfile.read(n)
+        _Handler.hits.append(self.command)
+        _Handler.ports.add(self.client_address[1])
+        status = _Handler.script.pop(0) if _Handler.script else 200
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF_BASE_S", 0.001)
+    _Handler.script, _Handler.hits, _Handler.ports = [], [], set()
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    http_client.reset_histograms()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    http_client.close_all()
+
+
+def test_get_retries_transient_statuses(server):
+    _Handler.script = [503, 502]
+    r = http_client.get(server + "/x", endpoint="node")   # node: 1 retry
+    assert r.status_code == 502
+    assert _Handler.hits == ["GET", "GET"]
+
+    _Handler.script = [503]
+    assert http_client.get(server + "/x").status_code == 200   # default: 2 retries
+
+
+def test_post_is_not_retried_unless_policy_allows(server):
+    _Handler.script = [503]
+    assert http_client.post(server + "/x", json={}).status_code == 503
+    assert _Handler.hits == ["POST"]
+
+
+def test_connections_are_reused_and_latency_recorded(server):
+    for _ in range(5):
+        http_client.get(server + "/x", endpoint="node").close()
+    assert len(_Handler.ports) == 1
+    assert http_client.latency_histograms()["node"]["count"] == 5
+
+
+def test_cancelled_token_stops_before_sending(server):
+    token = CancelToken("session-a")
+    token.cancel()
+    with pytest.raises(Cancelled):
+        http_client.get(server + "/x", cancel=token)
+    assert _Handler.hits == []
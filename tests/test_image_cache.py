@@ -0,0 +1,57 @@
+# tests/test_image_cache.py
+import os
+
+from image_cache import ImageCache
+from imageUtility import save_images
+
+
+def _key(cache, pano, heading=0):
+    return cache.key(pano, heading, 0, 120, 500, 250)
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = ImageCache(root=str(tmp_path), max_bytes=250)
+    ka, kb, kc = _key(cache, "a"), _key(cache, "b"), _key(cache, "c")
+    cache.put(ka, b"a" * 100)
+    cache.put(kb, b"b" * 100)
+    assert cache.get(ka) == b"a" * 100      # a is now the most recent
+
+    cache.put(kc, b"c" * 100)                # 300 bytes > 250: evict the least recent (b)
+    assert cache.get(kb) is None
+    assert cache.get(ka) == b"a" * 100
+    assert cache.stats()["bytes"] == 200
+    assert not cache._path(kb).exists()
+
+
+def test_index_survives_restart_oldest_first(tmp_path):
+    cache = ImageCache(root=str(tmp_path), max_bytes=1000)
+    ka, kb = _key(cache, "a"), _key(cache, "b")
+    cache.put(ka, b"a" * 100)
+    cache.put(kb, b"b" * 100)
+    os.utime(cache._path(ka), (1, 1))        # a is the oldest on disk
+
+    reopened = ImageCache(root=str(tmp_path), max_bytes=150)
+    reopened.put(_key(reopened, "c"), b"c" * 10)
+    assert reopened.get(ka) is None
+    assert reopened.get(kb) == b"b" * 100
+
+
+def test_save_images_links_the_cached_file(tmp_path):
+    cache = ImageCache(root=str(tmp_path / "cache"))
+    data = b"\xff\xd8jpeg" * 50
+    cache.put(_key(cache, "p", 90), data)
+    src = cache.cached_path("p", 90, 0, 120, 500, 250)
+    assert src is not None
+    assert cache.cached_path("p", 180, 0, 120, 500, 250) is None
+
+    out = tmp_path / "images"
+    first, = save_images([memoryview(data)], folder=str(out), sources=[src])
+    second, = save_images([data], folder=str(out), sources=[src])
+
+    assert first["uuid"] != second["uuid"]   # each submission still gets its own uuid
+    for s in (first, second):
+        assert os.path.samefile(s["path"], src)
+
+    other, = save_images([b"rendered"], folder=str(out), sources=[src])
+    assert not os.path.samefile(other["path"], src)
+    assert open(other["path"], "rb").read() == b"rendered"
@@ -0,0 +1,23 @@
+# tests/test_mask_events.py
+from mask_events import _iter_sse_lines
+
+
+class _Resp:
+    def __init__(self, lines):
+        self._lines = lines
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self._lines)
+
+
+def test_events_split_on_blank_lines_and_tail_is_flushed():
+    resp = _Resp([
+        "id: 1", 'data: {"type": "mask-saved",', 'data: "uuid": "a"}', "",
+        ": keep-alive", "",
+        "id: 2", 'data: {"type": "other"}',
+    ])
+    events = list(_iter_sse_lines(resp))
+    assert events == [
+        {"id": "1", "data": '{"type": "mask-saved",\n"uuid": "a"}'},
+        {"id": "2", "data": '{"type": "other"}'},
+    ]
@@ -0,0 +1,30 @@
+# tests/test_nc_series.py
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from preprocessNCFile import getSeriesByCoordinates
+
+
+def _nc(tmp_path, name, step_deg, time, value):
+    lat = np.arange(35.0, 36.0, step_deg)
+    lon = np.arange(139.0, 140.0, step_deg)
+    data = np.full((1, lat.size, lon.size), value, dtype="f4")
+    ds = xr.Dataset({"FLDDPH": (("time", "lat", "lon"), data)},
+                    coords={"time": [pd.Timestamp(time)], "lat": lat, "lon": lon})
+    path = tmp_path / name
+    ds.to_netcdf(path)
+    return str(path)
+
+
+def test_mixed_grids_nan_and_fill(tmp_path):
+    paths = [
+        _nc(tmp_path, "TE-JPN15S_MSM_H2025070103_FLDDPH.nc", 1 / 240, "2025-07-01T03", 0.5),
+        _nc(tmp_path, "TE-JPN01M_MSM_H2025070100_FLDDPH.nc", 1 / 60, "2025-07-01T00", 0.2),
+        _nc(tmp_path, "TE-JPN01M_MSM_H2025070106_FLDDPH.nc", 1 / 60, "2025-07-01T06", np.nan),
+        _nc(tmp_path, "TE-JPN01M_MSM_H2025070109_FLDDPH.nc", 1 / 60, "2025-07-01T09", 1e20),
+    ]
+    series = getSeriesByCoordinates(paths, "35.5,139.5")
+
+    assert [t.hour for t, _ in series] == [0, 3, 9]     # the NaN hour is missing, not 0 m
+    assert [round(v, 3) for _, v in series] == [0.2, 0.5, 0.0]
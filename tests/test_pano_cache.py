@@ -0,0 +1,63 @@
+# tests/test_pano_cache.py
+import math
+from types import SimpleNamespace
+
+import googleAPI
+from pano_cache import PanoSpatialCache
+
+ADDR = (35.681236, 139.767125)
+
+
+def _offset(lat, lon, d_m, bearing_deg):
+    b = math.radians(bearing_deg)
+    return (lat + d_m * math.cos(b) / 111320.0,
+            lon + d_m * math.sin(b) / (111320.0 * math.cos(math.radians(lat))))
+
+
+def _pano(pano_id, d_m, bearing):
+    lat, lon = _offset(*ADDR, d_m, bearing)
+    return SimpleNamespace(pano_id=pano_id, lat=lat, lon=lon, heading=0.0, date="2020-05")
+
+
+def _fake_search(monkeypatch, panos):
+    calls = []
+
+    def search(lat, lon):
+        calls.append((lat, lon))
+        return panos
+
+    monkeypatch.setattr(googleAPI, "PANO_CACHE", PanoSpatialCache())
+    monkeypatch.setattr(googleAPI, "search_panoramas", search)
+    return calls
+
+
+def test_far_from_pano_address_same_result_twice(monkeypatch):
+    # nearest pano 40 m away with links further out: all of it is returned both times
+    panos = [_pano("near", 40, 90), _pano("link1", 55, 0), _pano("link2", 70, 180)]
+    calls = _fake_search(monkeypatch, panos)
+
+    first = googleAPI._search_panoramas(*ADDR)
+    second = googleAPI._search_panoramas(*ADDR)
+
+    assert len(calls) == 1
+    assert [p.pano_id for p in first] == ["near", "link1", "link2"]
+    assert [p.pano_id for p in second] == ["near", "link1", "link2"]
+    assert [(p.lat, p.lon) for p in second] == [(p.lat, p.lon) for p in first]
+
+
+def test_nearby_geocode_reuses_search_but_neighbour_does_not(monkeypatch):
+    calls = _fake_search(monkeypatch, [_pano("p", 10, 0)])
+
+    googleAPI._search_panoramas(*ADDR)
+    googleAPI._search_panoramas(*_offset(*ADDR, 3, 45))    # same building
+    assert len(calls) == 1
+
+    googleAPI._search_panoramas(*_offset(*ADDR, 30, 90))   # next address along the street
+    assert len(calls) == 2
+
+
+def test_expired_search_is_a_miss():
+    cache = PanoSpatialCache(ttl_s=-1)
+    cache.put(*ADDR, [_pano("p", 10, 0)])
+    assert cache.query(*ADDR) is None
+    assert cache.stats()["searches"] == 0
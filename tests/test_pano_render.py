@@ -0,0 +1,54 @@
+# tests/test_pano_render.py
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+import cancellation
+import pano_render
+import tracing
+from cancellation import CancelToken
+
+# 512x256 equirect in two 256x256 tiles at zoom 1: west half red, east half blue
+META = {"imageWidth": 512, "imageHeight": 256, "tileWidth": 256, "tileHeight": 256, "heading": 0.0}
+COLORS = {(0, 0): (255, 0, 0), (1, 0): (0, 0, 255)}
+
+
+def _tile_bytes(color):
+    buf = BytesIO()
+    Image.new("RGB", (256, 256), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _fake_tiles(monkeypatch, seen):
+    def get_tile(pano_id, z, x, y):
+        seen.append((z, x, y, cancellation.current(), tracing.current()))
+        return _tile_bytes(COLORS[(x, y)])
+
+    monkeypatch.setattr(pano_render.tiles_api, "get_tiles_metadata_by_panoid", lambda pid: META)
+    monkeypatch.setattr(pano_render.tiles_api, "get_pano_tile", get_tile)
+    monkeypatch.setattr(pano_render, "_equirects", type(pano_render._equirects)())
+
+
+def test_known_tiles_project_to_the_right_headings(monkeypatch):
+    seen = []
+    _fake_tiles(monkeypatch, seen)
+    equirect, pano_heading = pano_render.get_equirect("p", zoom=1)
+    assert equirect.shape == (256, 512, 3)
+
+    east = pano_render.render_perspective(equirect, pano_heading, 90, 0, 60, 64, 48)
+    west = pano_render.render_perspective(equirect, pano_heading, 270, 0, 60, 64, 48)
+    assert np.abs(east.astype(int) - (0, 0, 255)).max() <= 2
+    assert np.abs(west.astype(int) - (255, 0, 0)).max() <= 2
+    assert sorted((z, x, y) for z, x, y, _, _ in seen) == [(1, 0, 0), (1, 1, 0)]
+
+
+def test_tile_workers_inherit_cancellation_and_span(monkeypatch):
+    seen = []
+    _fake_tiles(monkeypatch, seen)
+    with cancellation.bind(CancelToken("session-a")), tracing.trace("submission") as root:
+        pano_render.get_equirect("p", zoom=1)
+    assert len(seen) == 2
+    for _, _, _, token, span in seen:
+        assert token is not None   # the shared download's token, cancelled if every waiter is
+        assert span is root
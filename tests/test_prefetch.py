@@ -0,0 +1,70 @@
+# tests/test_prefetch.py
+import threading
+from datetime import datetime
+
+import pytest
+
+import prefetch
+from prefetch import SpeculativePrefetcher
+
+
+def _form(address2, date="2025-07-01", time="09:00"):
+    return {"prefecture": "東京都", "city": "千代田区", "town": "", "address2": address2,
+            "date": date, "time": time, "timezone": "JST", "depth_override_enabled": False}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    log = {"geocode": [], "pano": [], "forecast": []}
+    gate = threading.Event()
+    gate.set()
+
+    def geocode(address):
+        gate.wait(2)
+        log["geocode"].append(address)
+        return f"35.0,{139 + len(log['geocode'])}"
+
+    def pano(coords, date, tolerance_m):
+        log["pano"].append((coords, date))
+        return ("pano", coords)
+
+    def forecast(dt):
+        log["forecast"].append(dt)
+        return datetime(2025, 6, 30, 12), "15s"
+
+    monkeypatch.setattr(prefetch, "addressToCoordinates", geocode)
+    monkeypatch.setattr(prefetch, "_find_best_panorama", pano)
+    monkeypatch.setattr(prefetch, "find_and_download_flood_data", forecast)
+    log["gate"] = gate
+    return log
+
+
+def test_results_are_handed_to_the_matching_submission(calls):
+    p = SpeculativePrefetcher()
+    p.speculate(_form("丸の内1-1"))
+    p.speculate(_form("丸の内1-1"))   # same inputs: not warmed twice
+
+    coords = p.coords_for("東京都 千代田区 丸の内1-1")
+    assert coords == "35.0,140"
+    assert p.pano_for(coords, "2025-07-01") == ("pano", coords)
+    assert p.forecast_for(datetime(2025, 7, 1, 0)) == (datetime(2025, 6, 30, 12), "15s")
+    assert len(calls["geocode"]) == 1
+
+    # anything that doesn't match the speculation is done live
+    assert p.coords_for("東京都 千代田区 丸の内2-2") is None
+    assert p.pano_for(coords, "2025-07-02") is None
+    assert p.pano_for("1.0,2.0", "2025-07-01") is None
+    assert p.forecast_for(datetime(2025, 7, 1, 1)) is None
+    p.shutdown()
+
+
+def test_newer_speculation_cancels_the_old_one(calls):
+    calls["gate"].clear()                 # hold the first geocode in flight
+    p = SpeculativePrefetcher()
+    p.speculate(_form("丸の内1-1"))
+    p.speculate(_form("丸の内2-2", time="10:00"))
+    calls["gate"].set()
+
+    assert p.coords_for("東京都 千代田区 丸の内1-1") is None
+    assert p.coords_for("東京都 千代田区 丸の内2-2") is not None
+    p.shutdown()
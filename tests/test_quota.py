@@ -0,0 +1,82 @@
+# tests/test_quota.py
+import threading
+import time
+
+import pytest
+
+import cancellation
+import quota
+from cancellation import CancelToken, Cancelled
+from quota import TokenBucket, QuotaExceeded
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def monotonic(self):
+        return self.t
+
+    def sleep(self, s):
+        self.t += s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(quota.time, "monotonic", c.monotonic)
+    monkeypatch.setattr(quota.time, "sleep", c.sleep)
+    return c
+
+
+def test_burst_then_steady_rate(clock):
+    b = TokenBucket("t", qps=10, burst=3)
+    waits = [b.acquire() for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+
+    # bucket empty: each further call is due 1/qps after the previous one
+    assert b.acquire() == pytest.approx(0.1)
+    assert b.acquire() == pytest.approx(0.1)
+
+    clock.t += 10.0   # idle long enough to refill, but never beyond burst
+    assert [b.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert b.acquire() == pytest.approx(0.1)
+
+
+def test_penalize_drops_banked_burst(clock):
+    b = TokenBucket("t", qps=5, burst=10)
+    b.penalize()
+    assert b.acquire() == pytest.approx(0.2)
+
+
+def test_daily_budget(clock):
+    b = TokenBucket("t", qps=100, burst=100, daily_budget=2)
+    b.acquire()
+    b.acquire()
+    with pytest.raises(QuotaExceeded):
+        b.acquire()
+
+
+def test_cancel_wakes_a_parked_request_and_returns_its_slot():
+    b = TokenBucket("t", qps=0.5, burst=1)   # second call would wait ~2 s
+    b.acquire()
+    token = CancelToken("session-a")
+    out = {}
+
+    def parked():
+        with cancellation.bind(token):
+            try:
+                b.acquire()
+            except Cancelled as e:
+                out["error"] = e
+
+    t = threading.Thread(target=parked)
+    t0 = time.perf_counter()
+    t.start()
+    time.sleep(0.05)
+    token.cancel()
+    t.join(1)
+
+    assert isinstance(out.get("error"), Cancelled)
+    assert time.perf_counter() - t0 < 0.5
+    assert b.utilisation()["tokens"] > -0.5   # the reservation was handed back
@@ -0,0 +1,95 @@
+# tests/test_result_cache.py
+from datetime import datetime
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+RUN_OLD = datetime(2025, 7, 1, 0)
+RUN_NEW = datetime(2025, 7, 1, 6)
+
+
+def _data(**kw):
+    data = {"prefecture": "Tokyo", "city": "Minato", "town": "Shiba", "address2": "1-1",
+            "date": "2025-07-01", "time": "12:00", "timezone": "JST", "mode": "depth",
+            "depth_override_enabled": False, "depth_override_value": 0.0}
+    data.update(kw)
+    return data
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.chdir(tmp_path)             # masks are restored into ./images
+    return ResultCache(root=str(tmp_path / "results"))
+
+
+def _store(cache, tmp_path, data, run=RUN_OLD):
+    meta = {"uuid": "u1"}
+    cache.put(data, [b"street"], [meta], "35.0,139.0", 0.5, run, None, "512x512")
+    ai = tmp_path / "ai.png"
+    ai.write_bytes(b"ai")
+    cache.attach_ai("u1", str(ai), infotext="steps: 20", images_dir=str(tmp_path / "images"))
+
+
+def test_key_depends_on_inputs_only():
+    base = ResultCache.key_for(_data())
+    assert ResultCache.key_for(_data(timezone="jst (utc+9)")) == base       # normalised
+    assert ResultCache.key_for(_data(depth_override_value=2.0)) == base     # override off: value ignored
+    assert ResultCache.key_for(_data(time="13:00")) != base
+    assert ResultCache.key_for(_data(mode="flat")) != base
+    assert ResultCache.key_for(_data(depth_override_enabled=True, depth_override_value=2.0)) != base
+
+
+def test_entry_served_only_after_ai_image(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "latest_run_for", lambda dt: RUN_OLD)
+    data = _data()
+    cache.put(data, [b"street"], [{"uuid": "u1"}], "35.0,139.0", 0.5, RUN_OLD, None, "512x512")
+    assert cache.lookup(data) is None
+
+    ai = tmp_path / "ai.png"
+    ai.write_bytes(b"ai")
+    cache.attach_ai("u1", str(ai), infotext="steps: 20", images_dir=str(tmp_path / "images"))
+    hit = cache.lookup(data)
+    assert hit["images"] == [b"street"]
+    assert hit["ai_image"] == b"ai"
+    assert hit["forecast_run"] == RUN_OLD
+    assert hit["infotext"] == "steps: 20"
+
+
+def test_newer_run_invalidates_entry(cache, tmp_path, monkeypatch):
+    data = _data()
+    _store(cache, tmp_path, data)
+    asked = []
+
+    def latest(dt):
+        asked.append(dt)
+        return RUN_NEW
+
+    monkeypatch.setattr(result_cache, "latest_run_for", latest)
+    assert cache.lookup(data) is None
+    assert asked == [datetime(2025, 7, 1, 3)]                   # 12:00 JST as naive UTC
+    assert not (tmp_path / "results" / ResultCache.key_for(data)).exists()
+    assert cache._by_uuid == {}
+
+
+def test_run_check_is_reused_within_ttl(cache, tmp_path, monkeypatch):
+    data = _data()
+    _store(cache, tmp_path, data)
+    calls = []
+    monkeypatch.setattr(result_cache, "latest_run_for", lambda dt: calls.append(dt) or RUN_OLD)
+    assert cache.lookup(data) is not None
+    assert cache.lookup(data) is not None
+    assert len(calls) == 1
+
+
+def test_failed_run_check_keeps_entry(cache, tmp_path, monkeypatch):
+    data = _data()
+    _store(cache, tmp_path, data)
+
+    def offline(dt):
+        raise OSError("ftp down")
+
+    monkeypatch.setattr(result_cache, "latest_run_for", offline)
+    assert cache.lookup(data)["ai_image"] == b"ai"
@@ -0,0 +1,163 @@
+# tests/test_singleflight.py
+import threading
+import time
+
+import pytest
+
+import cancellation
+from cancellation import CancelToken, Cancelled
+from singleflight import SingleFlight
+
+
+def _run(token, fn):
+    """Run fn() on a thread with token bound; returns (thread, outcome dict)."""
+    out = {}
+
+    def target():
+        with cancellation.bind(token):
+            try:
+                out["result"] = fn()
+            except BaseException as e:
+                out["error"] = e
+
+    t = threading.Thread(target=target)
+    t.start()
+    return t, out
+
+
+def _wait_shared(sf, n, timeout=2.0):
+    deadline = time.time() + timeout
+    while sf.shared < n and time.time() < deadline:
+        time.sleep(0.01)
+    assert sf.shared >= n
+
+
+def test_leader_cancel_does_not_reach_other_session():
+    sf = SingleFlight()
+    release = threading.Event()
+    seen_tokens = []
+
+    def work():
+        seen_tokens.append(cancellation.current())
+        release.wait(2)
+        cancellation.check()
+        return "panos"
+
+    a, b = CancelToken("session-a"), CancelToken("session-b")
+    ta, out_a = _run(a, lambda: sf.do("k", work))
+    time.sleep(0.05)
+    tb, out_b = _run(b, lambda: sf.do("k", work))
+    _wait_shared(sf, 1)
+
+    a.cancel()
+    release.set()
+    ta.join(2)
+    tb.join(2)
+
+    assert seen_tokens[0] not in (a, b, None)
+    assert not seen_tokens[0].cancelled
+    assert out_a == {"result": "panos"}   # a's caller notices at its next stage check
+    assert out_b == {"result": "panos"}
+
+
+def test_shared_call_cancelled_once_every_waiter_is():
+    sf = SingleFlight()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        token = cancellation.current()
+        while not token.wait(0.01):
+            pass
+        token.raise_if_cancelled()
+
+    a, b = CancelToken("session-a"), CancelToken("session-b")
+    ta, out_a = _run(a, lambda: sf.do("k", work))
+    assert started.wait(2)
+    tb, out_b = _run(b, lambda: sf.do("k", work))
+    _wait_shared(sf, 1)
+
+    a.cancel()
+    time.sleep(0.2)
+    assert ta.is_alive()   # b still wants the result
+
+    b.cancel()
+    ta.join(2)
+    tb.join(2)
+    assert isinstance(out_a.get("error"), Cancelled)
+    assert isinstance(out_b.get("error"), Cancelled)
+    assert sf.in_flight() == 0
+
+
+def test_follower_cancel_stops_only_that_follower():
+    sf = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(2)
+        return 42
+
+    a, b = CancelToken("session-a"), CancelToken("session-b")
+    ta, out_a = _run(a, lambda: sf.do("k", work))
+    time.sleep(0.05)
+    tb, out_b = _run(b, lambda: sf.do("k", work))
+    _wait_shared(sf, 1)
+
+    b.cancel()
+    tb.join(1)
+    assert not tb.is_alive()
+    assert isinstance(out_b.get("error"), Cancelled)
+
+    release.set()
+    ta.join(2)
+    assert out_a == {"result": 42}
+
+
+def test_follower_retries_after_foreign_cancelled():
+    sf = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:
+            release.wait(2)
+            raise Cancelled("session-a")
+        return "fresh"
+
+    a, b = CancelToken("session-a"), CancelToken("session-b")
+    ta, out_a = _run(a, lambda: sf.do("k", work))
+    time.sleep(0.05)
+    tb, out_b = _run(b, lambda: sf.do("k", work))
+    _wait_shared(sf, 1)
+
+    release.set()
+    ta.join(2)
+    tb.join(2)
+
+    assert isinstance(out_a.get("error"), Cancelled)
+    assert out_b == {"result": "fresh"}
+    assert len(calls) == 2
+    assert sf.in_flight() == 0
+
+
+def test_errors_are_shared():
+    sf = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(2)
+        raise ValueError("boom")
+
+    ta, out_a = _run(None, lambda: sf.do("k", work))
+    time.sleep(0.05)
+    tb, out_b = _run(None, lambda: sf.do("k", work))
+    _wait_shared(sf, 1)
+    release.set()
+    ta.join(2)
+    tb.join(2)
+
+    assert isinstance(out_a.get("error"), ValueError)
+    assert isinstance(out_b.get("error"), ValueError)
+    with pytest.raises(ValueError):
+        sf.do("k", work)
@@ -0,0 +1,59 @@
+# tests/test_tiles_bfs.py
+import time
+
+import pytest
+
+import cancellation
+import tiles_api
+import tracing
+from cancellation import CancelToken, Cancelled
+
+# seed -> a, b, c; b and c are outdoor, c answers first
+GRAPH = {
+    "seed": {"imageryType": "indoor", "links": [{"panoId": "a"}, {"panoId": "b"}, {"panoId": "c"}]},
+    "a": {"imageryType": "indoor", "links": [{"panoId": "d"}]},
+    "b": {"imageryType": "outdoor", "links": []},
+    "c": {"imageryType": "outdoor", "links": []},
+    "d": {"imageryType": "outdoor", "links": []},
+}
+DELAY = {"a": 0.05, "b": 0.15, "c": 0.0}
+
+
+def _fake_meta(monkeypatch, seen=None):
+    def meta(pid):
+        if seen is not None:
+            seen.append((pid, cancellation.current(), tracing.current()))
+        time.sleep(DELAY.get(pid, 0.0))
+        return GRAPH.get(pid)
+
+    monkeypatch.setattr(tiles_api, "get_tiles_metadata_by_panoid", meta)
+
+
+def test_outdoor_pick_follows_bfs_order_not_completion_order(monkeypatch):
+    _fake_meta(monkeypatch)
+    for _ in range(3):
+        assert tiles_api.find_nearest_outdoor_neighbor_id("seed") == "b"
+
+
+def test_workers_inherit_cancel_token_and_span(monkeypatch):
+    seen = []
+    _fake_meta(monkeypatch, seen)
+    token = CancelToken("session-a")
+    with cancellation.bind(token), tracing.trace("submission") as root:
+        tiles_api.collect_linked_metadata("seed", max_hops=1)
+    assert seen and all(tok is token and sp is root for _, tok, sp in seen)
+
+
+def test_cancelled_search_stops_between_levels(monkeypatch):
+    calls = []
+    token = CancelToken("session-a")
+
+    def meta(pid):
+        calls.append(pid)
+        token.cancel()   # superseded while the first level is in flight
+        return GRAPH.get(pid)
+
+    monkeypatch.setattr(tiles_api, "get_tiles_metadata_by_panoid", meta)
+    with cancellation.bind(token), pytest.raises(Cancelled):
+        tiles_api.collect_linked_metadata("seed", max_hops=2)
+    assert calls == ["seed"]
@@ -0,0 +1,66 @@
+# tests/test_tiles_meta_cache.py
+import pytest
+
+import tiles_meta_cache
+from tiles_meta_cache import TilesMetadataCache, MISS
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(tiles_meta_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_negative_entry_expires_quickly(tmp_path, clock):
+    cache = TilesMetadataCache(str(tmp_path / "meta.sqlite"), ttl_s=3600, negative_ttl_s=60)
+    cache.put("bad", None)
+    assert cache.get("bad") is None          # live negative entry: don't refetch yet
+
+    clock[0] += 61
+    assert cache.get("bad") is MISS          # expired: retry the fetch
+
+
+def test_hits_persist_across_instances_until_ttl(tmp_path, clock):
+    path = str(tmp_path / "meta.sqlite")
+    TilesMetadataCache(path, ttl_s=3600, negative_ttl_s=60).put("p", {"imageryType": "outdoor"})
+
+    reopened = TilesMetadataCache(path, ttl_s=3600, negative_ttl_s=60)
+    assert reopened.get("p") == {"imageryType": "outdoor"}
+
+    clock[0] += 3601
+    assert reopened.get("p") is MISS
+    assert TilesMetadataCache(path).get("p") is MISS
+
+
+def test_purge_drops_expired_rows(tmp_path, clock):
+    cache = TilesMetadataCache(str(tmp_path / "meta.sqlite"), ttl_s=3600, negative_ttl_s=60)
+    cache.put("bad", None)
+    cache.put("good", {"links": []})
+    clock[0] += 120
+    cache.purge_expired()
+    rows = cache._conn().execute("SELECT pano_id FROM tiles_meta").fetchall()
+    assert rows == [("good",)]
+
+
+def test_failed_fetch_is_negative_but_cancelled_is_not(tmp_path, monkeypatch):
+    import tiles_api
+    from cancellation import Cancelled
+
+    cache = TilesMetadataCache(str(tmp_path / "meta.sqlite"))
+    monkeypatch.setattr(tiles_api, "TILES_META_CACHE", cache)
+
+    class _Resp:
+        status_code, text = 500, "boom"
+
+    monkeypatch.setattr(tiles_api.SESSION, "get", lambda *a, **kw: _Resp())
+    assert tiles_api.get_tiles_metadata_by_panoid("p1") is None
+    assert cache.get("p1") is None            # negative entry recorded
+
+    def cancelled(*a, **kw):
+        raise Cancelled("session-a")
+
+    monkeypatch.setattr(tiles_api.SESSION, "get", cancelled)
+    with pytest.raises(Cancelled):
+        tiles_api.get_tiles_metadata_by_panoid("p2")
+    assert cache.get("p2") is MISS
@@ -0,0 +1,79 @@
+# tests/test_tiles_session.py
+import threading
+import time
+
+import tiles_api
+from tiles_api import TilesSessionManager, SESSION_REFRESH_MARGIN_S
+
+
+class _Resp:
+    status_code = 200
+    text = ""
+
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def _fake_create(monkeypatch, ttl_s, delay_s=0.0, gate=None):
+    posts = []
+
+    def post(url, **kwargs):
+        posts.append(url)
+        if gate is not None:
+            gate.wait(2)
+        time.sleep(delay_s)
+        return _Resp({"session": f"tok{len(posts)}", "expiry": str(time.time() + ttl_s)})
+
+    monkeypatch.setattr(tiles_api.http_client, "post", post)
+    return posts
+
+
+def test_no_session_until_used_and_reused_while_fresh(monkeypatch):
+    posts = _fake_create(monkeypatch, ttl_s=3600)
+    mgr = TilesSessionManager()
+    time.sleep(0.05)
+    assert posts == []            # nothing is created in the background
+
+    assert mgr.token() == "tok1"
+    assert mgr.token() == "tok1"
+    assert len(posts) == 1
+
+
+def test_concurrent_first_use_creates_one_session(monkeypatch):
+    posts = _fake_create(monkeypatch, ttl_s=3600, delay_s=0.1)
+    mgr = TilesSessionManager()
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(mgr.token())) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+    assert out == ["tok1"] * 5
+    assert len(posts) == 1
+
+
+def test_near_expiry_renewal_does_not_block_other_requests(monkeypatch):
+    gate = threading.Event()
+    posts = _fake_create(monkeypatch, ttl_s=3600, gate=gate)
+    mgr = TilesSessionManager()
+    mgr._token, mgr._expiry = "old", time.time() + SESSION_REFRESH_MARGIN_S / 2
+
+    renewer = threading.Thread(target=mgr.token)
+    renewer.start()
+    while not posts:
+        time.sleep(0.01)
+
+    t0 = time.perf_counter()
+    assert mgr.token() == "old"   # createSession is still in flight
+    assert time.perf_counter() - t0 < 0.5
+
+    gate.set()
+    renewer.join(2)
+    assert mgr.token() == "tok1"
+    assert len(posts) == 1
@@ -0,0 +1,70 @@
+# tests/test_tracing.py
+import threading
+
+import pytest
+
+import tracing
+from cancellation import Cancelled
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    out = []
+    monkeypatch.setattr(tracing, "_sinks", [out.append])
+    return out
+
+
+def test_spans_nest_and_finish_children_first(spans):
+    with tracing.trace("submission", address="a") as root:
+        with tracing.span("geocode"):
+            pass
+        with tracing.span("streetview"):
+            with tracing.span("image_fetch", heading=90):
+                pass
+
+    assert [s.name for s in spans] == ["geocode", "image_fetch", "streetview", "submission"]
+    by_name = {s.name: s for s in spans}
+    assert {s.trace_id for s in spans} == {root.trace_id}
+    assert by_name["image_fetch"].parent_id == by_name["streetview"].span_id
+    assert by_name["image_fetch"].depth == 2
+    assert all(s.duration_ms is not None for s in spans)
+
+
+def test_span_outside_a_trace_is_a_no_op(spans):
+    with tracing.span("orphan") as sp:
+        assert sp is None
+    assert spans == []
+
+
+def test_status_on_error_and_cancellation(spans):
+    with pytest.raises(ValueError):
+        with tracing.trace("t1"):
+            raise ValueError("boom")
+    with pytest.raises(Cancelled):
+        with tracing.trace("t2"):
+            raise Cancelled("session-a")
+    assert [(s.name, s.status) for s in spans] == [("t1", "error"), ("t2", "cancelled")]
+    assert spans[0].attrs["error"] == "boom"
+
+
+def test_wrap_and_start_span_keep_the_parent_across_threads(spans):
+    with tracing.trace("submission") as root:
+        def work():
+            with tracing.span("worker"):
+                pass
+        t = threading.Thread(target=tracing.wrap(work))
+        t.start()
+        t.join()
+        waiting = tracing.start_span("mask.wait")
+
+    with tracing.resume(root):
+        with tracing.span("ai"):
+            pass
+    waiting.end("cancelled")
+
+    by_name = {s.name: s for s in spans}
+    assert by_name["worker"].parent_id == root.span_id
+    assert by_name["ai"].parent_id == root.span_id
+    assert by_name["mask.wait"].status == "cancelled"
+    waiting.end()                            # ending twice emits once
+    assert [s.name for s in spans].count("mask.wait") == 1
@@ -0,0 +1,82 @@
+# tests/test_webui_caps.py
+import requests
+
+from webui_caps import CapabilityRegistry
+
+SAMPLERS = [{"name": "DPM++ 2M", "aliases": ["k_dpmpp_2m"]}]
+SCHEDULERS = [{"name": "karras", "label": "Karras"}]
+SCRIPTS = {"txt2img": [], "img2img": ["soft inpainting"]}
+
+PROFILES = {
+    "underwater": {
+        "sampler": "DPM++ 2M Karras",
+        "scheduler": "Karras",
+        "controlnet": {"units": [{"model": "control_canny [abc123]", "module": "canny"}]},
+    }
+}
+
+
+def _http_error(status):
+    r = requests.Response()
+    r.status_code = status
+    return requests.HTTPError(f"{status}", response=r)
+
+
+def _fetcher(listings):
+    calls = []
+
+    def fetch(backend, path):
+        calls.append(path)
+        v = listings[path]
+        if isinstance(v, Exception):
+            raise v
+        return v
+
+    return fetch, calls
+
+
+def test_missing_core_listing_is_unknown_not_absent():
+    # older A1111: no /schedulers; no ControlNet extension either
+    fetch, calls = _fetcher({
+        "/sdapi/v1/scripts": SCRIPTS,
+        "/sdapi/v1/samplers": SAMPLERS,
+        "/sdapi/v1/schedulers": _http_error(404),
+        "/controlnet/model_list": _http_error(404),
+        "/controlnet/module_list": _http_error(404),
+    })
+    reg = CapabilityRegistry(fetch)
+    problems = reg.validate("http://a", PROFILES)
+
+    assert not any("scheduler" in p for p in problems)
+    assert any("ControlNet model" in p for p in problems)
+    assert any("ControlNet module" in p for p in problems)
+
+    reg.get("http://a")   # an unsupported listing doesn't make the snapshot expire early
+    assert len(calls) == 5
+
+
+def test_failed_listing_skips_check_and_retries():
+    fetch, calls = _fetcher({
+        "/sdapi/v1/scripts": SCRIPTS,
+        "/sdapi/v1/samplers": _http_error(500),
+        "/sdapi/v1/schedulers": SCHEDULERS,
+        "/controlnet/model_list": {"model_list": ["control_canny [ffff00]"]},
+        "/controlnet/module_list": {"module_list": ["canny"]},
+    })
+    reg = CapabilityRegistry(fetch, retry_s=0)
+    assert reg.validate("http://a", PROFILES) == []   # hash suffixes don't matter
+
+    reg.get("http://a")
+    assert len(calls) == 10
+
+
+def test_unavailable_sampler_is_reported():
+    fetch, _ = _fetcher({
+        "/sdapi/v1/scripts": SCRIPTS,
+        "/sdapi/v1/samplers": [{"name": "Euler a", "aliases": []}],
+        "/sdapi/v1/schedulers": SCHEDULERS,
+        "/controlnet/model_list": {"model_list": ["control_canny"]},
+        "/controlnet/module_list": {"module_list": ["canny"]},
+    })
+    problems = CapabilityRegistry(fetch).validate("http://a", PROFILES)
+    assert problems == ["underwater: sampler 'DPM++ 2M' is not available"]
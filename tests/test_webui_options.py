@@ -0,0 +1,78 @@
+# tests/test_webui_options.py
+import pytest
+
+from webui_options import OptionsManager
+
+CKPT = "juggernaut.safetensors"
+
+
+class FakeWebUI:
+    def __init__(self, options, fail_post=False):
+        self.options = dict(options)
+        self.fail_post = fail_post
+        self.gets = 0
+        self.posted = []
+
+    def get(self, backend, endpoint):
+        assert endpoint == "options"
+        self.gets += 1
+        return dict(self.options)
+
+    def post(self, backend, endpoint, payload):
+        assert endpoint == "options"
+        if self.fail_post:
+            raise ConnectionError("backend restarted")
+        self.posted.append((backend, dict(payload)))
+        self.options.update(payload)
+
+
+def test_posts_only_changed_keys_ignoring_hash_suffix():
+    webui = FakeWebUI({"sd_model_checkpoint": f"{CKPT} [a1b2c3d4]", "CLIP_stop_at_last_layers": 1})
+    opts = OptionsManager(webui.get, webui.post)
+
+    diff = opts.ensure("b1", {"sd_model_checkpoint": CKPT, "CLIP_stop_at_last_layers": 2})
+    assert diff == {"CLIP_stop_at_last_layers": 2}
+    assert webui.posted == [("b1", {"CLIP_stop_at_last_layers": 2})]
+
+
+def test_repeat_ensure_skips_the_round_trip():
+    webui = FakeWebUI({"sd_model_checkpoint": "other.safetensors [ffff]"})
+    opts = OptionsManager(webui.get, webui.post)
+    wanted = {"sd_model_checkpoint": CKPT}
+
+    assert opts.ensure("b1", wanted) == wanted
+    assert opts.ensure("b1", wanted) == {}
+    assert webui.gets == 1
+    assert opts.posts == 1
+
+
+def test_backends_are_tracked_separately():
+    webui = FakeWebUI({"sd_model_checkpoint": "other.safetensors"})
+    opts = OptionsManager(webui.get, webui.post)
+    opts.ensure("b1", {"sd_model_checkpoint": CKPT})
+    webui.options = {"sd_model_checkpoint": "other.safetensors"}   # b2 still has the old model
+    opts.ensure("b2", {"sd_model_checkpoint": CKPT})
+    assert [b for b, _ in webui.posted] == ["b1", "b2"]
+    assert webui.gets == 2
+
+
+def test_failed_post_drops_the_view():
+    webui = FakeWebUI({"sd_model_checkpoint": "other.safetensors"}, fail_post=True)
+    opts = OptionsManager(webui.get, webui.post)
+    with pytest.raises(ConnectionError):
+        opts.ensure("b1", {"sd_model_checkpoint": CKPT})
+    assert opts.posts == 0
+
+    webui.fail_post = False
+    assert opts.ensure("b1", {"sd_model_checkpoint": CKPT}) == {"sd_model_checkpoint": CKPT}
+    assert webui.gets == 2                                           # re-read after the failure
+
+
+def test_invalidate_forces_a_reread():
+    webui = FakeWebUI({"sd_model_checkpoint": CKPT})
+    opts = OptionsManager(webui.get, webui.post)
+    opts.ensure("b1", {"sd_model_checkpoint": CKPT})
+    webui.options["sd_model_checkpoint"] = "other.safetensors"     # changed behind our back
+    opts.invalidate("b1")
+    assert opts.ensure("b1", {"sd_model_checkpoint": CKPT}) == {"sd_model_checkpoint": CKPT}
+    assert webui.gets == 2
@@ -1,72 +1,184 @@
 import os
 import time
+import threading
+import contextvars
 import requests
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 from dotenv import load_dotenv, find_dotenv
 
+import http_client
+import cancellation
+from singleflight import SingleFlight
+from tiles_meta_cache import TILES_META_CACHE, MISS
+
 load_dotenv(find_dotenv(usecwd=True))
 GMP_KEY = os.getenv("GOOGLE_STREET_VIEW_API_KEY")
 
-SESSION_URL = "https://tile.googleapis.com/v1/createSession"
-META_URL    = "https://tile.googleapis.com/v1/streetview/metadata"
+TILES_BASE_URL = os.getenv("TILES_BASE_URL", "https://tile.googleapis.com").rstrip("/")
+SESSION_URL  = f"{TILES_BASE_URL}/v1/createSession"
+META_URL     = f"{TILES_BASE_URL}/v1/streetview/metadata"
+PANO_IDS_URL = f"{TILES_BASE_URL}/v1/streetview/panoIds"
+TILE_URL     = TILES_BASE_URL + "/v1/streetview/tiles/{z}/{x}/{y}"
+
+TILES_BFS_WORKERS = int(os.getenv("TILES_BFS_WORKERS", "8"))
+_bfs_pool = ThreadPoolExecutor(max_workers=TILES_BFS_WORKERS, thread_name_prefix="tiles-bfs")
+_inflight = SingleFlight()
+
+SESSION_REFRESH_MARGIN_S = 120     # renew on use once the token is this close to the API-reported expiry
+SESSION_FALLBACK_TTL_S   = 60 * 30 # used only if the response carries no expiry
+
+
+class TilesSessionManager:
+    """
+    One Street View Tiles session shared by all threads.
+    The expiry returned by createSession is honoured and the token is renewed
+    lazily, by the first request that finds it near expiry, so an idle app
+    creates no sessions. Only one thread calls createSession at a time, and
+    it does so without holding the state lock: while a still-valid token is
+    being renewed, other requests keep using it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()          # guards _token/_expiry only
+        self._create_lock = threading.Lock()   # one createSession call at a time
+        self._token: Optional[str] = None
+        self._expiry: float = 0.0   # epoch seconds
+
+    def _current(self, margin_s: float) -> Optional[str]:
+        with self._lock:
+            if self._token and time.time() < self._expiry - margin_s:
+                return self._token
+            return None
+
+    def token(self) -> str:
+        tok = self._current(SESSION_REFRESH_MARGIN_S)
+        if tok:
+            return tok
+        usable = self._current(0)   # near expiry but still accepted
+        if usable:
+            if not self._create_lock.acquire(blocking=False):
+                return usable       # another thread is renewing it
+        else:
+            self._create_lock.acquire()
+        try:
+            tok = self._current(SESSION_REFRESH_MARGIN_S)   # renewed while we waited
+            if tok:
+                return tok
+            try:
+                tok, expiry = self._create()
+            except Exception as e:
+                if not usable:
+                    raise
+                print(f"[Tiles session] renewal failed, keeping current token: {e}")
+                return usable
+            with self._lock:
+                self._token, self._expiry = tok, expiry
+            return tok
+        finally:
+            self._create_lock.release()
+
+    def invalidate(self, token: Optional[str] = None):
+        """Drop the current token (only if it is still `token`, when given)."""
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expiry = 0.0
+
+    def _create(self):
+        """(token, expiry) from a fresh createSession call."""
+        r = http_client.post(
+            SESSION_URL,
+            endpoint="tiles_session",
+            params={"key": GMP_KEY},
+            json={"mapType": "streetview"},
+        )
+        try:
+            r.raise_for_status()
+        except requests.HTTPError:
+            # bubble up a helpful message
+            raise RuntimeError(f"Tiles session error {r.status_code}: {r.text[:300]}")
+
+        data = r.json()
+        try:
+            expiry = float(data["expiry"])
+        except (KeyError, TypeError, ValueError):
+            expiry = time.time() + SESSION_FALLBACK_TTL_S
+        return data["session"], expiry
 
-_session_token: Optional[str] = None
-_session_expiry: float = 0.0  # epoch seconds
+    def request(self, method: str, url: str, *, endpoint: str, params: dict | None = None, **kwargs):
+        """
+        Request with key+session attached. A stale/rejected session is renewed and
+        the request retried once, transparently to the caller.
+        """
+        r = None
+        for _attempt in range(2):
+            token = self.token()
+            r = http_client.request(method, url, endpoint=endpoint,
+                                    params={**(params or {}), "key": GMP_KEY, "session": token}, **kwargs)
+            if not _is_session_rejection(r):
+                return r
+            print(f"[Tiles session] token rejected ({r.status_code}); renewing")
+            self.invalidate(token)
+        return r
+
+    def get(self, url: str, *, endpoint: str, params: dict | None = None, **kwargs):
+        return self.request("GET", url, endpoint=endpoint, params=params, **kwargs)
+
+    def post(self, url: str, *, endpoint: str, params: dict | None = None, **kwargs):
+        return self.request("POST", url, endpoint=endpoint, params=params, **kwargs)
+
+
+def _is_session_rejection(r) -> bool:
+    if r.status_code in (401, 403):
+        return True
+    return r.status_code == 400 and "session" in (r.text or "").lower()
+
+
+SESSION = TilesSessionManager()
 
 
 def _get_session_token() -> str:
     """
     Create or reuse a Street View Tiles API session token.
     """
-    global _session_token, _session_expiry
-    now = time.time()
-    if _session_token and now < _session_expiry - 60:
-        return _session_token
-
-    r = requests.post(
-        SESSION_URL,
-        params={"key": GMP_KEY},
-        json={"mapType": "streetview"},
-        timeout=10,
-    )
-    try:
-        r.raise_for_status()
-    except requests.HTTPError:
-        # bubble up a helpful message
-        raise RuntimeError(f"Tiles session error {r.status_code}: {r.text[:300]}")
-
-    data = r.json()
-    _session_token = data["session"]
-    # if the API returns a TTL use it; else 30m conservative
-    _session_expiry = now + 60 * 30
-    return _session_token
+    return SESSION.token()
 
 
-@lru_cache(maxsize=4096)
 def get_tiles_metadata_by_panoid(pano_id: str) -> Optional[dict]:
     """
     Raw Street View Tiles metadata JSON for a panoId, or None on error.
+    Backed by the persistent metadata cache (long TTL for hits, short for failures).
     """
     if not pano_id:
         return None
+    cached = TILES_META_CACHE.get(pano_id)
+    if cached is not MISS:
+        return cached
+    return _inflight.do(pano_id, _fetch_tiles_metadata, pano_id)
+
+
+def _fetch_tiles_metadata(pano_id: str) -> Optional[dict]:
+    meta = None
     try:
-        session = _get_session_token()
-        r = requests.get(
-            META_URL,
-            params={"key": GMP_KEY, "session": session, "panoId": pano_id},
-            timeout=10
-        )
+        r = SESSION.get(META_URL, endpoint="tiles_metadata", params={"panoId": pano_id})
         if r.status_code != 200:
             print(f"[Tiles meta] {pano_id} -> {r.status_code}: {r.text[:200]}")
-            return None
-        return r.json()
+        else:
+            meta = r.json()
+    except cancellation.Cancelled:
+        raise   # not an answer about this pano: never cache it as a failure
     except Exception as e:
         print(f"[Tiles meta] exception for {pano_id}: {e}")
-        return None
+    TILES_META_CACHE.put(pano_id, meta)
+    return meta
+
+
+def _bfs_submit(fn, *args):
+    """Run fn on the BFS pool with the caller's cancel token and trace span."""
+    return _bfs_pool.submit(contextvars.copy_context().run, fn, *args)
 
 
-@lru_cache(maxsize=4096)
 def get_imagery_type_for_pano(pano_id: str) -> Optional[str]:
     """
     Returns 'outdoor', 'indoor', or None if unknown/error.
@@ -96,6 +208,9 @@ def get_neighbor_pano_ids(pano_id: str) -> List[str]:
 def find_nearest_outdoor_neighbor_id(seed_pano_id: str, max_hops: int = 4) -> Optional[str]:
     """
     BFS a few hops across neighbor links to find the first pano with imageryType == 'outdoor'.
+    Each level's metadata is fetched concurrently (bounded by TILES_BFS_WORKERS) but
+    read back in BFS order, so the answer is the first outdoor pano in that order
+    regardless of which request finishes first.
     Returns the panoId or None if not found.
     """
     if not seed_pano_id:
@@ -106,13 +221,24 @@ def find_nearest_outdoor_neighbor_id(seed_pano_id: str, max_hops: int = 4) -> Op
     hops = 0
 
     while frontier and hops < max_hops:
+        cancellation.check()
+        futures = [_bfs_submit(get_tiles_metadata_by_panoid, pid) for pid in frontier]
+        metas = {}
+        try:
+            for pid, fut in zip(frontier, futures):
+                meta = fut.result()
+                if meta and meta.get("imageryType") == "outdoor":
+                    return pid
+                metas[pid] = meta
+        finally:
+            for fut in futures:
+                fut.cancel()
+
         next_frontier = []
-        for pid in frontier:
-            itype = get_imagery_type_for_pano(pid)
-            if itype == "outdoor":
-                return pid
-            for npid in get_neighbor_pano_ids(pid):
-                if npid not in visited:
+        for pid in frontier:   # keep link order stable across runs
+            for link in (metas.get(pid) or {}).get("links") or []:
+                npid = link.get("panoId")
+                if npid and npid not in visited:
                     visited.add(npid)
                     next_frontier.append(npid)
         frontier = next_frontier
@@ -121,3 +247,66 @@ def find_nearest_outdoor_neighbor_id(seed_pano_id: str, max_hops: int = 4) -> Op
     return None
 
 
+def get_pano_id_near(lat: float, lng: float, radius_m: int = 50) -> Optional[str]:
+    """
+    Nearest panoId within radius_m of (lat, lng) via the Tiles panoIds endpoint, or None.
+    """
+    try:
+        r = SESSION.post(
+            PANO_IDS_URL,
+            endpoint="tiles_metadata",
+            json={"locations": [{"lat": lat, "lng": lng}], "radius": int(radius_m)},
+        )
+        if r.status_code != 200:
+            print(f"[Tiles panoIds] ({lat},{lng}) -> {r.status_code}: {r.text[:200]}")
+            return None
+        ids = r.json().get("panoIds") or []
+        return (ids[0] or None) if ids else None
+    except Exception as e:
+        print(f"[Tiles panoIds] exception for ({lat},{lng}): {e}")
+        return None
+
+
+def collect_linked_metadata(seed_pano_id: str, max_hops: int = 3) -> List[dict]:
+    """
+    Metadata for the seed and every pano reachable within max_hops links,
+    in BFS order. Each level is fetched concurrently.
+    """
+    if not seed_pano_id:
+        return []
+
+    visited = set([seed_pano_id])
+    frontier = [seed_pano_id]
+    out = []
+    depth = 0
+
+    while frontier:
+        cancellation.check()
+        futures = [_bfs_submit(get_tiles_metadata_by_panoid, pid) for pid in frontier]
+        metas = [fut.result() for fut in futures]
+        next_frontier = []
+        for meta in metas:
+            if not meta:
+                continue
+            out.append(meta)
+            if depth >= max_hops:
+                continue
+            for link in meta.get("links") or []:
+                npid = link.get("panoId")
+                if npid and npid not in visited:
+                    visited.add(npid)
+                    next_frontier.append(npid)
+        frontier = next_frontier
+        depth += 1
+
+    return out
+
+
+def get_pano_tile(pano_id: str, z: int, x: int, y: int) -> bytes:
+    """
+    One JPEG tile of a pano's equirectangular image at zoom z.
+    """
+    r = SESSION.get(TILE_URL.format(z=z, x=x, y=y), endpoint="tiles_image", params={"panoId": pano_id})
+    if r.status_code != 200:
+        raise RuntimeError(f"Tiles image error {r.status_code} for {pano_id} z{z}/{x}/{y}: {r.text[:200]}")
+    return r.content
@@ -0,0 +1,94 @@
+# tiles_meta_cache.py
+"""
+Disk-backed cache of Street View Tiles metadata, keyed by panoId.
+
+Successful lookups are kept for a long time (pano metadata practically never
+changes); failures are recorded as negative entries that expire quickly, so a
+transient error is retried soon instead of being remembered forever.
+A small in-memory layer sits in front of the SQLite file.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+from constants import CacheDirectory
+
+TILES_META_TTL_S     = float(os.getenv("TILES_META_TTL_DAYS", "30")) * 86400
+TILES_META_NEG_TTL_S = float(os.getenv("TILES_META_NEG_TTL_S", "300"))
+
+MISS = object()   # sentinel: no live entry
+
+
+class TilesMetadataCache:
+    def __init__(self, path: str = CacheDirectory.TILES_METADATA.value,
+                 ttl_s: float = TILES_META_TTL_S, negative_ttl_s: float = TILES_META_NEG_TTL_S):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._lock = threading.Lock()
+        self._mem: dict[str, tuple[Optional[dict], float]] = {}   # pano_id -> (meta|None, expires_at)
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tiles_meta ("
+                " pano_id TEXT PRIMARY KEY, body TEXT, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, pano_id: str):
+        """Cached metadata dict, None for a live negative entry, or MISS."""
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(pano_id)
+            if hit and hit[1] > now:
+                return hit[0]
+            try:
+                row = self._conn().execute(
+                    "SELECT body, expires_at FROM tiles_meta WHERE pano_id = ?", (pano_id,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[Tiles cache] read failed: {e}")
+                return MISS
+            if not row or row[1] <= now:
+                return MISS
+            meta = json.loads(row[0]) if row[0] is not None else None
+            self._mem[pano_id] = (meta, row[1])
+            return meta
+
+    def put(self, pano_id: str, meta: Optional[dict]):
+        expires_at = time.time() + (self.ttl_s if meta is not None else self.negative_ttl_s)
+        body = json.dumps(meta) if meta is not None else None
+        with self._lock:
+            self._mem[pano_id] = (meta, expires_at)
+            try:
+                db = self._conn()
+                db.execute(
+                    "INSERT OR REPLACE INTO tiles_meta (pano_id, body, expires_at) VALUES (?, ?, ?)",
+                    (pano_id, body, expires_at),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"[Tiles cache] write failed: {e}")
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            self._mem = {k: v for k, v in self._mem.items() if v[1] > now}
+            try:
+                db = self._conn()
+                db.execute("DELETE FROM tiles_meta WHERE expires_at <= ?", (now,))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"[Tiles cache] purge failed: {e}")
+
+
+TILES_META_CACHE = TilesMetadataCache()
@@ -0,0 +1,162 @@
+# tracing.py
+"""
+Lightweight per-submission tracing.
+
+A trace is opened per submission (trace()); span() blocks inside it nest via a
+context variable, so a stage called from anywhere in the submission becomes a
+child of whatever span is open. Work handed to another thread keeps its parent
+through wrap() / resume(). Outside a trace, span() costs almost nothing.
+
+Finished spans go to every sink: a JSON-lines file (TRACE_FILE, "" disables)
+and whatever add_sink() registered, e.g. the GUI progress log.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "depth",
+                 "start", "_t0", "duration_ms", "attrs", "status")
+
+    def __init__(self, name: str, parent: "Span | None", attrs: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms = None
+        self.attrs = attrs
+        self.status = "ok"
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, status: str | None = None):
+        if self.duration_ms is not None:
+            return
+        if status:
+            self.status = status
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000.0
+        _emit(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms or 0.0, 2),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_sinks = []
+_file_lock = threading.Lock()
+
+
+# ------------------- sinks -------------------
+def add_sink(fn):
+    """fn(span) is called for every finished span (from the finishing thread)."""
+    _sinks.append(fn)
+
+
+def _jsonl_sink(span: Span):
+    line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+    with _file_lock:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(TRACE_FILE)), exist_ok=True)
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"[trace] write failed: {e}")
+
+
+def _emit(span: Span):
+    for sink in _sinks:
+        try:
+            sink(span)
+        except Exception as e:
+            print(f"[trace] sink failed: {e}")
+
+
+if TRACE_FILE:
+    add_sink(_jsonl_sink)
+
+
+def format_span(span: Span) -> str:
+    """One progress-log line, indented by nesting depth."""
+    extra = f" ({span.status})" if span.status != "ok" else ""
+    return f"[trace] {'  ' * span.depth}{span.name}: {span.duration_ms:.0f} ms{extra}"
+
+
+# ------------------- spans -------------------
+def current() -> Span | None:
+    return _current.get()
+
+
+def _status_for(exc: BaseException) -> str:
+    return "cancelled" if type(exc).__name__ == "Cancelled" else "error"
+
+
+@contextmanager
+def _scoped(sp: Span):
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.set(error=str(e) or type(e).__name__)
+        sp.end(_status_for(e))
+        raise
+    finally:
+        _current.reset(token)
+        sp.end()
+
+
+def trace(name: str, **attrs):
+    """Open the root span of a new trace (one per submission)."""
+    return _scoped(Span(name, None, attrs))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Child span of the current one; a no-op outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _scoped(Span(name, parent, attrs)) as sp:
+        yield sp
+
+
+def start_span(name: str, parent: Span | None = None, **attrs) -> Span | None:
+    """Open a span that is ended elsewhere with .end() (e.g. waiting on an event)."""
+    parent = parent or _current.get()
+    return Span(name, parent, attrs) if parent is not None else None
+
+
+@contextmanager
+def resume(parent: Span | None):
+    """Make parent the current span again (e.g. in a GUI slot or another thread)."""
+    token = _current.set(parent)
+    try:
+        yield parent
+    finally:
+        _current.reset(token)
+
+
+def wrap(fn):
+    """fn bound to the caller's trace context, for threading.Thread targets."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.run(fn, *a, **kw)
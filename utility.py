@@ -84,6 +84,12 @@ def _is_no_pano_error(e: Exception) -> bool:
     return ("no panoramas on or before" in s) or ("no outdoor pano on/before" in s)
 
 
+def buildAddress(data) -> str:
+    """Geocodable address line from the form payload."""
+    parts = [data.get("prefecture", ""), data.get("city", ""), data.get("town", ""), data["address2"]]
+    return " ".join(p for p in parts if p)
+
+
 def dateConverter(data):
     """
     Parse the user's date/time and return BOTH:
@@ -0,0 +1,182 @@
+# webui_caps.py
+"""
+Per-backend discovery of what an SD WebUI can do: installed scripts,
+samplers, schedulers and ControlNet models/modules.
+
+Each backend is listed once and the snapshot reused until WEBUI_CAPS_TTL_S
+expires or invalidate() is called (e.g. after a failed generation).
+Listings that could not be fetched are None ("unknown") and make the
+snapshot expire after WEBUI_CAPS_RETRY_S instead. A missing extension
+endpoint (404 on /controlnet/*) means the feature is absent; a missing core
+/sdapi/v1 listing (e.g. no /schedulers on older A1111 builds) is unknown, so
+the checks that need it are skipped.
+"""
+import os
+import re
+import time
+import threading
+
+import requests
+
+WEBUI_CAPS_TTL_S   = float(os.getenv("WEBUI_CAPS_TTL_S", "600"))
+WEBUI_CAPS_RETRY_S = float(os.getenv("WEBUI_CAPS_RETRY_S", "30"))
+
+_LISTINGS = {
+    "scripts":    "/sdapi/v1/scripts",
+    "samplers":   "/sdapi/v1/samplers",
+    "schedulers": "/sdapi/v1/schedulers",
+    "cn_models":  "/controlnet/model_list",
+    "cn_modules": "/controlnet/module_list",
+}
+
+_EXTENSION_PREFIXES = ("/controlnet/",)   # a 404 here means the extension is absent
+_UNSUPPORTED = object()                    # core listing this build lacks: unknown, but not worth retrying
+
+_HASH_SUFFIX = re.compile(r"\s*\[[0-9a-fA-F]+\]$")
+
+
+def _norm(s: str) -> str:
+    return re.sub(r"[\s_\-]+", "", str(s).lower())
+
+
+def _names(items, *keys) -> list[str]:
+    """Flatten a WebUI listing (strings or dicts) into the names it offers."""
+    out = []
+    for it in items or []:
+        if isinstance(it, dict):
+            for k in keys:
+                v = it.get(k)
+                if isinstance(v, list):
+                    out.extend(str(x) for x in v)
+                elif v:
+                    out.append(str(v))
+        else:
+            out.append(str(it))
+    return out
+
+
+class Capabilities:
+    """One backend's listings at fetched_at; None = unknown (listing failed or not served)."""
+
+    def __init__(self, raw: dict, fetched_at: float):
+        self.fetched_at = fetched_at
+        self.complete = all(v is not None for v in raw.values())
+        raw = {k: (None if v is _UNSUPPORTED else v) for k, v in raw.items()}
+        scripts = raw.get("scripts")
+        self.scripts = None if scripts is None else (
+            _names(scripts.get("txt2img"), "name", "title") + _names(scripts.get("img2img"), "name", "title")
+            if isinstance(scripts, dict) else [])
+        samplers = raw.get("samplers")
+        self.samplers = None if samplers is None else _names(samplers, "name", "aliases")
+        schedulers = raw.get("schedulers")
+        self.schedulers = None if schedulers is None else _names(schedulers, "name", "label")
+        models = raw.get("cn_models")
+        self.cn_models = None if models is None else _names(models.get("model_list") if isinstance(models, dict) else models)
+        modules = raw.get("cn_modules")
+        self.cn_modules = None if modules is None else _names(modules.get("module_list") if isinstance(modules, dict) else modules)
+
+    def find_script(self, keywords: list) -> str | None:
+        """Installed script whose name contains all keywords (case/space insensitive)."""
+        needed = [_norm(k) for k in keywords]
+        for name in self.scripts or []:
+            if all(k in _norm(name) for k in needed):
+                return name
+        return None
+
+    @staticmethod
+    def _has(pool, name: str, strip_hash: bool = False) -> bool | None:
+        if pool is None:
+            return None
+        if strip_hash:
+            want = _norm(_HASH_SUFFIX.sub("", name))
+            return any(_norm(_HASH_SUFFIX.sub("", p)) == want for p in pool)
+        return _norm(name) in {_norm(p) for p in pool}
+
+    def has_sampler(self, name: str):
+        return self._has(self.samplers, name)
+
+    def has_scheduler(self, name: str):
+        return self._has(self.schedulers, name)
+
+    def has_cn_model(self, name: str):
+        return self._has(self.cn_models, name, strip_hash=True)
+
+    def has_cn_module(self, name: str):
+        return self._has(self.cn_modules, name)
+
+
+class CapabilityRegistry:
+    def __init__(self, fetch, ttl_s: float = WEBUI_CAPS_TTL_S, retry_s: float = WEBUI_CAPS_RETRY_S):
+        """fetch(backend, path) returns the decoded JSON of GET <backend><path>."""
+        self._fetch = fetch
+        self.ttl_s = ttl_s
+        self.retry_s = retry_s
+        self._lock = threading.Lock()
+        self._locks: dict[str, threading.Lock] = {}
+        self._caps: dict[str, Capabilities] = {}
+
+    def _backend_lock(self, backend: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(backend, threading.Lock())
+
+    def _fresh(self, caps: Capabilities | None) -> bool:
+        if caps is None:
+            return False
+        age = time.time() - caps.fetched_at
+        return age < (self.ttl_s if caps.complete else self.retry_s)
+
+    def get(self, backend: str) -> Capabilities:
+        caps = self._caps.get(backend)
+        if self._fresh(caps):
+            return caps
+        with self._backend_lock(backend):
+            caps = self._caps.get(backend)   # another thread may have just listed it
+            if self._fresh(caps):
+                return caps
+            caps = Capabilities({k: self._list(backend, path) for k, path in _LISTINGS.items()}, time.time())
+            self._caps[backend] = caps
+            return caps
+
+    def _list(self, backend: str, path: str):
+        try:
+            return self._fetch(backend, path)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                if path.startswith(_EXTENSION_PREFIXES):
+                    return []   # extension not installed
+                print(f"[WebUI caps] {path} not served by this WebUI build; not checked")
+                return _UNSUPPORTED
+            print(f"[WebUI caps] {path} failed: {e}")
+        except Exception as e:
+            print(f"[WebUI caps] {path} failed: {e}")
+        return None
+
+    def invalidate(self, backend: str | None = None):
+        with self._lock:
+            if backend is None:
+                self._caps.clear()
+            else:
+                self._caps.pop(backend, None)
+
+    def validate(self, backend: str, profiles: dict) -> list[str]:
+        """Problems with profiles on this backend (only checks what could be listed)."""
+        caps = self.get(backend)
+        problems = []
+        for name, prof in profiles.items():
+            sampler = str(prof.get("sampler", "")).replace(" Karras", "")
+            if sampler and caps.has_sampler(sampler) is False:
+                problems.append(f"{name}: sampler '{sampler}' is not available")
+            sched = prof.get("scheduler")
+            if sched and caps.has_scheduler(sched) is False:
+                problems.append(f"{name}: scheduler '{sched}' is not available")
+            si = prof.get("soft_inpaint")
+            if si and si.get("enabled") and caps.scripts is not None and not caps.find_script(["soft", "inpaint"]):
+                problems.append(f"{name}: soft inpainting script is not installed")
+            for u in ((prof.get("controlnet") or {}).get("units") or []):
+                if not isinstance(u, dict) or not u.get("enabled", True):
+                    continue
+                if u.get("model") and caps.has_cn_model(u["model"]) is False:
+                    problems.append(f"{name}: ControlNet model '{u['model']}' is not installed")
+                if u.get("module") and caps.has_cn_module(u["module"]) is False:
+                    problems.append(f"{name}: ControlNet module '{u['module']}' is not available")
+        return problems
@@ -0,0 +1,66 @@
+# webui_options.py
+"""
+Per-backend view of the SD WebUI's /sdapi/v1/options.
+
+The options are read once per backend. ensure() then posts only the keys
+whose value differs from what the backend already has, so after the first
+generation the options round trip is skipped, along with the checkpoint
+reload a repeated sd_model_checkpoint POST can trigger.
+The view is dropped (and re-read on next use) when a request to that backend
+fails, since the server may have restarted with different settings.
+"""
+import re
+import threading
+
+_HASH_SUFFIX = re.compile(r"\s*\[[0-9a-fA-F]+\]$")
+
+
+def _same(current, wanted) -> bool:
+    if current == wanted:
+        return True
+    # checkpoints are reported as "name.safetensors [hash]" but may be configured without the hash
+    if isinstance(current, str) and isinstance(wanted, str):
+        return _HASH_SUFFIX.sub("", current) == _HASH_SUFFIX.sub("", wanted)
+    return False
+
+
+class OptionsManager:
+    def __init__(self, get, post):
+        """get(backend, endpoint) / post(backend, endpoint, payload) talk to /sdapi/v1 of a backend."""
+        self._get = get
+        self._post = post
+        self._lock = threading.Lock()
+        self._locks: dict[str, threading.Lock] = {}   # one per backend: reads/posts are serialized
+        self._state: dict[str, dict] = {}             # backend -> last known options
+        self.posts = 0                                # option POSTs actually sent
+
+    def _backend_lock(self, backend: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(backend, threading.Lock())
+
+    def ensure(self, backend: str, wanted: dict) -> dict:
+        """Make the backend's options match wanted; returns the keys that had to be posted."""
+        with self._backend_lock(backend):
+            state = self._state.get(backend)
+            if state is None:
+                state = self._get(backend, "options")
+                state = state if isinstance(state, dict) else {}
+                self._state[backend] = state
+            diff = {k: v for k, v in wanted.items() if not _same(state.get(k), v)}
+            if diff:
+                print(f"[WebUI options] updating {', '.join(sorted(diff))}")
+                try:
+                    self._post(backend, "options", diff)
+                except Exception:
+                    self._state.pop(backend, None)
+                    raise
+                state.update(diff)
+                self.posts += 1
+            return diff
+
+    def invalidate(self, backend: str | None = None):
+        with self._lock:
+            if backend is None:
+                self._state.clear()
+            else:
+                self._state.pop(backend, None)